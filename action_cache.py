@@ -0,0 +1,242 @@
+# action_cache.py
+"""
+Memoization of action results across turns and tasks
+
+Every action in available_actions goes through memoized_action(). A call is
+keyed on the action name plus the canonical JSON of its parameters, bound to
+the action's signature so that a default passed explicitly and one left out
+give the same key. What a repeat call does depends on the action's policy:
+
+- "pure": the result is computed once and served from the cache until its
+  TTL runs out or invalidate() drops it
+- "idempotent": the action has side effects, and the key serves as an
+  idempotency key: a repeat within the TTL replays the original result
+  instead of doing the work again (schedule_content does not add a second
+  entry for the same post)
+- no policy: the action runs every time (generate_content picks a random
+  template, so a repeat is expected to give a new variant)
+
+Results with an "error" are never stored. Concurrent calls with the same key
+wait for the first one instead of running the action in parallel.
+"""
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Action name -> {"mode": "pure" | "idempotent", "ttl": seconds}
+DEFAULT_POLICIES = {
+    "analyze_campaign_data": {"mode": "pure", "ttl": 300},
+    "schedule_content": {"mode": "idempotent", "ttl": 24 * 3600},
+}
+
+
+def canonical_parms(action_function, function_parms):
+    """
+    Parameters bound to the action's signature, with defaults filled in
+
+    Returns:
+        dict: Parameter name -> value, or None if the parameters do not fit
+            the signature (the call itself then raises the usual TypeError)
+    """
+    try:
+        bound = inspect.signature(action_function).bind(**function_parms)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def action_key(function_name, function_parms):
+    """
+    Cache (or idempotency) key of an action call
+
+    Args:
+        function_name (str): Action name
+        function_parms (dict): Canonical parameters (see canonical_parms)
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON of the call
+    """
+    canonical = json.dumps(
+        {"action": function_name, "parms": function_parms},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ActionCache:
+    """
+    TTL cache of action results with per-action policies and hit counts
+
+    Args:
+        policies (dict): Action name -> policy (default: DEFAULT_POLICIES);
+            actions without a policy are not cached
+        max_entries (int): Results to keep; the least recently used go first
+        clock (callable): Returns the current time in seconds
+    """
+
+    def __init__(self, policies=None, max_entries=4096, clock=time.monotonic):
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires, function_name, parms, result)
+        self._pending = {}  # key -> Event set when the first call finishes
+        self._lock = threading.Lock()
+        self.counts = {}  # function_name -> counters
+
+    def _count(self, function_name, counter, amount=1):
+        counts = self.counts.setdefault(
+            function_name, {"calls": 0, "hits": 0, "misses": 0, "uncached": 0, "invalidated": 0}
+        )
+        counts[counter] += amount
+
+    def call(self, function_name, action_function, function_parms, validate=None):
+        """
+        Run an action through the cache
+
+        Args:
+            function_name (str): Action name (selects the policy)
+            action_function (callable): The action
+            function_parms (dict): Parameters from the model
+            validate (callable): Optional check of a stored result before it
+                is reused; returning False runs the action again
+
+        Returns:
+            The action's result (a copy when served from the cache)
+        """
+        policy = self.policies.get(function_name)
+        parms = canonical_parms(action_function, function_parms) if policy else None
+        if parms is None:
+            with self._lock:
+                self._count(function_name, "calls")
+                self._count(function_name, "uncached")
+            return action_function(**function_parms)
+
+        key = action_key(function_name, parms)
+        while True:
+            waiting = None
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is None:
+                    waiting = self._pending.get(key)
+                    if waiting is None:
+                        self._pending[key] = threading.Event()
+            if entry is not None:
+                if validate is None or validate(entry[3]):
+                    with self._lock:
+                        self._count(function_name, "calls")
+                        self._count(function_name, "hits")
+                    return copy.deepcopy(entry[3])
+                with self._lock:
+                    self._entries.pop(key, None)
+                continue
+            if waiting is not None:
+                waiting.wait()
+                continue
+            break
+
+        result = None
+        try:
+            result = action_function(**function_parms)
+        finally:
+            with self._lock:
+                self._count(function_name, "calls")
+                self._count(function_name, "misses")
+                if not (isinstance(result, dict) and "error" in result) and result is not None:
+                    self._store(key, function_name, parms, copy.deepcopy(result), policy["ttl"])
+                self._pending.pop(key).set()
+        return result
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, function_name, parms, result, ttl):
+        self._entries[key] = (self.clock() + ttl, function_name, parms, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, function_name=None, **parms):
+        """
+        Drop stored results
+
+        Args:
+            function_name (str): Only results of this action (default: all)
+            **parms: Only results whose parameters have these values
+
+        Returns:
+            int: Number of results dropped
+        """
+        with self._lock:
+            keys = [
+                key for key, (_, name, entry_parms, _) in self._entries.items()
+                if (function_name is None or name == function_name)
+                and all(entry_parms.get(field) == value for field, value in parms.items())
+            ]
+            for key in keys:
+                self._count(self._entries.pop(key)[1], "invalidated")
+        return len(keys)
+
+    def clear(self):
+        """Drop every stored result (the counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Per-action counters and hit rates
+
+        Returns:
+            dict: Action name -> calls, hits, misses, uncached, invalidated
+                and hit_rate (hits / calls)
+        """
+        with self._lock:
+            return {
+                name: {**counts, "hit_rate": round(counts["hits"] / counts["calls"], 4) if counts["calls"] else 0.0}
+                for name, counts in self.counts.items()
+            }
+
+
+# Cache used by memoized_action (None turns memoization off)
+_action_cache = ActionCache()
+
+
+def get_action_cache():
+    """Get the cache used by the available actions, or None if memoization is off"""
+    return _action_cache
+
+
+def set_action_cache(cache):
+    """Replace the cache used by the available actions (None: off); returns the previous one"""
+    global _action_cache
+    previous, _action_cache = _action_cache, cache
+    return previous
+
+
+def memoized_action(action_function, validate=None):
+    """
+    Wrap an action so its calls go through the action cache
+
+    Args:
+        action_function (callable): The action
+        validate (callable): Check of a stored result before it is reused
+            (see ActionCache.call)
+    """
+    @functools.wraps(action_function)
+    def wrapper(**function_parms):
+        if _action_cache is None:
+            return action_function(**function_parms)
+        return _action_cache.call(action_function.__name__, action_function, function_parms, validate)
+    return wrapper
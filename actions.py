@@ -1,18 +1,13 @@
-import os
 from datetime import datetime
+import itertools
 import random
-from openai import OpenAI
-from dotenv import load_dotenv
-import json
 
-# Load environment variables
-load_dotenv()
-
-# Set up OpenAI API key
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=openai_api_key)
+from action_cache import get_action_cache, memoized_action
+from benchmark_index import BenchmarkIndex, campaign_type
+from content_templates import get_registry, render_content
+from duplicate_index import DEFAULT_WINDOW_DAYS, get_duplicate_index, new_content_id
+from schedule_store import get_schedule_store, new_scheduling_id, parse_time_slot, publish_at
+from tracing import traced_action
 
 
 # Simulated campaign data - in a real implementation, this would come from an API
@@ -54,12 +49,56 @@ CAMPAIGN_DATA = {
 }
 
 
-def analyze_campaign_data(campaign_id):
+# Percentile index over CAMPAIGN_DATA (built on first use, see get_benchmark_index)
+_benchmark_index = None
+
+# Bumped by upsert_campaign, so copies of CAMPAIGN_DATA (the campaign_store
+# frame) know when to rebuild
+_campaign_data_version = 0
+
+
+def get_benchmark_index():
+    """Get the cross-campaign benchmark index, building it on first use"""
+    global _benchmark_index
+    if _benchmark_index is None:
+        _benchmark_index = BenchmarkIndex.from_campaigns(CAMPAIGN_DATA)
+    return _benchmark_index
+
+
+def campaign_data_version():
+    """Counter that changes whenever upsert_campaign changes CAMPAIGN_DATA"""
+    return _campaign_data_version
+
+
+def upsert_campaign(campaign_id, metrics):
+    """
+    Add or replace a campaign and update the benchmark index incrementally
+
+    The default campaign store is rebuilt on its next use.
+
+    Args:
+        campaign_id (str): Campaign ID
+        metrics (dict): Campaign metrics
+    """
+    global _campaign_data_version
+    CAMPAIGN_DATA[campaign_id] = metrics
+    _campaign_data_version += 1
+    if _benchmark_index is not None:
+        _benchmark_index.add_campaign(campaign_id, metrics)
+    # Peer comparisons depend on every campaign, so all analyses are stale
+    cache = get_action_cache()
+    if cache is not None:
+        cache.invalidate("analyze_campaign_data")
+
+
+def analyze_campaign_data(campaign_id, compare_to_peers=False):
     """
     Analyze the performance of a marketing campaign
 
     Args:
         campaign_id (str): ID of the campaign to analyze
+        compare_to_peers (bool): Add percentile ranks against all stored
+            campaigns of the same type
 
     Returns:
         dict: Campaign analysis with key metrics and insights
@@ -115,6 +154,16 @@ def analyze_campaign_data(campaign_id):
         "analysis_date": datetime.now().strftime("%Y-%m-%d")
     }
 
+    if compare_to_peers:
+        index = get_benchmark_index()
+        kind = campaign_type(campaign)
+        for metric, value in campaign.items():
+            if metric.endswith("_rate"):
+                insight = index.insight(metric, value, kind)
+                if insight:
+                    insights.append(insight)
+        analysis["percentiles"] = index.describe(campaign)
+
     return analysis
 
 
@@ -130,151 +179,103 @@ def generate_content(topic, audience, tone="professional", platform=None, length
         length (str): Content length (short, medium, long)
 
     Returns:
-        dict: Generated content with metadata
+        dict: Generated content with metadata; near_duplicates lists
+            similar posts generated or scheduled for the same platform
+            within DEFAULT_WINDOW_DAYS
     """
-    from datetime import datetime
-    import random
+    # Templates are compiled once from content_templates.json
+    variant = get_registry().lookup(tone, platform, length)
+    content, hashtags = render_content(variant, topic, audience, random)
+    generated_at = datetime.now()
 
-    # Initialize response structure
-    response = {
+    return {
         "topic": topic,
         "audience": audience,
         "tone": tone,
         "platform": platform,
         "length": length,
-        "content": "",
-        "hashtags": [],
-        "estimated_reading_time": "",
-        "generation_date": datetime.now().strftime("%Y-%m-%d %H:%M")
+        "content": content,
+        "hashtags": hashtags,
+        "estimated_reading_time": variant.estimated_reading_time,
+        "generation_date": generated_at.strftime("%Y-%m-%d %H:%M"),
+        "near_duplicates": _near_duplicates(new_content_id(), content, platform, generated_at, "generated")
     }
 
-    # Enhanced templates for professional tone
-    professional_templates = [
-        "New research reveals that {topic} is transforming how {audience} approach strategic decisions. Organizations implementing these advanced solutions are seeing up to 40% higher engagement and 25% improved ROI. Learn the key implementation frameworks that industry leaders are using to maintain competitive advantage.",
-        
-        "In today's data-driven marketplace, {audience} need to leverage {topic} to stay ahead. Our analysis of 500+ industry leaders shows that early adopters are experiencing 3X faster optimization and significantly higher conversion rates. Here's the strategic roadmap for implementation that's generating measurable results.",
-        
-        "The convergence of {topic} with traditional frameworks presents unprecedented opportunities for {audience}. Forward-thinking organizations are reducing development cycles by 60% while improving precision metrics. Discover the implementation pathway that leading companies are following for sustainable growth."
-    ]
-
-    # Enhanced templates for casual tone
-    casual_templates = [
-        "Have you been wondering how {topic} could transform your results? We've been testing these approaches with clients across industries, and the outcomes are honestly impressive. One client saw their engagement metrics double in just 6 weeks! Here's what we're learning that you can apply right away...",
-        
-        "Let's talk about {topic} - it's completely reshaping possibilities for {audience} everywhere. We've collected insights from dozens of successful implementations, and there's a clear pattern emerging among top performers. The best part? The implementation pathway is more accessible than most realize!",
-        
-        "The {topic} revolution isn't coming—it's already here, and {audience} who are jumping in now are seeing fantastic outcomes. We've been tracking early adopters, and they're reporting an average 45% improvement in effectiveness. Here's your roadmap to joining their ranks."
-    ]
 
-    # Enhanced templates for enthusiastic tone
-    enthusiastic_templates = [
-        "🚀 BREAKTHROUGH ALERT! {topic} is absolutely TRANSFORMING how {audience} connect with their market! Latest research shows a STAGGERING 87% improvement in key metrics when properly implemented! Don't miss this opportunity to revolutionize your approach!",
-        
-        "🔥 GAME-CHANGER for {audience}! {topic} is redefining what's possible in today's landscape! Organizations implementing these approaches are seeing INCREDIBLE results—some reporting 3X HIGHER conversion rates! Here's how YOU can harness this power! 🔥",
-        
-        "⚡ ATTENTION {audience}! The {topic} revolution is creating MASSIVE opportunities that most are missing! Exclusive analysis shows early adopters outperforming competitors by 155%! Don't get left behind—these insights will TRANSFORM your strategy! ⚡"
-    ]
-
-    # Select appropriate template based on tone
-    if tone.lower() in ["professional", "formal", "insightful", "informative", "educational"]:
-        templates = professional_templates
-    elif tone.lower() in ["casual", "conversational", "friendly", "approachable"]:
-        templates = casual_templates
-    elif tone.lower() in ["enthusiastic", "exciting", "energetic", "persuasive", "engaging"]:
-        templates = enthusiastic_templates
-    else:
-        templates = professional_templates
-
-    # Select a random template from the appropriate category
-    template = random.choice(templates)
-
-    # Generate content by filling in the template
-    content = template.format(topic=topic, audience=audience)
-
-    # Adjust content length
-    if length.lower() == "short":
-        # For short content, use just the first sentence
-        first_sentence_end = content.find('.')
-        if first_sentence_end > 0:
-            content = content[:first_sentence_end + 1]
-    elif length.lower() == "long":
-        # For long content, add additional context
-        additional_context = f"\n\nOur team has analyzed the latest trends in {topic} and compiled actionable strategies specifically designed for {audience}. The data reveals that companies implementing these approaches are consistently outperforming market averages across key metrics. By adopting these evidence-based methodologies, you can position your organization at the forefront of industry developments while optimizing resource allocation and maximizing return on investment."
-        content += additional_context
-
-    # Generate platform-specific elements
-    if platform:
-        if platform.lower() == "linkedin":
-            response["hashtags"] = [
-                f"#{topic.replace(' ', '').replace(':', '')}",  # Remove spaces and colons from hashtag
-                "#CFO",
-                "#AIinFinance",
-                "#FinancialLeadership",
-                "#DigitalTransformation",
-                "#FinanceInnovation"
-            ]
-            # Refined content for CFOs on LinkedIn
-            if length.lower() == "medium":
-                content = f"CFOs are increasingly leveraging AI to drive strategic financial decisions. From automating routine tasks to providing predictive insights, AI empowers CFOs to optimize resource allocation, mitigate risks, and enhance overall financial performance. #CFO #AIinFinance #FinanceTransformation"
-            elif length.lower() == "long":
-                content = f"CFOs are at the forefront of digital transformation, with AI emerging as a crucial tool for strategic financial management. By automating routine tasks, AI frees up CFOs to focus on higher-level analysis and decision-making.  Predictive analytics, powered by AI, enable CFOs to forecast financial performance with greater accuracy, identify potential risks, and optimize resource allocation.  Moreover, AI facilitates enhanced data visualization, providing CFOs with clear, actionable insights to drive growth and profitability. #CFO #AIinFinance #FinanceTransformation #DigitalTransformation #FinancialLeadership"
-            else:
-                 content = f"AI is changing the role of the CFO.  Here's how #CFOs can use it. #AIinFinance"
-
-            response["estimated_reading_time"] = "1-2 min read"
-            # Debugging LinkedIn content
-            print(f"DEBUG: LinkedIn content before return: {content}")
-        elif platform.lower() in ["twitter", "x"]:
-            # Ensure content is concise for Twitter
-            if len(content) > 280:
-                content = content[:277] + "..."
-            response["hashtags"] = [
-                f"#{topic.replace(' ', '')}",
-                "#MarketingStrategy"
-            ]
-
-        elif platform.lower() == "instagram":
-            response["hashtags"] = [
-                f"#{topic.replace(' ', '')}",
-                "#MarketingTips",
-                "#BusinessStrategy",
-                "#DigitalMarketing",
-                "#GrowthHacking"
-            ]
-
-        elif platform.lower() == "email":
-            # Add email-specific formatting
-            subject_line = f"New insights on {topic} for {audience}"
-            content = f"Subject: {subject_line}\n\nHello {audience} professional,\n\n{content}\n\nBest regards,\nYour Marketing Team"
+def generate_content_batch(topics, audiences, tones=("professional",), platforms=(None,),
+                           lengths=("medium",), seed=None, check_duplicates=True):
+    """
+    Generate content for every combination of the given parameters
 
-    # Update response with generated content
-    response["content"] = content
-    print(f"DEBUG: generate_content output: {response}")  # <-- ADDED THIS LINE
-    return response
+    Results are yielded one at a time, so large content calendars can be
+    streamed to a file without holding them in memory. Like generate_content,
+    each post is checked against (and added to) the duplicate index, so
+    repeats within the batch are flagged too.
 
+    Args:
+        topics (list): Topics
+        audiences (list): Target audiences
+        tones (list): Tones of voice
+        platforms (list): Platforms (None for no platform)
+        lengths (list): Content lengths
+        seed (int): Seed for the template choice, for reproducible batches
+        check_duplicates (bool): Check posts against the duplicate index
+            (off: near_duplicates is always empty and nothing is indexed)
+
+    Yields:
+        dict: Generated content, in the same format as generate_content
+    """
+    registry = get_registry()
+    rng = random.Random(seed)
+    # One timestamp for the whole batch
+    generated_at = datetime.now()
+    generation_date = generated_at.strftime("%Y-%m-%d %H:%M")
+
+    for tone, platform, length in itertools.product(tones, platforms, lengths):
+        variant = registry.lookup(tone, platform, length)
+        for topic, audience in itertools.product(topics, audiences):
+            content, hashtags = render_content(variant, topic, audience, rng)
+            near_duplicates = (_near_duplicates(new_content_id(), content, platform, generated_at, "generated")
+                               if check_duplicates else [])
+            yield {
+                "topic": topic,
+                "audience": audience,
+                "tone": tone,
+                "platform": platform,
+                "length": length,
+                "content": content,
+                "hashtags": hashtags,
+                "estimated_reading_time": variant.estimated_reading_time,
+                "generation_date": generation_date,
+                "near_duplicates": near_duplicates
+            }
+
+
+
+def _near_duplicates(doc_id, content, platform, post_date, kind, kinds=None):
+    """Similar posts in the duplicate index (the post is added to it)"""
+    index = get_duplicate_index()
+    if index is None:
+        return []
+    return index.check(doc_id, content, platform=platform, date=post_date, kind=kind,
+                       window_days=DEFAULT_WINDOW_DAYS, kinds=kinds)
 
 
-def schedule_content(content, platform, publish_date, time_slot=None):
+def _prepare_schedule(content, platform, publish_date, time_slot=None):
     """
-    Schedule content for publishing on specified platform
-
-    Args:
-        content (str): The content to be scheduled
-        platform (str): Platform to publish on
-        publish_date (str): Date to publish (YYYY-MM-DD)
-        time_slot (str): Optional time slot (e.g., "9:00 AM")
+    Validate a scheduling request and build its store record
 
     Returns:
-        dict: Scheduling confirmation with details
+        tuple: (record, warnings), or (error dict, None) if the request is invalid
     """
     # Validate date format
     try:
         parsed_date = datetime.strptime(publish_date, "%Y-%m-%d")
         # Ensure date is not in the past
         if parsed_date < datetime.now():
-            return {"error": "Cannot schedule content in the past"}
+            return {"error": "Cannot schedule content in the past"}, None
     except ValueError:
-        return {"error": "Invalid date format. Use %Y-%m-%d"}
+        return {"error": "Invalid date format. Use %Y-%m-%d"}, None
 
     # Set default time slot based on platform best practices if not provided
     if not time_slot:
@@ -289,6 +290,10 @@ def schedule_content(content, platform, publish_date, time_slot=None):
         else:
             time_slot = "9:00 AM"
 
+    # A typo in the slot must not quietly schedule the post for midnight
+    if parse_time_slot(time_slot) is None:
+        return {"error": "Invalid time slot. Use e.g. 9:00 AM or 14:30"}, None
+
     # Content validation based on platform
     warnings = []
     if platform.lower() == "twitter" or platform.lower() == "x":
@@ -296,155 +301,158 @@ def schedule_content(content, platform, publish_date, time_slot=None):
             warnings.append("Content exceeds Twitter's 280 character limit. It will be truncated.")
             content = content[:277] + "..."
 
-    # In a real implementation, this would integrate with a scheduling API
-    # For demo purposes, we'll return a confirmation
-
-    response = {
-        "status": "scheduled",
-        "platform": platform,
+    record = {
+        "scheduling_id": new_scheduling_id(),
+        "platform": platform.lower(),
+        "publish_at": publish_at(publish_date, time_slot),
         "publish_date": publish_date,
         "time_slot": time_slot,
+        "content": content,
+        "status": "scheduled",
+        "scheduled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    return record, warnings
+
+
+def _schedule_response(record, platform, warnings, conflicts, near_duplicates):
+    if conflicts:
+        warnings = warnings + [
+            f"{record['time_slot']} on {record['publish_date']} already has content scheduled on {platform}: "
+            + ", ".join(conflicts)
+        ]
+    if near_duplicates:
+        warnings = warnings + [
+            f"Nearly identical content is already scheduled on {platform} within {DEFAULT_WINDOW_DAYS} days of "
+            f"{record['publish_date']}: " + ", ".join(match["doc_id"] for match in near_duplicates)
+        ]
+    content = record["content"]
+    return {
+        "status": "scheduled",
+        "platform": platform,
+        "publish_date": record["publish_date"],
+        "time_slot": record["time_slot"],
         "content_preview": content[:100] + "..." if len(content) > 100 else content,
         "full_content_length": len(content),
         "warnings": warnings,
-        "scheduling_id": f"sched_{int(datetime.now().timestamp())}",
-        "scheduled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "near_duplicates": near_duplicates,
+        "scheduling_id": record["scheduling_id"],
+        "scheduled_at": record["scheduled_at"]
     }
 
-    return response
 
+def _scheduled_duplicates(record):
+    return _near_duplicates(record["scheduling_id"], record["content"], record["platform"], record["publish_date"],
+                            "scheduled", kinds=["scheduled"])
+
+
+def schedule_content(content, platform, publish_date, time_slot=None):
+    """
+    Schedule content for publishing on specified platform
 
-import os
-from dotenv import load_dotenv
-from openai import OpenAI  # Corrected import
-import json
+    The item is saved in the schedule store; a warning is added if the
+    platform already has content in the same time slot, or nearly identical
+    content scheduled within DEFAULT_WINDOW_DAYS (see duplicate_index.py).
 
-# Load environment variables
-load_dotenv()
+    Args:
+        content (str): The content to be scheduled
+        platform (str): Platform to publish on
+        publish_date (str): Date to publish (YYYY-MM-DD)
+        time_slot (str): Optional time slot (e.g., "9:00 AM")
 
-# Set up OpenAI API key
-openai_api_key = os.getenv("OPENAI_API_KEY")
+    Returns:
+        dict: Scheduling confirmation with details
+    """
+    record, warnings = _prepare_schedule(content, platform, publish_date, time_slot)
+    if warnings is None:
+        return record
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=openai_api_key)  # Initialize client
+    store = get_schedule_store()
+    conflicts = store.conflicts(record["platform"], record["publish_at"])
+    store.add(record)
+    near_duplicates = _scheduled_duplicates(record)
+    return _schedule_response(record, platform, warnings, conflicts, near_duplicates)
 
-# Define the system prompt
-workflow_system_prompt = """
-You are a marketing workflow agent. Your job is to help users automate their marketing tasks.
-You can analyze campaign data, generate content, and schedule posts.
-"""
 
-# Define the function to extract JSON
-def extract_json(text):
+def schedule_content_bulk(items, store=None):
     """
-    Extracts the first JSON object from a given text string.
+    Schedule many items in a single transaction
 
     Args:
-        text (str): The text string to search for JSON within.
+        items (list): Dicts with schedule_content's arguments (content,
+            platform, publish_date and optionally time_slot)
+        store (ScheduleStore): Store to write to (default: the shared store)
 
     Returns:
-        list: A list containing the extracted JSON object (as a dict), or an empty list if no JSON is found.
+        list: One schedule_content-style result per item, in order (invalid
+            items get an error dict and are not saved)
     """
-    json_start = text.find('{')
-    if json_start == -1:
-        return []
-    json_end = text.find('}', json_start) + 1
-    if json_end == 0:
-        return []
+    store = store or get_schedule_store()
+    results, records = [], []
+    slots = {}  # (platform, publish_at) -> IDs already in the slot, looked up once per slot
+    for item in items:
+        record, warnings = _prepare_schedule(
+            item["content"], item["platform"], item["publish_date"], item.get("time_slot")
+        )
+        if warnings is None:
+            results.append(record)
+            continue
+        slot = (record["platform"], record["publish_at"])
+        if slot not in slots:
+            slots[slot] = store.conflicts(*slot)
+        conflicts = list(slots[slot])
+        slots[slot].append(record["scheduling_id"])
+        records.append(record)
+        results.append((record, item["platform"], warnings, conflicts))
+
+    store.add_many(records)
+    # Checked in order, so repeats within the batch are flagged too
+    return [
+        result if isinstance(result, dict) else _schedule_response(*result, _scheduled_duplicates(result[0]))
+        for result in results
+    ]
 
-    json_str = text[json_start:json_end]
-    try:
-        json_object = json.loads(json_str)
-        return [json_object]  # Wrap in a list for consistency
-    except json.JSONDecodeError:
-        return []
 
+def _schedule_still_valid(result):
+    """Replay a scheduling only while its entry is in the store and has not failed"""
+    record = get_schedule_store().get(result["scheduling_id"])
+    return record is not None and record["status"] != "failed"
 
 
-# Available actions
-available_actions = {
-    "analyze_campaign_data": analyze_campaign_data,
-    "generate_content": generate_content,
-    "schedule_content": schedule_content
-}
+def invoke_action(action_function, function_parms):
+    """
+    Call an action with parameters from the model
+
+    Args:
+        action_function (callable): The action
+        function_parms: Parameters from the model (content references
+            already resolved)
+
+    Returns:
+        The action result, or {"error": ...} for parameters that are not an
+        object or do not fit the action, so the model can correct itself
+    """
+    if not isinstance(function_parms, dict):
+        return {"error": "function_parms must be a JSON object"}
+    try:
+        return action_function(**function_parms)
+    except TypeError as e:
+        return {"error": f"Invalid arguments: {e}"}
 
 
-def generate_response(messages, model="gpt-3.5-turbo"):
-    """Generate a response from the language model"""
+async def ainvoke_action(action_function, function_parms):
+    """Async version of invoke_action(); action_function is a coroutine function"""
+    if not isinstance(function_parms, dict):
+        return {"error": "function_parms must be a JSON object"}
     try:
-        response = client.chat.completions.create(  # corrected function
-            model=model,
-            messages=messages
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error generating response: {e}"
-
-
-def run_workflow_agent():
-    """Run the Marketing Workflow Agent"""
-    print("\n=== Marketing Workflow Agent ===")
-    print("This agent can analyze campaigns, generate content, and schedule posts.")
-    print("Type 'exit' to quit.\n")
-
-    # Initialize conversation with system prompt
-    messages = [{"role": "system", "content": workflow_system_prompt}]
-
-    while True:
-        # Get user input
-        user_input = input("\nWhat marketing task can I help you with? ")
-        if user_input.lower() == 'exit':
-            print("Goodbye!")
-            break
-
-        # Add user input to messages
-        messages.append({"role": "user", "content": user_input})
-
-        # Initialize loop variables
-        turn_count = 1
-        max_turns = 5
-
-        # Agent loop
-        while turn_count < max_turns:
-            print(f"\n[Thinking... Step {turn_count}/{max_turns}]")
-
-            # Get response from language model
-            ai_response = generate_response(messages)
-            print(f"\nWorkflow Agent: {ai_response}")
-
-            # Check if we need to execute an action
-            json_function = extract_json(ai_response)
-
-            if json_function:
-                # We found a function call
-                function_name = json_function[0]['function_name']
-                function_parms = json_function[0]['function_parms']
-
-                # Check if function exists
-                if function_name not in available_actions:
-                    print(f"Error: Unknown action '{function_name}'")
-                    break
-
-                # Execute the function
-                print(f"\n[Executing {function_name}...] ")  # add action name
-                action_function = available_actions[function_name]
-                result = action_function(**function_parms)
-
-                # Format the result
-                function_result_message = f"Action_Response: {result}"
-                print(f"\n[Result: {function_result_message}]")  # print result
-
-                # Add messages to conversation
-                messages.append({"role": "assistant", "content": ai_response})
-                messages.append({"role": "user", "content": function_result_message})
-
-                turn_count += 1
-            else:
-                # No function call, we're done
-                messages.append({"role": "assistant", "content": ai_response})
-                break
-        
-        # Print the final output from the agent
-        print(messages[-1]['content'])
-if __name__ == "__main__":
-    run_workflow_agent()
+        return await action_function(**function_parms)
+    except TypeError as e:
+        return {"error": f"Invalid arguments: {e}"}
+
+
+# Available actions (each call is recorded as a span when tracing is enabled,
+# and repeat calls are served by the action cache, see action_cache.py)
+available_actions = {
+    "analyze_campaign_data": traced_action(memoized_action(analyze_campaign_data)),
+    "generate_content": traced_action(memoized_action(generate_content)),
+    "schedule_content": traced_action(memoized_action(schedule_content, validate=_schedule_still_valid))
+}
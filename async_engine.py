@@ -0,0 +1,269 @@
+# async_engine.py
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+
+from history import ConversationHistory
+from json_helpers import extract_actions
+from llm_backend import DEFAULT_MODEL, get_backend
+from llm_client import LLMUnavailableError
+from actions import ainvoke_action, available_actions
+from prompts import build_workflow_prompt
+from tracing import set_trace_context, span
+
+
+def make_async_action(action_function):
+    """Wrap a blocking action so it runs in a worker thread"""
+    async def async_action(**function_parms):
+        return await asyncio.to_thread(action_function, **function_parms)
+
+    async_action.__name__ = action_function.__name__
+    async_action.__doc__ = action_function.__doc__
+    return async_action
+
+
+# Async versions of the available actions
+async_available_actions = {
+    name: make_async_action(action_function)
+    for name, action_function in available_actions.items()
+}
+
+
+class FairLimiter:
+    """
+    Concurrency cap that hands out free slots round-robin across sessions
+
+    A plain semaphore lets one busy session queue many requests ahead of
+    everyone else. Here each session has its own wait queue, and a freed
+    slot goes to the next session in rotation, so every waiting session
+    gets a turn before any session gets a second one.
+
+    Args:
+        max_concurrency (int): Maximum number of slots held at once
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.in_use = 0
+        self._waiting = OrderedDict()  # session_id -> deque of futures
+
+    @property
+    def queue_depth(self):
+        """Number of requests waiting for a slot"""
+        return sum(len(queue) for queue in self._waiting.values())
+
+    async def acquire(self, session_id):
+        """Wait for a slot on behalf of a session"""
+        if self.in_use < self.max_concurrency and not self._waiting:
+            self.in_use += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(session_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before cancellation: pass it on
+                self.release()
+            else:
+                self._discard(session_id, future)
+            raise
+
+    def release(self):
+        """Free a slot and grant it to the next session in rotation"""
+        self.in_use -= 1
+        while self._waiting:
+            session_id, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            # Move the session to the back of the rotation
+            del self._waiting[session_id]
+            if queue:
+                self._waiting[session_id] = queue
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+                return
+
+    def _discard(self, session_id, future):
+        queue = self._waiting.get(session_id)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[session_id]
+
+    def slot(self, session_id):
+        """Async context manager holding a slot for the duration of a block"""
+        return _LimiterSlot(self, session_id)
+
+
+class _LimiterSlot:
+    def __init__(self, limiter, session_id):
+        self.limiter = limiter
+        self.session_id = session_id
+
+    async def __aenter__(self):
+        await self.limiter.acquire(self.session_id)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release()
+
+
+class AsyncWorkflowEngine:
+    """
+    Runs many workflow sessions concurrently on one event loop
+
+    Args:
+        max_concurrency (int): Maximum number of LLM requests in flight
+        model (str): Default model for new sessions
+        backend (LLMBackend): Model backend (defaults to the shared backend,
+            whose async client pools connections across sessions)
+        response_cache (ResponseCache): Optional cache shared by all sessions
+        router (ModelRouter): Picks the model per step for every session
+            (see model_router.py), or None to use model throughout
+    """
+
+    def __init__(self, max_concurrency=32, model=DEFAULT_MODEL, backend=None, response_cache=None,
+                 router=None):
+        self.model = model
+        self.response_cache = response_cache
+        self.router = router
+        self.limiter = FairLimiter(max_concurrency)
+        self.backend = backend or get_backend()
+        self._session_ids = itertools.count(1)
+
+    def create_session(self, session_id=None, token_budget=None, few_shot="full"):
+        """Create a new session with its own conversation state"""
+        if session_id is None:
+            session_id = f"session_{next(self._session_ids)}"
+        return AsyncWorkflowSession(session_id, engine=self, token_budget=token_budget, few_shot=few_shot)
+
+    async def generate_response(self, messages, session_id, model=None):
+        """Generate a response, waiting for a fair share of the concurrency cap"""
+        model = model or self.model
+        with span("generate_response", model=model) as call:
+            if self.response_cache is not None:
+                # SQLite lookups run in a worker thread, off the event loop
+                cached = await asyncio.to_thread(self.response_cache.get, model, messages)
+                if cached is not None:
+                    call.set(cached=True)
+                    return cached
+
+            waited = time.perf_counter()
+            async with self.limiter.slot(session_id):
+                call.set(queue_ms=round((time.perf_counter() - waited) * 1000, 3))
+                completion = await self.backend.acomplete(messages, model)
+            call.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+            content = completion.text
+
+            if self.response_cache is not None:
+                await asyncio.to_thread(self.response_cache.set, model, messages, content)
+            return content
+
+    async def run_many(self, tasks):
+        """
+        Run one task per new session concurrently
+
+        Args:
+            tasks (list): User task strings
+
+        Returns:
+            list: Final answers, in the same order as tasks
+        """
+        sessions = [self.create_session() for _ in tasks]
+        return await asyncio.gather(*(
+            session.run_task(task) for session, task in zip(sessions, tasks)
+        ))
+
+
+class AsyncWorkflowSession:
+    """
+    One user's conversation with the Marketing Workflow Agent
+
+    Args:
+        session_id (str): Identifier used for fair scheduling
+        engine (AsyncWorkflowEngine): Engine that owns the shared client
+        max_turns (int): Maximum agent steps per task
+        token_budget (int): Maximum prompt tokens per call, or None
+        few_shot (str): Worked example in the system prompt ("full",
+            "compact" or "none")
+    """
+
+    def __init__(self, session_id, engine, max_turns=5, token_budget=None, few_shot="full"):
+        self.session_id = session_id
+        self.engine = engine
+        self.max_turns = max_turns
+        self.history = ConversationHistory(build_workflow_prompt(few_shot), token_budget=token_budget)
+        self.events = []
+        self.on_event = None
+
+    def _emit(self, event):
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    async def run_task(self, user_input, on_event=None):
+        """
+        Run one user task through the agent loop
+
+        Args:
+            user_input (str): The marketing task
+            on_event (callable): Called with each event as it happens (task,
+                response, action_call, action, error)
+
+        Returns:
+            str: The agent's last reply
+        """
+        self.on_event = on_event
+        try:
+            return await self._run_task(user_input)
+        finally:
+            self.on_event = None
+
+    async def _generate(self, messages):
+        engine = self.engine
+        if engine.router is None:
+            return await engine.generate_response(messages, self.session_id)
+        ai_response, _ = await engine.router.arun_step(
+            messages, lambda messages, model: engine.generate_response(messages, self.session_id, model),
+            async_available_actions
+        )
+        return ai_response
+
+    async def _run_task(self, user_input):
+        self.history.start_task(user_input)
+        self._emit({"type": "task", "content": user_input})
+
+        turn_count = 1
+        ai_response = ""
+        while turn_count < self.max_turns:
+            set_trace_context(session_id=self.session_id, turn=turn_count)
+            try:
+                ai_response = await self._generate(self.history.build())
+            except LLMUnavailableError as e:
+                self._emit({"type": "error", "content": str(e)})
+                break
+            usage = self.history.record_completion(ai_response)
+            self._emit({"type": "response", "turn": turn_count, "content": ai_response, **usage})
+            self.history.add_assistant(ai_response)
+
+            json_function = extract_actions(ai_response)
+            if not json_function:
+                break
+
+            function_name = json_function[0]['function_name']
+            function_parms = json_function[0]['function_parms']
+            if function_name not in async_available_actions:
+                self._emit({"type": "error", "content": f"Unknown action '{function_name}'"})
+                break
+
+            self._emit({"type": "action_call", "name": function_name, "parms": function_parms})
+            result = await ainvoke_action(async_available_actions[function_name],
+                                          self.history.encoder.resolve(function_parms))
+            self._emit({"type": "action", "name": function_name, "result": result})
+            self.history.add_action_response(function_name, result)
+
+            turn_count += 1
+
+        return ai_response
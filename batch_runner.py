@@ -0,0 +1,268 @@
+# batch_runner.py
+"""
+Run a JSONL file of marketing tasks through the agent without a terminal
+
+Each input line is {"id": "...", "task": "..."} (id defaults to the line
+number). Tasks run on a bounded pool of workers sharing one
+AsyncWorkflowEngine, and every result is appended to the output JSONL as
+soon as it finishes. The output file doubles as the checkpoint: on restart,
+tasks that already have a successful result are skipped, so a crashed run
+picks up where it stopped. Failed tasks are run again.
+
+Usage:
+    python batch_runner.py tasks.jsonl --output results.jsonl [--workers 16]
+    python batch_runner.py tasks.jsonl --output results.jsonl --offline --latency 0.2
+    python batch_runner.py --sample 1000 > tasks.jsonl
+"""
+import asyncio
+import json
+import os
+import time
+
+from action_cache import get_action_cache, set_action_cache
+from async_engine import AsyncWorkflowEngine
+from duplicate_index import current_duplicate_index
+
+SAMPLE_CAMPAIGNS = ["email_campaign_q1", "social_campaign_summer", "webinar_series_2023"]
+
+
+def read_tasks(path):
+    """
+    Yield (task_id, task) pairs from a JSONL file
+
+    Blank lines are skipped; a line without an "id" gets its line number.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get("id", line_number)), record["task"]
+
+
+def completed_task_ids(path):
+    """
+    IDs of tasks with a successful result in an output file
+
+    A line cut short by a crash is ignored (and its task runs again), as is
+    any line that is not a result record with an "id".
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            if not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+
+def _repair_tail(path):
+    """Make sure the output ends with a newline so appended records start on their own line"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class BatchRunner:
+    """
+    Runs tasks from a JSONL file on a bounded worker pool
+
+    Args:
+        engine (AsyncWorkflowEngine): Engine the sessions share (its
+            max_concurrency caps model requests in flight)
+        workers (int): Tasks in progress at once
+        token_budget (int): Maximum prompt tokens per call, or None
+        few_shot (str): Worked example in the system prompt
+        progress_every (int): Print progress after this many results (0: never)
+    """
+
+    def __init__(self, engine=None, workers=16, token_budget=None, few_shot="full", progress_every=0):
+        self.engine = engine or AsyncWorkflowEngine(max_concurrency=workers)
+        self.workers = workers
+        self.token_budget = token_budget
+        self.few_shot = few_shot
+        self.progress_every = progress_every
+        self.latencies = []
+        self.counts = {"completed": 0, "failed": 0, "skipped": 0}
+        self.elapsed = None
+
+    async def run_one(self, task_id, task):
+        """
+        Run one task in a new session
+
+        Returns:
+            dict: Result record for the output file
+        """
+        session = self.engine.create_session(
+            session_id=f"batch_{task_id}", token_budget=self.token_budget, few_shot=self.few_shot
+        )
+        started = time.perf_counter()
+        record = {"id": task_id, "task": task}
+        try:
+            record["answer"] = await session.run_task(task)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        record["actions"] = [event["name"] for event in session.events if event["type"] == "action"]
+        errors = [event["content"] for event in session.events if event["type"] == "error"]
+        if errors and "error" not in record:
+            record["error"] = errors[-1]
+        record.update(session.history.usage_totals())
+        return record
+
+    async def run(self, tasks, output_path, resume=True):
+        """
+        Run tasks and append their results to output_path
+
+        Args:
+            tasks (iterable): (task_id, task) pairs
+            output_path (str): JSONL file for results
+            resume (bool): Skip tasks that already succeeded in output_path
+
+        Returns:
+            dict: stats()
+        """
+        done = completed_task_ids(output_path) if resume else set()
+        _repair_tail(output_path)
+        pending = iter(tasks)
+        started = time.perf_counter()
+
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+            async def worker():
+                for task_id, task in pending:
+                    if task_id in done:
+                        self.counts["skipped"] += 1
+                        continue
+                    record = await self.run_one(task_id, task)
+                    # Written (and flushed) as soon as the task finishes, so the
+                    # file is an up-to-date checkpoint if the process dies
+                    out.write(json.dumps(record, default=str) + "\n")
+                    out.flush()
+                    self.latencies.append(record["latency_ms"])
+                    self.counts["failed" if record.get("error") else "completed"] += 1
+                    finished = self.counts["completed"] + self.counts["failed"]
+                    if self.progress_every and finished % self.progress_every == 0:
+                        elapsed = time.perf_counter() - started
+                        print(f"{finished} tasks, {finished / elapsed:.1f} tasks/s", flush=True)
+
+            # The workers share one iterator, so tasks are read as they are
+            # needed rather than all at once
+            await asyncio.gather(*(worker() for _ in range(self.workers)))
+
+        self.elapsed = time.perf_counter() - started
+        return self.stats()
+
+    def stats(self):
+        """
+        Counts, throughput and per-task latency percentiles
+
+        Returns:
+            dict: completed, failed, skipped, tasks_per_second, latency_*_ms,
+                action_cache (per-action hit rates), duplicates (near-duplicate
+                index size and flagged posts) and routes (per-route model
+                statistics, with a router)
+        """
+        latencies = sorted(self.latencies)
+        elapsed = self.elapsed
+        cache = get_action_cache()
+        duplicates = current_duplicate_index()
+        return {
+            **self.counts,
+            "seconds": round(elapsed, 3) if elapsed else None,
+            "tasks_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_p99_ms": _percentile(latencies, 99),
+            "latency_max_ms": latencies[-1] if latencies else None,
+            "action_cache": cache.stats() if cache is not None else None,
+            "duplicates": duplicates.stats() if duplicates is not None else None,
+            "routes": self.engine.router.stats() if self.engine.router is not None else None,
+        }
+
+
+def sample_tasks(count):
+    """Synthetic tasks for trying the runner (one per campaign in rotation)"""
+    for index in range(count):
+        campaign = SAMPLE_CAMPAIGNS[index % len(SAMPLE_CAMPAIGNS)]
+        yield {"id": f"task_{index + 1}",
+               "task": f"Analyze campaign {campaign}, write a LinkedIn post about the results and schedule it"}
+
+
+def main():
+    """Command-line entry point (the marketing-agent-batch console script)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a JSONL file of marketing tasks")
+    parser.add_argument("tasks", nargs="?", help="Input JSONL ({\"id\", \"task\"} per line)")
+    parser.add_argument("--output", default="results.jsonl", help="Results JSONL (also the checkpoint)")
+    parser.add_argument("--workers", type=int, default=16, help="Tasks in progress at once")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Model requests in flight (default: --workers)")
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--few-shot", choices=["full", "compact", "none"], default="full")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping finished tasks")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the scripted in-process model instead of an API, and keep scheduled posts in "
+                             "memory instead of the schedule store and duplicate index")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per call (--offline)")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="Simulated generation speed (--offline)")
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--no-action-cache", action="store_true",
+                        help="Run every action call instead of reusing results of repeat calls")
+    parser.add_argument("--route", action="store_true",
+                        help="Pick a model per step (see model_router.py; models from LLM_*_MODEL settings)")
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="Print N synthetic tasks as JSONL and exit")
+    args = parser.parse_args()
+
+    if args.sample is not None:
+        for record in sample_tasks(args.sample):
+            print(json.dumps(record))
+        return
+    if not args.tasks:
+        parser.error("the tasks file is required")
+    if args.no_action_cache:
+        set_action_cache(None)
+
+    backend = None
+    if args.offline:
+        from duplicate_index import DuplicateIndex, set_duplicate_index
+        from llm_backend import ScriptedBackend
+        from schedule_store import ScheduleStore, set_schedule_store
+
+        backend = ScriptedBackend(latency=args.latency, tokens_per_second=args.tokens_per_second)
+        # A stand-in run must not queue real posts for the dispatcher
+        set_schedule_store(ScheduleStore(":memory:"))
+        set_duplicate_index(DuplicateIndex(":memory:"))
+    router = None
+    if args.route:
+        from model_router import ModelRouter
+        router = ModelRouter.from_settings()
+    engine = AsyncWorkflowEngine(max_concurrency=args.max_concurrency or args.workers, backend=backend,
+                                 router=router)
+    runner = BatchRunner(engine, workers=args.workers, token_budget=args.token_budget,
+                         few_shot=args.few_shot, progress_every=args.progress_every)
+    stats = asyncio.run(runner.run(read_tasks(args.tasks), args.output, resume=not args.no_resume))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# benchmark_index.py
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# The metric that identifies each campaign type, in the order analyze_campaign_data checks them
+CAMPAIGN_TYPE_METRICS = [("email", "open_rate"), ("social", "engagement_rate"), ("webinar", "attendance_rate")]
+
+# Segment key that covers every campaign of a type
+ALL_SEGMENTS = "*"
+
+
+def campaign_type(metrics):
+    """
+    Work out a campaign's type from the metrics it has
+
+    Returns:
+        str: "email", "social", "webinar" or "other"
+    """
+    for type_name, metric in CAMPAIGN_TYPE_METRICS:
+        if metric in metrics:
+            return type_name
+    return "other"
+
+
+def ordinal(number):
+    """Format an integer as 1st, 2nd, 3rd, 83rd, ..."""
+    if 10 <= number % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+class BenchmarkIndex:
+    """
+    Sorted per-metric distributions across campaigns for percentile lookups
+
+    Values are kept in sorted lists keyed by (campaign type, audience
+    segment, metric), so percentile and rank lookups are a binary search.
+    Adding or changing a campaign only touches that campaign's entries.
+    Every campaign is also counted under the ALL_SEGMENTS segment.
+    """
+
+    def __init__(self):
+        self._values = {}     # (campaign_type, segment, metric) -> sorted list of values
+        self._campaigns = {}  # campaign_id -> list of (key, value) it contributed
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_campaigns(cls, campaigns):
+        """Build an index from a {campaign_id: metrics} dict like CAMPAIGN_DATA"""
+        index = cls()
+        for campaign_id, metrics in campaigns.items():
+            entries = cls._entries(metrics)
+            for key, value in entries:
+                index._values.setdefault(key, []).append(value)
+            index._campaigns[campaign_id] = entries
+        # Sort once instead of inserting in order
+        for values in index._values.values():
+            values.sort()
+        return index
+
+    def __len__(self):
+        return len(self._campaigns)
+
+    def __contains__(self, campaign_id):
+        return campaign_id in self._campaigns
+
+    @staticmethod
+    def _entries(metrics):
+        kind = campaign_type(metrics)
+        segments = [ALL_SEGMENTS] + list(metrics.get("audience_segments") or [])
+        entries = []
+        for metric, value in metrics.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            for segment in segments:
+                entries.append(((kind, segment, metric), value))
+        return entries
+
+    def add_campaign(self, campaign_id, metrics):
+        """
+        Add a campaign, or replace its values if it is already indexed
+
+        Args:
+            campaign_id (str): Campaign ID
+            metrics (dict): Campaign metrics (numeric fields are indexed)
+        """
+        entries = self._entries(metrics)
+        with self._lock:
+            self._remove(campaign_id)
+            for key, value in entries:
+                insort(self._values.setdefault(key, []), value)
+            self._campaigns[campaign_id] = entries
+
+    def remove_campaign(self, campaign_id):
+        """Remove a campaign's values from the index"""
+        with self._lock:
+            self._remove(campaign_id)
+
+    def _remove(self, campaign_id):
+        for key, value in self._campaigns.pop(campaign_id, []):
+            values = self._values[key]
+            del values[bisect_left(values, value)]
+            if not values:
+                del self._values[key]
+
+    def count(self, metric, campaign_type, segment=ALL_SEGMENTS):
+        """Number of campaigns with a value for a metric"""
+        return len(self._values.get((campaign_type, segment, metric), ()))
+
+    def percentile(self, metric, value, campaign_type, segment=ALL_SEGMENTS):
+        """
+        Percentile rank of a value among campaigns of a type and segment
+
+        Ties count as half below, so the median campaign is at the 50th.
+
+        Returns:
+            float: Percentile from 0 to 100, or None if there are no peers
+        """
+        values = self._values.get((campaign_type, segment, metric))
+        if not values:
+            return None
+        below = bisect_left(values, value)
+        equal = bisect_right(values, value) - below
+        return 100.0 * (below + 0.5 * equal) / len(values)
+
+    def rank(self, metric, value, campaign_type, segment=ALL_SEGMENTS):
+        """
+        Rank of a value among peers (1 = highest)
+
+        Returns:
+            tuple: (rank, number of peers), or None if there are no peers
+        """
+        values = self._values.get((campaign_type, segment, metric))
+        if not values:
+            return None
+        return len(values) - bisect_right(values, value) + 1, len(values)
+
+    def describe(self, metrics, segment=ALL_SEGMENTS):
+        """
+        Percentile of every numeric metric of a campaign within its type
+
+        Args:
+            metrics (dict): The campaign's metrics
+            segment (str): Audience segment to compare within
+
+        Returns:
+            dict: metric -> percentile (metrics without peers are left out)
+        """
+        kind = campaign_type(metrics)
+        percentiles = {}
+        for metric, value in metrics.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            result = self.percentile(metric, value, kind, segment)
+            if result is not None:
+                percentiles[metric] = round(result, 1)
+        return percentiles
+
+    def insight(self, metric, value, campaign_type, segment=ALL_SEGMENTS):
+        """
+        Human-readable percentile insight, e.g.
+        "Open rate is at the 83rd percentile of email campaigns"
+
+        Returns:
+            str: The insight, or None if there are no peers
+        """
+        result = self.percentile(metric, value, campaign_type, segment)
+        if result is None:
+            return None
+        peers = f"{campaign_type} campaigns"
+        if segment != ALL_SEGMENTS:
+            peers += f" for {segment}"
+        label = metric.replace("_", " ").capitalize()
+        return f"{label} is at the {ordinal(round(result))} percentile of {peers}"
@@ -0,0 +1,86 @@
+# benchmarks/bench_action_responses.py
+"""
+Token savings of the compact Action_Response encoding
+
+Runs the actions of the sample workflows (the worked example in the system
+prompt and the example workflows in the README) and counts the tokens of
+each result as the agent used to send it (f"Action_Response: {result}", a
+Python repr) and as ResultEncoder sends it now.
+
+Usage:
+    python benchmarks/bench_action_responses.py [--preview-chars 160]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import actions
+from duplicate_index import DuplicateIndex, set_duplicate_index
+from result_encoder import ResultEncoder
+from schedule_store import ScheduleStore, set_schedule_store
+from token_counter import count_tokens
+
+# (workflow, function_name, function_parms)
+SAMPLE_STEPS = [
+    ("prompt example", "analyze_campaign_data", {"campaign_id": "email_campaign_q1"}),
+    ("prompt example", "generate_content", {
+        "topic": "AI Marketing ROI optimization", "audience": "Marketing Managers",
+        "tone": "professional", "platform": "email", "length": "medium"}),
+    ("content creation", "generate_content", {
+        "topic": "AI in marketing", "audience": "CMOs", "tone": "professional",
+        "platform": "LinkedIn", "length": "long"}),
+    ("content creation", "schedule_content", {
+        "content": "@content", "platform": "LinkedIn", "publish_date": "2099-05-06", "time_slot": "9:00 AM"}),
+    ("campaign analysis", "analyze_campaign_data", {"campaign_id": "social_campaign_summer", "compare_to_peers": True}),
+    ("campaign analysis", "generate_content", {
+        "topic": "Lead generation case studies", "audience": "Digital Marketers", "tone": "casual",
+        "platform": "Twitter", "length": "medium"}),
+    ("content calendar", "analyze_campaign_data", {"campaign_id": "webinar_series_2023"}),
+    ("content calendar", "generate_content", {
+        "topic": "Webinar recap", "audience": "Marketing Managers", "tone": "enthusiastic",
+        "platform": "Instagram", "length": "medium"}),
+    ("content calendar", "schedule_content", {
+        "content": "@content", "platform": "Instagram", "publish_date": "2099-05-07", "time_slot": "10:00 AM"}),
+    ("content calendar", "schedule_content", {
+        "content": "@content", "platform": "Instagram", "publish_date": "2099-05-07", "time_slot": "10:00 AM"}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Action_Response token savings")
+    parser.add_argument("--preview-chars", type=int, default=160)
+    args = parser.parse_args()
+
+    # Keep sample posts out of the real schedule store and duplicate index
+    set_schedule_store(ScheduleStore(":memory:"))
+    set_duplicate_index(DuplicateIndex(":memory:"))
+    encoder = ResultEncoder(preview_chars=args.preview_chars)
+    content = ""
+    totals = {}
+    print(f"{'workflow':<18} {'action':<22} {'repr':>6} {'compact':>8} {'saved':>6}")
+    for workflow, function_name, function_parms in SAMPLE_STEPS:
+        # Schedule the workflow's last generated content
+        function_parms = {key: content if value == "@content" else value for key, value in function_parms.items()}
+        result = getattr(actions, function_name)(**function_parms)
+        if function_name == "generate_content":
+            content = result["content"]
+
+        before = count_tokens(f"Action_Response: {result}")
+        after = count_tokens(f"Action_Response: {encoder.encode(function_name, result)}")
+        print(f"{workflow:<18} {function_name:<22} {before:>6} {after:>8} {1 - after / before:>6.0%}")
+        workflow_totals = totals.setdefault(workflow, [0, 0])
+        workflow_totals[0] += before
+        workflow_totals[1] += after
+
+    print()
+    for workflow, (before, after) in totals.items():
+        print(f"{workflow:<41} {before:>6} {after:>8} {1 - after / before:>6.0%}")
+    before = sum(total[0] for total in totals.values())
+    after = sum(total[1] for total in totals.values())
+    print(f"{'all sample workflows':<41} {before:>6} {after:>8} {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_campaign_store.py
+"""
+Benchmark batch campaign analysis against per-campaign calls
+
+Builds synthetic email/social/webinar campaigns and compares calling
+actions.analyze_campaign_data once per campaign with one vectorized
+campaign_store.analyze_campaigns call (dict results, with and without
+metrics) and with analyze_campaigns_frame (DataFrame results).
+
+Usage:
+    python benchmarks/bench_campaign_store.py [--sizes 1000 10000 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import actions
+from campaign_store import CampaignStore, analyze_campaigns, analyze_campaigns_frame
+
+
+def make_campaigns(count, seed=42):
+    """Synthetic campaigns shaped like the entries in CAMPAIGN_DATA"""
+    rng = random.Random(seed)
+    campaigns = {}
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            campaigns[f"email_{i}"] = {
+                "open_rate": round(rng.uniform(10, 35), 1),
+                "click_rate": round(rng.uniform(1, 8), 1),
+                "conversion_rate": round(rng.uniform(0.2, 4), 1),
+                "total_sends": rng.randint(1000, 100000),
+                "peak_engagement_day": rng.choice(["Monday", "Tuesday", "Thursday"]),
+                "audience_segments": ["Marketing Managers", "CMOs"],
+            }
+        elif kind == 1:
+            campaigns[f"social_{i}"] = {
+                "engagement_rate": round(rng.uniform(1, 7), 1),
+                "click_through_rate": round(rng.uniform(0.5, 4), 1),
+                "conversion_rate": round(rng.uniform(0.2, 3), 1),
+                "total_impressions": rng.randint(5000, 500000),
+                "top_performing_platform": rng.choice(["LinkedIn", "Twitter", "Instagram"]),
+            }
+        else:
+            campaigns[f"webinar_{i}"] = {
+                "registration_rate": round(rng.uniform(2, 15), 1),
+                "attendance_rate": round(rng.uniform(30, 80), 1),
+                "conversion_rate": round(rng.uniform(1, 20), 1),
+                "attendee_count": rng.randint(50, 2000),
+            }
+    return campaigns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch campaign analysis benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'campaigns':>10} {'per-call (s)':>13} {'batch (s)':>10} {'no metrics (s)':>15} {'frame (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        campaigns = make_campaigns(size)
+        store = CampaignStore.from_records(campaigns)
+
+        original = actions.CAMPAIGN_DATA
+        actions.CAMPAIGN_DATA = campaigns
+        try:
+            start = time.perf_counter()
+            per_call = {campaign_id: actions.analyze_campaign_data(campaign_id) for campaign_id in campaigns}
+            per_call_time = time.perf_counter() - start
+        finally:
+            actions.CAMPAIGN_DATA = original
+
+        start = time.perf_counter()
+        batch = analyze_campaigns(store=store)
+        batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyze_campaigns(store=store, include_metrics=False)
+        lean_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        frame = analyze_campaigns_frame(store=store)
+        frame_time = time.perf_counter() - start
+
+        assert batch == per_call, "batch results differ from analyze_campaign_data"
+        assert frame["insights"].to_dict() == {k: v["insights"] for k, v in per_call.items()}
+        print(f"{size:>10} {per_call_time:13.4f} {batch_time:10.4f} {lean_time:15.4f} {frame_time:10.4f} "
+              f"{per_call_time / frame_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_duplicate_index.py
+"""
+Near-duplicate checks on a growing calendar of generated posts
+
+Generates posts with generate_content_batch (random topics, audiences,
+tones, platforms and lengths) for a calendar that grows by --posts-per-day,
+each post dated up to a month ahead, and adds each one to a
+DuplicateIndex the way schedule_content does: look up near-duplicates on the
+same platform within the date window, then insert. Reports the time per
+check as the index grows, candidates compared per lookup and the share of
+posts flagged; compares the first --exact posts with exact pairwise Jaccard
+similarity (time per check, and the recall and precision of the index when
+asked for every match); and times reopening the index from SQLite.
+
+Usage:
+    python benchmarks/bench_duplicate_index.py [--posts 100000] [--posts-per-day 50] [--exact 2000] [--window-days 30]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import generate_content_batch
+from duplicate_index import DEFAULT_WINDOW_DAYS, DuplicateIndex, shingles
+
+WORDS = ["AI", "email", "growth", "brand", "content", "video", "social", "B2B", "SaaS", "retention", "pricing",
+         "analytics", "community", "launch", "webinar", "SEO", "automation", "loyalty", "mobile", "events"]
+AUDIENCES = ["Marketing Managers", "Digital Marketers", "CMOs", "Founders", "Small Business Owners", "Developers"]
+TONES = ["professional", "casual", "enthusiastic"]
+PLATFORMS = ["linkedin", "twitter", "instagram", "email", None]
+LENGTHS = ["short", "medium", "long"]
+
+
+def sample_posts(count, posts_per_day, seed=0):
+    """count generated posts as (text, platform, date) with random parameters"""
+    rng = random.Random(seed)
+    start = date(2030, 1, 1)
+    posts = []
+    while len(posts) < count:
+        topics = [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(20)]
+        batch = generate_content_batch(topics, rng.sample(AUDIENCES, 2), tones=[rng.choice(TONES)],
+                                       platforms=[rng.choice(PLATFORMS)], lengths=[rng.choice(LENGTHS)],
+                                       seed=rng.random(), check_duplicates=False)
+        for post in batch:
+            day = len(posts) // posts_per_day + rng.randrange(30)
+            posts.append((post["content"], post["platform"], start + timedelta(days=day)))
+    return posts[:count]
+
+
+def exact_matches(posts, threshold, window_days):
+    """
+    Pairwise Jaccard within the date window, on the same platform (any
+    platform for posts without one, as in DuplicateIndex.query)
+
+    Returns:
+        tuple: (set of matching earlier posts per post, seconds)
+    """
+    sets = [set(shingles(text).tolist()) for text, _, _ in posts]
+    started = time.perf_counter()
+    matches = []
+    for i, (_, platform, day) in enumerate(posts):
+        found = set()
+        for j in range(i):
+            if (platform and posts[j][1] != platform) or abs((posts[j][2] - day).days) > window_days:
+                continue
+            union = len(sets[i] | sets[j])
+            if union and len(sets[i] & sets[j]) / union >= threshold:
+                found.add(j)
+        matches.append(found)
+    return matches, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DuplicateIndex at scale")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--posts-per-day", type=int, default=50, help="Growth of the calendar")
+    parser.add_argument("--exact", type=int, default=2000, help="Posts to compare with exact pairwise Jaccard")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    posts = sample_posts(args.posts, args.posts_per_day)
+    print(f"generated {len(posts):,} posts in {time.perf_counter() - started:.1f} s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "duplicates.sqlite")
+        index = DuplicateIndex(path)
+        checkpoints = sorted({size for size in (1000, 10000, 50000, args.posts) if size <= args.posts})
+        checked, elapsed = 0, 0.0
+        for checkpoint in checkpoints:
+            started = time.perf_counter()
+            for position in range(checked, checkpoint):
+                text, platform, day = posts[position]
+                index.check(f"post_{position}", text, platform=platform, date=day, window_days=args.window_days)
+            seconds = time.perf_counter() - started
+            elapsed += seconds
+            stats = index.stats()
+            print(f"{checkpoint:>8,} posts: {seconds / (checkpoint - checked) * 1e6:8.0f} us per check "
+                  f"(last {checkpoint - checked:,}), {stats['candidates_per_query']:.1f} candidate groups per lookup, "
+                  f"{stats['flagged'] / stats['queries']:.0%} flagged, {stats['groups']:,} distinct")
+            checked = checkpoint
+        print(f"total {elapsed:.1f} s, {len(posts) / elapsed:,.0f} checks/s, peak RSS "
+              f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        exact_count = min(args.exact, len(posts))
+        exact, exact_seconds = exact_matches(posts[:exact_count], index.threshold, args.window_days)
+        small = DuplicateIndex(":memory:")
+        found = [
+            {int(match["doc_id"][5:]) for match in small.check(f"post_{position}", text, platform=platform, date=day,
+                                                                window_days=args.window_days, limit=exact_count)}
+            for position, (text, platform, day) in enumerate(posts[:exact_count])
+        ]
+        true_positives = sum(len(exact[i] & found[i]) for i in range(exact_count))
+        expected = sum(map(len, exact))
+        reported = sum(len(found[i]) for i in range(exact_count))
+        print(f"exact pairwise on the first {exact_count:,}: {exact_seconds / exact_count * 1e6:.0f} us per check "
+              f"(grows with the index; about {exact_seconds / exact_count * 1e6 * len(posts) / exact_count:,.0f} us "
+              f"per check at {len(posts):,}); index recall {true_positives / expected if expected else 1:.1%}, "
+              f"precision {true_positives / reported if reported else 1:.1%}")
+
+        started = time.perf_counter()
+        reopened = DuplicateIndex(path)
+        print(f"reopened {len(reopened):,} posts from SQLite in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
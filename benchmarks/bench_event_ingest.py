@@ -0,0 +1,77 @@
+# benchmarks/bench_event_ingest.py
+"""
+Throughput of EventIngestor on synthetic event logs of growing size
+
+Writes CSV (and optionally JSONL) logs with sample_events, ingests each one
+from scratch, then appends 1% more events and ingests again to show that
+only the new lines are read. Reports events/s, MB/s and the peak resident
+memory of the process (which should stay flat as the logs grow, since the
+files are read in fixed-size blocks; the logs are written by a child
+process so generating them does not count).
+
+Usage:
+    python benchmarks/bench_event_ingest.py [--sizes 100000 1000000 4000000] [--jsonl] [--block-mb 16]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_ingest import EventIngestor, sample_events, write_events
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_log(path, rows, seed=0, chunk=500000):
+    """Write (or append, for a seed above 0) rows synthetic events in chunks"""
+    for start in range(0, rows, chunk):
+        write_events(sample_events(min(chunk, rows - start), seed=seed + start), path, append=seed + start > 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EventIngestor throughput")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 4000000])
+    parser.add_argument("--jsonl", action="store_true", help="Also benchmark JSONL logs")
+    parser.add_argument("--block-mb", type=int, default=16)
+    args = parser.parse_args()
+
+    formats = ["csv", "jsonl"] if args.jsonl else ["csv"]
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in formats:
+            for rows in args.sizes:
+                path = os.path.join(directory, f"events_{rows}.{file_format}")
+                writer = multiprocessing.Process(target=write_log, args=(path, rows))
+                writer.start()
+                writer.join()
+                size_mb = os.path.getsize(path) / 2**20
+
+                ingestor = EventIngestor(None, block_bytes=args.block_mb * 2**20)
+                started = time.perf_counter()
+                stats = ingestor.ingest(path)
+                elapsed = time.perf_counter() - started
+                metrics = ingestor.metrics()
+                print(f"{file_format:<5} {rows:>9,} events {size_mb:8.1f} MB  {elapsed:7.2f} s  "
+                      f"{stats['rows'] / elapsed:>10,.0f} events/s  {size_mb / elapsed:6.1f} MB/s  "
+                      f"peak RSS {peak_rss_mb():6.0f} MB  ({len(metrics)} campaigns)")
+
+                appended = max(1, rows // 100)
+                writer = multiprocessing.Process(target=write_log, args=(path, appended, rows))
+                writer.start()
+                writer.join()
+                started = time.perf_counter()
+                stats = ingestor.ingest(path)
+                elapsed = time.perf_counter() - started
+                print(f"{'':<5} append {appended:>9,} events: read {stats['rows']:,} in {elapsed:.3f} s")
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_extract_json.py
+"""
+Benchmark JSON action extraction on long model replies
+
+Compares the single-pass JSONStreamParser behind json_helpers.extract_json
+with the previous regex + extend_search implementation on synthetic replies
+of 10k to 1M characters.
+
+Usage:
+    python benchmarks/bench_extract_json.py [--sizes 10000 100000 1000000] [--legacy-limit 200000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_helpers import JSONStreamParser, extract_json, extend_search
+
+
+def legacy_extract_json(text):
+    """Previous extract_json: lazy regex, then extend_search for every match"""
+    pattern = r'\{.*?\}'
+    matches = re.finditer(pattern, text, re.DOTALL)
+    json_objects = []
+
+    for match in matches:
+        json_str = extend_search(text, match.span())
+        try:
+            json_objects.append(json.loads(json_str))
+        except json.JSONDecodeError:
+            continue
+
+    return json_objects if json_objects else None
+
+
+def make_reply(size, shape="mixed"):
+    """
+    Build a synthetic ReAct-style reply of roughly `size` characters
+
+    Shapes:
+        mixed: each segment holds a Thought with a stray brace in prose, an
+            action whose string values contain braces, and an
+            Action_Response-like payload.
+        unclosed: each action is missing its final closing brace, so every
+            extend_search call in the legacy code scans to the end of the text.
+    """
+    if shape == "unclosed":
+        segment = (
+            "Thought: I will analyze the campaign first.\n"
+            'Action: {"function_name": "analyze_campaign_data", '
+            '"function_parms": {"campaign_id": "email_campaign_q1"}\n'
+            "PAUSE\n\n"
+        )
+        return segment * max(1, size // len(segment))
+
+    segment = (
+        "Thought: The subject line used {topic placeholders, so I should check "
+        "the campaign before drafting new copy.\n"
+        "Action:\n"
+        + json.dumps({
+            "function_name": "generate_content",
+            "function_parms": {
+                "topic": "AI {Marketing} ROI",
+                "audience": "Marketing Managers",
+                "tone": "professional",
+                "platform": "email",
+                "length": "medium",
+            },
+        }, indent=2)
+        + "\nPAUSE\n\nAction_Response: "
+        + json.dumps({
+            "status": "scheduled",
+            "content_preview": "Hello {first_name}, AI is reshaping marketing...",
+            "meta": {"a": {"b": 1}},
+        })
+        + "\n\n"
+    )
+    repeats = max(1, size // len(segment))
+    return segment * repeats
+
+
+def time_call(func, text, repeat=3):
+    """Best-of-n wall time for func(text)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def streamed_extract(text, chunk_size=64):
+    """Feed the reply to the parser in streaming-sized chunks"""
+    parser = JSONStreamParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    return parser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--shapes", nargs="+", default=["mixed", "unclosed"],
+                        choices=["mixed", "unclosed"])
+    parser.add_argument("--legacy-limit", type=int, default=200000,
+                        help="Skip the legacy implementation above this size (it is quadratic)")
+    args = parser.parse_args()
+
+    for shape in args.shapes:
+        print(f"\n== {shape} ==")
+        run_shape(shape, args.sizes, args.legacy_limit)
+
+
+def run_shape(shape, sizes, legacy_limit):
+    """Print one results table for a reply shape"""
+    print(f"{'size':>10} {'objects':>8} {'legacy obj':>10} {'legacy (s)':>12} {'new (s)':>10} {'streamed (s)':>13} {'speedup':>9}")
+    for size in sizes:
+        text = make_reply(size, shape)
+        new_time, new_result = time_call(extract_json, text)
+        stream_time, _ = time_call(streamed_extract, text)
+
+        if len(text) <= legacy_limit:
+            legacy_time, legacy_result = time_call(legacy_extract_json, text, repeat=1)
+            legacy_count = f"{len(legacy_result or []):>10}"
+            legacy_col = f"{legacy_time:12.4f}"
+            speedup = f"{legacy_time / new_time:8.1f}x"
+        else:
+            legacy_count = f"{'-':>10}"
+            legacy_col = f"{'skipped':>12}"
+            speedup = f"{'-':>9}"
+
+        print(f"{len(text):>10} {len(new_result or []):>8} {legacy_count} {legacy_col} {new_time:10.4f} {stream_time:13.4f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# benchmarks/bench_generate_content.py
+"""
+Benchmark content generation throughput
+
+Compares the previous generate_content (template lists rebuilt and DEBUG
+lines printed on every call) with the registry-based generate_content and
+generate_content_batch over a topic x audience x tone x platform x length
+grid. With --check, outputs of the old and new code are compared for every
+combination using the same random seed.
+
+Usage:
+    python benchmarks/bench_generate_content.py [--topics 50] [--audiences 20] [--check]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import generate_content, generate_content_batch
+from duplicate_index import set_duplicate_index
+
+TONES = ["professional", "casual", "enthusiastic", "friendly"]
+PLATFORMS = [None, "LinkedIn", "Twitter", "Instagram", "email"]
+LENGTHS = ["short", "medium", "long"]
+
+
+def legacy_generate_content(topic, audience, tone="professional", platform=None, length="medium"):
+    """
+    Previous generate_content, kept verbatim for comparison
+
+    Args:
+        topic (str): The main topic/theme of the content
+        audience (str): Target audience
+        tone (str): Tone of voice (professional, casual, enthusiastic)
+        platform (str): Social platform or content destination
+        length (str): Content length (short, medium, long)
+
+    Returns:
+        dict: Generated content with metadata
+    """
+    from datetime import datetime
+    import random
+
+    # Initialize response structure
+    response = {
+        "topic": topic,
+        "audience": audience,
+        "tone": tone,
+        "platform": platform,
+        "length": length,
+        "content": "",
+        "hashtags": [],
+        "estimated_reading_time": "",
+        "generation_date": datetime.now().strftime("%Y-%m-%d %H:%M")
+    }
+
+    # Enhanced templates for professional tone
+    professional_templates = [
+        "New research reveals that {topic} is transforming how {audience} approach strategic decisions. Organizations implementing these advanced solutions are seeing up to 40% higher engagement and 25% improved ROI. Learn the key implementation frameworks that industry leaders are using to maintain competitive advantage.",
+        
+        "In today's data-driven marketplace, {audience} need to leverage {topic} to stay ahead. Our analysis of 500+ industry leaders shows that early adopters are experiencing 3X faster optimization and significantly higher conversion rates. Here's the strategic roadmap for implementation that's generating measurable results.",
+        
+        "The convergence of {topic} with traditional frameworks presents unprecedented opportunities for {audience}. Forward-thinking organizations are reducing development cycles by 60% while improving precision metrics. Discover the implementation pathway that leading companies are following for sustainable growth."
+    ]
+
+    # Enhanced templates for casual tone
+    casual_templates = [
+        "Have you been wondering how {topic} could transform your results? We've been testing these approaches with clients across industries, and the outcomes are honestly impressive. One client saw their engagement metrics double in just 6 weeks! Here's what we're learning that you can apply right away...",
+        
+        "Let's talk about {topic} - it's completely reshaping possibilities for {audience} everywhere. We've collected insights from dozens of successful implementations, and there's a clear pattern emerging among top performers. The best part? The implementation pathway is more accessible than most realize!",
+        
+        "The {topic} revolution isn't coming—it's already here, and {audience} who are jumping in now are seeing fantastic outcomes. We've been tracking early adopters, and they're reporting an average 45% improvement in effectiveness. Here's your roadmap to joining their ranks."
+    ]
+
+    # Enhanced templates for enthusiastic tone
+    enthusiastic_templates = [
+        "🚀 BREAKTHROUGH ALERT! {topic} is absolutely TRANSFORMING how {audience} connect with their market! Latest research shows a STAGGERING 87% improvement in key metrics when properly implemented! Don't miss this opportunity to revolutionize your approach!",
+        
+        "🔥 GAME-CHANGER for {audience}! {topic} is redefining what's possible in today's landscape! Organizations implementing these approaches are seeing INCREDIBLE results—some reporting 3X HIGHER conversion rates! Here's how YOU can harness this power! 🔥",
+        
+        "⚡ ATTENTION {audience}! The {topic} revolution is creating MASSIVE opportunities that most are missing! Exclusive analysis shows early adopters outperforming competitors by 155%! Don't get left behind—these insights will TRANSFORM your strategy! ⚡"
+    ]
+
+    # Select appropriate template based on tone
+    if tone.lower() in ["professional", "formal", "insightful", "informative", "educational"]:
+        templates = professional_templates
+    elif tone.lower() in ["casual", "conversational", "friendly", "approachable"]:
+        templates = casual_templates
+    elif tone.lower() in ["enthusiastic", "exciting", "energetic", "persuasive", "engaging"]:
+        templates = enthusiastic_templates
+    else:
+        templates = professional_templates
+
+    # Select a random template from the appropriate category
+    template = random.choice(templates)
+
+    # Generate content by filling in the template
+    content = template.format(topic=topic, audience=audience)
+
+    # Adjust content length
+    if length.lower() == "short":
+        # For short content, use just the first sentence
+        first_sentence_end = content.find('.')
+        if first_sentence_end > 0:
+            content = content[:first_sentence_end + 1]
+    elif length.lower() == "long":
+        # For long content, add additional context
+        additional_context = f"\n\nOur team has analyzed the latest trends in {topic} and compiled actionable strategies specifically designed for {audience}. The data reveals that companies implementing these approaches are consistently outperforming market averages across key metrics. By adopting these evidence-based methodologies, you can position your organization at the forefront of industry developments while optimizing resource allocation and maximizing return on investment."
+        content += additional_context
+
+    # Generate platform-specific elements
+    if platform:
+        if platform.lower() == "linkedin":
+            response["hashtags"] = [
+                f"#{topic.replace(' ', '').replace(':', '')}",  # Remove spaces and colons from hashtag
+                "#CFO",
+                "#AIinFinance",
+                "#FinancialLeadership",
+                "#DigitalTransformation",
+                "#FinanceInnovation"
+            ]
+            # Refined content for CFOs on LinkedIn
+            if length.lower() == "medium":
+                content = f"CFOs are increasingly leveraging AI to drive strategic financial decisions. From automating routine tasks to providing predictive insights, AI empowers CFOs to optimize resource allocation, mitigate risks, and enhance overall financial performance. #CFO #AIinFinance #FinanceTransformation"
+            elif length.lower() == "long":
+                content = f"CFOs are at the forefront of digital transformation, with AI emerging as a crucial tool for strategic financial management. By automating routine tasks, AI frees up CFOs to focus on higher-level analysis and decision-making.  Predictive analytics, powered by AI, enable CFOs to forecast financial performance with greater accuracy, identify potential risks, and optimize resource allocation.  Moreover, AI facilitates enhanced data visualization, providing CFOs with clear, actionable insights to drive growth and profitability. #CFO #AIinFinance #FinanceTransformation #DigitalTransformation #FinancialLeadership"
+            else:
+                 content = f"AI is changing the role of the CFO.  Here's how #CFOs can use it. #AIinFinance"
+
+            response["estimated_reading_time"] = "1-2 min read"
+            # Debugging LinkedIn content
+            print(f"DEBUG: LinkedIn content before return: {content}")
+        elif platform.lower() in ["twitter", "x"]:
+            # Ensure content is concise for Twitter
+            if len(content) > 280:
+                content = content[:277] + "..."
+            response["hashtags"] = [
+                f"#{topic.replace(' ', '')}",
+                "#MarketingStrategy"
+            ]
+
+        elif platform.lower() == "instagram":
+            response["hashtags"] = [
+                f"#{topic.replace(' ', '')}",
+                "#MarketingTips",
+                "#BusinessStrategy",
+                "#DigitalMarketing",
+                "#GrowthHacking"
+            ]
+
+        elif platform.lower() == "email":
+            # Add email-specific formatting
+            subject_line = f"New insights on {topic} for {audience}"
+            content = f"Subject: {subject_line}\n\nHello {audience} professional,\n\n{content}\n\nBest regards,\nYour Marketing Team"
+
+    # Update response with generated content
+    response["content"] = content
+    print(f"DEBUG: generate_content output: {response}")
+    return response
+
+
+def grid(topics, audiences):
+    return list(itertools.product(TONES, PLATFORMS, LENGTHS, topics, audiences))
+
+
+def check_equivalence(topics, audiences):
+    """Old and new generate_content must produce the same output for the same seed"""
+    for tone, platform, length, topic, audience in grid(topics, audiences):
+        random.seed(7)
+        with contextlib.redirect_stdout(io.StringIO()):
+            old = legacy_generate_content(topic, audience, tone, platform, length)
+        random.seed(7)
+        new = generate_content(topic, audience, tone, platform, length)
+        old.pop("generation_date"), new.pop("generation_date"), new.pop("near_duplicates")
+        assert old == new, (tone, platform, length, topic, audience)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content generation throughput benchmark")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--audiences", type=int, default=20)
+    parser.add_argument("--check", action="store_true", help="Verify old and new outputs match")
+    args = parser.parse_args()
+
+    # Time generation only, as the previous code did no duplicate checks (and
+    # keep benchmark posts out of the real index)
+    set_duplicate_index(None)
+
+    topics = [f"AI Marketing: Topic {i}" for i in range(args.topics)]
+    audiences = [f"Audience {i}" for i in range(args.audiences)]
+    combinations = grid(topics, audiences)
+
+    if args.check:
+        check_equivalence(topics[:3], audiences[:2])
+        print("Outputs match for every tone/platform/length combination")
+
+    # The DEBUG prints are part of the old per-call cost, but not worth showing
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tone, platform, length, topic, audience in combinations:
+            legacy_generate_content(topic, audience, tone, platform, length)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tone, platform, length, topic, audience in combinations:
+        generate_content(topic, audience, tone, platform, length)
+    per_call_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = sum(1 for _ in generate_content_batch(topics, audiences, TONES, PLATFORMS, LENGTHS, seed=1))
+    batch_time = time.perf_counter() - start
+
+    total = len(combinations)
+    assert count == total
+    print(f"{total} items")
+    print(f"{'path':<22} {'seconds':>9} {'items/s':>12}")
+    for name, seconds in [("previous per-call", legacy_time), ("registry per-call", per_call_time),
+                          ("generate_content_batch", batch_time)]:
+        print(f"{name:<22} {seconds:9.4f} {total / seconds:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
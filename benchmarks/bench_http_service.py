@@ -0,0 +1,139 @@
+# benchmarks/bench_http_service.py
+"""
+Load test for http_service.py
+
+Starts the service in-process on a free port with the scripted model
+(simulated latency per call), then has concurrent clients each create a
+session and run tasks over keep-alive connections, as JSON requests or SSE
+streams. Reports task requests per second, latency percentiles (and time to
+the first SSE event), and how many requests were turned away with 429.
+
+Usage:
+    python benchmarks/bench_http_service.py [--clients 32] [--tasks-per-client 5] [--latency 0.05] [--stream]
+    python benchmarks/bench_http_service.py --max-active-tasks 8    # exercise backpressure
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_engine import AsyncWorkflowEngine
+from duplicate_index import DuplicateIndex, set_duplicate_index
+from http_service import AgentService
+from llm_backend import ScriptedBackend
+from schedule_store import ScheduleStore, set_schedule_store
+
+TASK = "Analyze campaign email_campaign_q1, write a LinkedIn post about the results and schedule it"
+
+
+def start_service(service):
+    """Run the service on its own event loop thread; returns (loop, port)"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    address = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        address["port"] = loop.run_until_complete(service.start("127.0.0.1", 0))[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop, address["port"]
+
+
+def client(port, tasks, stream, results):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request("POST", "/sessions", body="{}")
+    response = connection.getresponse()
+    session_id = json.loads(response.read())["session_id"]
+
+    body = json.dumps({"task": TASK})
+    headers = {"Content-Type": "application/json"}
+    if stream:
+        headers["Accept"] = "text/event-stream"
+    for _ in range(tasks):
+        while True:
+            started = time.perf_counter()
+            connection.request("POST", f"/sessions/{session_id}/tasks", body=body, headers=headers)
+            response = connection.getresponse()
+            if response.status == 429:
+                response.read()
+                results["rejected"].append(1)
+                # A tenth of Retry-After keeps the test short while still backing off
+                time.sleep(float(response.getheader("Retry-After", "1")) / 10)
+                continue
+            first_event = None
+            if stream:
+                # Read line by line to time the first event
+                for line in response:
+                    if first_event is None and line.startswith(b"event:"):
+                        first_event = time.perf_counter() - started
+                # SSE responses close the connection
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            else:
+                response.read()
+            break
+        results["latency"].append(time.perf_counter() - started)
+        if first_event is not None:
+            results["first_event"].append(first_event)
+        results["status"].append(response.status)
+    connection.close()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service load test")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--tasks-per-client", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per model call")
+    parser.add_argument("--max-active-tasks", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Model requests in flight")
+    parser.add_argument("--stream", action="store_true", help="Use SSE instead of JSON responses")
+    args = parser.parse_args()
+
+    # Keep benchmark posts out of the real schedule store and duplicate index
+    set_schedule_store(ScheduleStore(":memory:"))
+    set_duplicate_index(DuplicateIndex(":memory:"))
+    engine = AsyncWorkflowEngine(max_concurrency=args.max_concurrency, backend=ScriptedBackend(latency=args.latency))
+    service = AgentService(engine, max_active_tasks=args.max_active_tasks)
+    loop, port = start_service(service)
+
+    results = {"latency": [], "first_event": [], "status": [], "rejected": []}
+    threads = [threading.Thread(target=client, args=(port, args.tasks_per_client, args.stream, results))
+               for _ in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+
+    latencies = results["latency"]
+    print(f"{len(latencies)} tasks from {args.clients} clients in {elapsed:.2f} s "
+          f"({'SSE' if args.stream else 'JSON'}, {args.latency * 1000:.0f} ms per model call)")
+    print(f"requests/s      {len(latencies) / elapsed:.1f}")
+    print(f"latency ms      p50 {percentile(latencies, 50) * 1000:.1f}  p95 {percentile(latencies, 95) * 1000:.1f}  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}  max {max(latencies) * 1000:.1f}")
+    if results["first_event"]:
+        first = results["first_event"]
+        print(f"first event ms  p50 {percentile(first, 50) * 1000:.1f}  p99 {percentile(first, 99) * 1000:.1f}")
+    print(f"rejected (429)  {len(results['rejected'])}")
+    print(f"non-200         {sum(1 for status in results['status'] if status != 200)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_import_time.py
+"""
+Measure agent startup cost with python -X importtime
+
+Imports a module in fresh interpreters and reports the median cumulative
+import time, the median process wall time, and the modules that cost the
+most in a typical run.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module main] [--runs 15] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module):
+    """
+    Import a module in a new interpreter
+
+    Returns:
+        tuple: (wall seconds, list of (self us, cumulative us, depth, name))
+    """
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    wall = time.perf_counter() - start
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time report")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [rows[-1][1] for _, rows in profiles]
+    walls = [wall for wall, _ in profiles]
+    baseline = [import_profile("sys")[0] for _ in range(args.runs)]
+
+    print(f"import {args.module}: {statistics.median(totals) / 1000:.1f} ms (median of {args.runs})")
+    print(f"process wall time: {statistics.median(walls) * 1000:.1f} ms "
+          f"(bare interpreter: {statistics.median(baseline) * 1000:.1f} ms)")
+
+    # Slowest imports from the run closest to the median
+    median_run = min(profiles, key=lambda profile: abs(profile[1][-1][1] - statistics.median(totals)))[1]
+    print(f"\n{'cumulative ms':>14} {'self ms':>8}  module")
+    for self_us, cumulative_us, depth, name in sorted(median_run, key=lambda row: -row[1])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {'  ' * depth}{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_llm_client.py
+"""
+Sessions against a rate-limited, flaky model server, with and without ResilientBackend
+
+Starts the stand-in server with a requests-per-minute limit, a share of
+random 429s and jittered latency, then runs the same concurrent sessions
+through AsyncWorkflowEngine three times: on the bare OpenAI backend (no
+retries), behind ResilientBackend with a matching request budget, and the
+same with identical in-flight requests coalesced (the sample tasks repeat,
+so sessions often send the same messages). Reports finished and failed tasks, wall time, how many requests the server
+turned away, and the client's retry, coalescing and throttling counters.
+
+Usage:
+    python benchmarks/bench_llm_client.py [--sessions 64] [--rpm 1200] [--error-rate 0.1] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_engine import AsyncWorkflowEngine
+from duplicate_index import DuplicateIndex, set_duplicate_index
+from llm_backend import OpenAIBackend
+from llm_client import ResilientBackend
+from schedule_store import ScheduleStore, set_schedule_store
+from stub_llm_server import StubConfig, start_stub_server
+
+TASKS = [
+    "Analyze campaign email_campaign_q1, write a LinkedIn post about the results and schedule it",
+    "Analyze campaign social_campaign_summer, write a LinkedIn post about the results and schedule it",
+    "Analyze campaign webinar_series_2023, write a LinkedIn post about the results and schedule it",
+]
+
+
+async def run_sessions(backend, client, sessions, max_concurrency):
+    engine = AsyncWorkflowEngine(max_concurrency=max_concurrency, backend=backend)
+
+    async def run(index):
+        session = engine.create_session()
+        try:
+            await session.run_task(TASKS[index % len(TASKS)])
+        except Exception as e:
+            return f"{type(e).__name__}"
+        errors = [event["content"] for event in session.events if event["type"] == "error"]
+        return errors[-1].split(":")[0] if errors else None
+
+    try:
+        return await asyncio.gather(*(run(index) for index in range(sessions)))
+    finally:
+        await client.async_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ResilientBackend against a flaky server")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--rpm", type=int, default=1200, help="Server request limit per minute")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Share of random 429s")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-jitter", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Keep benchmark posts out of the real schedule store and duplicate index
+    set_schedule_store(ScheduleStore(":memory:"))
+    set_duplicate_index(DuplicateIndex(":memory:"))
+
+    for label in ("bare", "resilient", "coalesced"):
+        config = StubConfig(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                            requests_per_minute=args.rpm, retry_after=args.retry_after, seed=1)
+        server, base_url = start_stub_server(config=config)
+        backend = client = OpenAIBackend(api_key="stub", base_url=base_url, max_retries=0)
+        if label != "bare":
+            # Budget a little under the server's limit; short backoffs keep the run quick
+            backend = ResilientBackend(client, requests_per_minute=int(args.rpm * 0.9), max_retries=8,
+                                       base_delay=0.1, max_delay=2.0, coalesce=label == "coalesced", seed=1)
+        started = time.perf_counter()
+        outcomes = asyncio.run(run_sessions(backend, client, args.sessions, args.max_concurrency))
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+        failed = [outcome for outcome in outcomes if outcome]
+        print(f"{label:<10} {len(outcomes) - len(failed)}/{len(outcomes)} tasks finished in {elapsed:.2f} s; "
+              f"server saw {config.counts['requests']} requests, rejected {config.counts['rejected']}")
+        if failed:
+            print(f"{'':<10} failures: {', '.join(sorted(set(failed)))}")
+        if isinstance(backend, ResilientBackend):
+            print(f"{'':<10} client: {json.dumps(backend.stats())}")
+
+
+if __name__ == "__main__":
+    main()
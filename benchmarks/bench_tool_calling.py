@@ -0,0 +1,147 @@
+# benchmarks/bench_tool_calling.py
+"""
+Compare the text action protocol with native tool calling
+
+Runs the same agent sessions (analyze -> generate -> schedule -> Answer) in
+both modes and reports model calls, prompt and completion tokens and time
+per session. Text mode sends the long few-shot system prompt and parses the
+action out of the reply; tool mode sends a short prompt plus the generated
+tool schemas and reads tool_calls from the response.
+
+By default the scripted in-process model is used, with generation speed and
+prompt processing speed simulated so that token savings show up as time.
+With --base-url the sessions go through the OpenAI client instead (e.g. to
+stub_llm_server.py or a real endpoint).
+
+Usage:
+    python benchmarks/bench_tool_calling.py [--sessions 20] [--tokens-per-second 50] [--prefill-tokens-per-second 2000]
+    python benchmarks/bench_tool_calling.py --base-url http://127.0.0.1:8808/v1
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as agent
+from duplicate_index import DuplicateIndex, set_duplicate_index
+from llm_backend import LLMBackend, OpenAIBackend, ScriptedBackend, set_backend
+from schedule_store import ScheduleStore, set_schedule_store
+
+TASK = "Analyze campaign email_campaign_q1, write a LinkedIn post about the results and schedule it"
+
+
+class MeteringBackend(LLMBackend):
+    """
+    Wraps a backend and totals calls, tokens and time spent in the model
+
+    Args:
+        backend (LLMBackend): Backend doing the work
+        prefill_tokens_per_second (float): Simulated prompt processing speed,
+            or None to add no delay
+    """
+
+    def __init__(self, backend, prefill_tokens_per_second=None):
+        self.backend = backend
+        self.supports_tools = backend.supports_tools
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.seconds = 0.0
+
+    def _record(self, call):
+        start = time.perf_counter()
+        completion = call()
+        if self.prefill_tokens_per_second and completion.prompt_tokens:
+            time.sleep(completion.prompt_tokens / self.prefill_tokens_per_second)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        self.prompt_tokens += completion.prompt_tokens or 0
+        self.completion_tokens += completion.completion_tokens or 0
+        return completion
+
+    def complete(self, messages, model):
+        return self._record(lambda: self.backend.complete(messages, model))
+
+    def complete_with_tools(self, messages, model, tools):
+        return self._record(lambda: self.backend.complete_with_tools(messages, model, tools))
+
+
+def run_session(tools):
+    """One session (a single task, then exit) with output discarded"""
+    inputs = iter([TASK, "exit"])
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(inputs)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.run_workflow_agent(tools=tools)
+    finally:
+        builtins.input = original_input
+
+
+def measure(meter, tools, sessions):
+    meter.reset()
+    start = time.perf_counter()
+    for _ in range(sessions):
+        run_session(tools)
+    elapsed = time.perf_counter() - start
+    return {
+        "calls": meter.calls / sessions,
+        "prompt_tokens": meter.prompt_tokens / sessions,
+        "completion_tokens": meter.completion_tokens / sessions,
+        "model_seconds": meter.seconds / sessions,
+        "seconds": elapsed / sessions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text protocol vs native tool calling")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--tokens-per-second", type=float, default=50,
+                        help="Simulated generation speed of the scripted model (0 for instant)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000,
+                        help="Simulated prompt processing speed (0 for instant)")
+    parser.add_argument("--base-url", default=None,
+                        help="Use the OpenAI client against this endpoint instead of the scripted model")
+    args = parser.parse_args()
+
+    if args.base_url:
+        backend = OpenAIBackend(api_key=os.environ.get("OPENAI_API_KEY", "stub"), base_url=args.base_url)
+        prefill = None
+    else:
+        backend = ScriptedBackend(tokens_per_second=args.tokens_per_second or None)
+        prefill = args.prefill_tokens_per_second or None
+
+    meter = MeteringBackend(backend, prefill)
+    previous_backend = set_backend(meter)
+    # Keep benchmark posts out of the real schedule store and duplicate index
+    previous_store = set_schedule_store(ScheduleStore(":memory:"))
+    previous_index = set_duplicate_index(DuplicateIndex(":memory:"))
+    try:
+        results = {mode: measure(meter, mode == "tools", args.sessions) for mode in ("text", "tools")}
+    finally:
+        set_backend(previous_backend)
+        set_schedule_store(previous_store)
+        set_duplicate_index(previous_index)
+
+    print(f"{args.sessions} sessions per mode, averages per session")
+    print(f"{'mode':<6} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'model s':>9} {'total s':>9}")
+    for mode, result in results.items():
+        print(f"{mode:<6} {result['calls']:>6.1f} {result['prompt_tokens']:>11.0f} "
+              f"{result['completion_tokens']:>10.0f} {result['model_seconds']:>9.3f} {result['seconds']:>9.3f}")
+    text, tools = results["text"], results["tools"]
+    print(f"\nTool calling: {1 - tools['prompt_tokens'] / text['prompt_tokens']:.0%} prompt tokens saved, "
+          f"{1 - tools['completion_tokens'] / text['completion_tokens']:.0%} completion tokens saved, "
+          f"{1 - tools['seconds'] / text['seconds']:.0%} time saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# benchmarks/run_all.py
+"""
+Benchmark suite with a stored baseline and regression check
+
+Micro-benchmarks extract_json / extend_search on synthetic replies of growing
+size and each action per call; macro-benchmarks complete run_workflow_agent
+sessions against the scripted in-process model. The RNG and string hashing
+are seeded, so every run does the same work.
+
+Each benchmark reports the best time per operation over several repeats.
+Results are compared with the saved baseline and anything slower by more than
+the threshold is flagged (exit status 1). A fixed reference workload is timed
+just before each benchmark and changes are judged on the ratio between the
+two, so a slower or busier machine isn't reported as a regression.
+
+Usage:
+    python benchmarks/run_all.py --save-baseline     # record benchmarks/baseline.json
+    python benchmarks/run_all.py                     # compare with the baseline
+    python benchmarks/run_all.py --filter agent --threshold 0.1
+"""
+import argparse
+import builtins
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import actions
+import main as agent
+from action_cache import set_action_cache
+from bench_extract_json import make_reply
+from duplicate_index import DuplicateIndex, set_duplicate_index
+from json_helpers import extend_search, extract_json
+from llm_backend import ScriptedBackend, set_backend
+from schedule_store import ScheduleStore, set_schedule_store
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SCHEDULE_START = datetime(2099, 1, 1)
+
+AGENT_TASK = "Analyze campaign email_campaign_q1, write a LinkedIn post about the results and schedule it"
+
+
+def _loop_count(func, min_time):
+    """Calls of func needed for one timing to take at least min_time"""
+    number = 1
+    while True:
+        elapsed = _time(func, number) * number
+        if elapsed >= min_time:
+            return number
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+
+
+def _time(func, number):
+    """Seconds per call over number calls"""
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # As in timeit, so collections triggered by earlier work don't land in a timing
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(func, repeats=5, min_time=0.1):
+    """
+    Seconds per call of func (best of several repeats)
+
+    The fastest repeat is the one least disturbed by other processes.
+    """
+    with _gc_paused():
+        number = _loop_count(func, min_time)
+        return min(_time(func, number) for _ in range(repeats))
+
+
+def reference_workload():
+    """Fixed pure-Python work used to estimate how fast this machine is right now"""
+    counts = {}
+    for i in range(2000):
+        key = f"k{i % 50}"
+        counts[key] = counts.get(key, 0) + i
+    return sorted(counts.items())
+
+
+def run_agent_session(stream=False):
+    """One interactive session (a single task, then exit) with output discarded"""
+    inputs = iter([AGENT_TASK, "exit"])
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(inputs)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.run_workflow_agent(stream=stream)
+    finally:
+        builtins.input = original_input
+
+
+def schedule_in_new_slot(index):
+    day = SCHEDULE_START + timedelta(days=index // 24)
+    return actions.schedule_content(
+        "Post about AI-Powered Marketing", "LinkedIn", day.strftime("%Y-%m-%d"), f"{index % 24}:00"
+    )
+
+
+def build_benchmarks():
+    """name -> zero-argument callable"""
+    benchmarks = {}
+
+    for size in (1000, 10000, 100000):
+        reply = make_reply(size)
+        benchmarks[f"extract_json/{size // 1000}k"] = lambda reply=reply: extract_json(reply)
+
+        unclosed = make_reply(size, shape="unclosed")
+        start = unclosed.index("{")
+        benchmarks[f"extend_search/{size // 1000}k"] = (
+            lambda text=unclosed, start=start: extend_search(text, (start, start + 1))
+        )
+
+    benchmarks["action/analyze_campaign_data"] = lambda: actions.analyze_campaign_data("email_campaign_q1")
+    benchmarks["action/analyze_campaign_data_peers"] = lambda: actions.analyze_campaign_data(
+        "email_campaign_q1", compare_to_peers=True
+    )
+    benchmarks["action/generate_content"] = lambda: actions.generate_content(
+        "AI-Powered Marketing", "Marketing Managers", tone="professional", platform="LinkedIn", length="long"
+    )
+    # A new slot for every call, so the cost doesn't depend on how many
+    # conflicts earlier calls created
+    slots = itertools.count()
+    benchmarks["action/schedule_content"] = lambda: schedule_in_new_slot(next(slots))
+
+    benchmarks["agent/session"] = run_agent_session
+    benchmarks["agent/session_stream"] = lambda: run_agent_session(stream=True)
+    return benchmarks
+
+
+def measure_relative(func, repeats, min_time=0.05):
+    """
+    Time func and the reference workload in alternating repeats
+
+    Interleaving means both see the same machine conditions, so their ratio
+    stays steady while the machine speeds up or slows down.
+
+    Returns:
+        dict: seconds per operation, and relative: that time divided by the
+            reference time (comparable across machines and machine load)
+    """
+    with _gc_paused():
+        reference_number = _loop_count(reference_workload, min_time)
+        number = _loop_count(func, min_time)
+        reference, seconds = float("inf"), float("inf")
+        for _ in range(repeats * 2):
+            reference = min(reference, _time(reference_workload, reference_number))
+            seconds = min(seconds, _time(func, number))
+    return {"seconds": seconds, "relative": seconds / reference}
+
+
+def run(names, benchmarks, seed, repeats, baseline=None, threshold=None, confirm=2):
+    """
+    Measure benchmarks
+
+    Benchmarks that look slower than the baseline are measured again (up to
+    confirm more times, keeping the best result) so one noisy run isn't
+    reported as a regression.
+
+    Returns:
+        dict: name -> {"seconds", "relative"}
+    """
+    baseline = baseline or {}
+    set_backend(ScriptedBackend())
+    # Keep scheduled benchmark posts out of the real schedule store and duplicate index
+    previous_store = set_schedule_store(ScheduleStore(":memory:"))
+    previous_index = set_duplicate_index(DuplicateIndex(":memory:"))
+    # Time the actions themselves, not replays of the first iteration's results
+    previous_cache = set_action_cache(None)
+    try:
+        results = {}
+        for name in names:
+            random.seed(seed)
+            results[name] = measure_relative(benchmarks[name], repeats)
+            for _ in range(confirm if name in baseline else 0):
+                if results[name]["relative"] <= baseline[name]["relative"] * (1 + threshold):
+                    break
+                random.seed(seed)
+                retry = measure_relative(benchmarks[name], repeats)
+                if retry["relative"] < results[name]["relative"]:
+                    results[name] = retry
+            print(f"{name:<40} {results[name]['seconds'] * 1e6:>12.2f} us", flush=True)
+        return results
+    finally:
+        set_schedule_store(previous_store)
+        set_duplicate_index(previous_index)
+        set_action_cache(previous_cache)
+
+
+def compare(results, baseline, threshold):
+    """
+    Print current vs baseline times
+
+    Changes are computed on times relative to the reference workload, so a
+    uniformly slower (or busier) machine doesn't show up as a regression.
+
+    Returns:
+        list: Names of benchmarks slower than baseline by more than threshold
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>12} {current['seconds'] * 1e6:>12.2f} {'new':>8}")
+            continue
+        change = current["relative"] / previous["relative"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {previous['seconds'] * 1e6:>12.2f} {current['seconds'] * 1e6:>12.2f} "
+              f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Flag benchmarks slower than baseline by more than this fraction")
+    parser.add_argument("--filter", default=None, help="Only benchmarks whose name contains this")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Re-measure apparent regressions up to this many times")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    benchmarks = build_benchmarks()
+    names = [name for name in benchmarks if not args.filter or args.filter in name]
+    results = run(names, benchmarks, args.seed, args.repeats,
+                  baseline=baseline and baseline["results"], threshold=args.threshold, confirm=args.confirm)
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                stored = json.load(f).get("results", {})
+        stored.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "seed": args.seed,
+                "results": stored,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+        return
+    if baseline.get("machine") != platform.platform():
+        print(f"\nNote: baseline was recorded on {baseline.get('machine')}")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    # String hashing is randomized per process, which moves some timings by
+    # tens of percent; pin it so runs are comparable
+    if "PYTHONHASHSEED" not in os.environ:
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    main()
@@ -0,0 +1,326 @@
+# campaign_store.py
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from actions import CAMPAIGN_DATA, campaign_data_version
+from benchmark_index import CAMPAIGN_TYPE_METRICS
+
+# Metrics that are whole numbers (kept as nullable integers, not floats)
+COUNT_COLUMNS = ["total_sends", "total_impressions", "attendee_count", "repeat_attendees"]
+
+# Bit of the "Strong engagement rate on {platform}" rule in analyze_campaigns
+PLATFORM_RULE_BIT = 1 << 3
+
+
+def _decode(value):
+    """Decode list/dict cells that were stored as JSON text in CSV files"""
+    if isinstance(value, str) and value[:1] in "[{":
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+class CampaignStore:
+    """
+    Campaign metrics held as typed columns (one row per campaign)
+
+    Rates are float64 columns, counts are nullable Int64 columns, and
+    campaign_type is a categorical derived from which metrics a campaign has.
+    Nested fields (audience segments, demographics, ...) stay as object
+    columns so a campaign's full metrics dict can be rebuilt.
+
+    Args:
+        frame (pandas.DataFrame): Metrics indexed by campaign_id
+    """
+
+    def __init__(self, frame):
+        frame = frame.copy()
+        frame.index = frame.index.astype(str)
+        frame.index.name = "campaign_id"
+        self.metric_columns = [column for column in frame.columns if column != "campaign_type"]
+
+        for column in self.metric_columns:
+            if column in COUNT_COLUMNS:
+                frame[column] = pd.to_numeric(frame[column]).astype("Int64")
+            elif not pd.api.types.is_numeric_dtype(frame[column]):
+                frame[column] = frame[column].astype(object).map(_decode)
+
+        campaign_type = np.full(len(frame), "other", dtype=object)
+        for type_name, column in reversed(CAMPAIGN_TYPE_METRICS):
+            if column in frame:
+                campaign_type[frame[column].notna().to_numpy()] = type_name
+        frame["campaign_type"] = pd.Categorical(campaign_type)
+
+        self.frame = frame
+        self._positions = {campaign_id: position for position, campaign_id in enumerate(frame.index)}
+
+    @classmethod
+    def from_records(cls, campaigns):
+        """
+        Build a store from a {campaign_id: metrics} dict like CAMPAIGN_DATA
+        """
+        return cls(pd.DataFrame.from_dict(campaigns, orient="index"))
+
+    @classmethod
+    def from_csv(cls, path, **read_options):
+        """Build a store from a CSV file with a campaign_id column"""
+        return cls(pd.read_csv(path, **read_options).set_index("campaign_id"))
+
+    @classmethod
+    def from_parquet(cls, path):
+        """Build a store from a Parquet file with a campaign_id column (needs pyarrow)"""
+        frame = pd.read_parquet(path)
+        if "campaign_id" in frame.columns:
+            frame = frame.set_index("campaign_id")
+        return cls(frame)
+
+    def to_csv(self, path):
+        """Write the store to CSV (nested fields are stored as JSON text)"""
+        frame = self.frame[self.metric_columns].copy()
+        for column in frame.columns:
+            if not pd.api.types.is_numeric_dtype(frame[column]):
+                frame[column] = frame[column].astype(object).map(
+                    lambda value: json.dumps(value) if isinstance(value, (list, dict)) else value
+                )
+        frame.to_csv(path)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, campaign_id):
+        return campaign_id in self._positions
+
+    @property
+    def campaign_ids(self):
+        return list(self.frame.index)
+
+    def metrics(self, position):
+        """Rebuild the metrics dict of the campaign at a row position"""
+        return self.metrics_many([position])[0]
+
+    def metrics_many(self, positions):
+        """
+        Rebuild the metrics dicts of many campaigns
+
+        Args:
+            positions (list): Row positions
+
+        Returns:
+            list: One metrics dict per position (missing metrics omitted)
+        """
+        metrics = [{} for _ in range(len(positions))]
+        for column in self.metric_columns:
+            series = self.frame[column]
+            present = np.flatnonzero(series.notna().to_numpy()[positions]).tolist()
+            if pd.api.types.is_integer_dtype(series):
+                values = series.to_numpy(dtype="int64", na_value=0)[positions].tolist()
+            elif pd.api.types.is_float_dtype(series):
+                values = series.to_numpy(dtype=float)[positions].tolist()
+            else:
+                values = series.to_numpy(dtype=object)[positions]
+            for row in present:
+                metrics[row][column] = values[row]
+        return metrics
+
+    def select(self, ids=None, filter=None):
+        """
+        Row positions of the campaigns matching ids and/or a filter
+
+        Args:
+            ids (list): Campaign IDs (unknown IDs are ignored)
+            filter: Either a dict of column -> value (or list of values), or a
+                callable taking the DataFrame and returning a boolean mask
+
+        Returns:
+            numpy.ndarray: Row positions
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        if ids is not None:
+            selected = np.zeros(len(self.frame), dtype=bool)
+            selected[[self._positions[i] for i in ids if i in self._positions]] = True
+            mask &= selected
+        if callable(filter):
+            mask &= np.asarray(filter(self.frame), dtype=bool)
+        elif filter:
+            for column, value in filter.items():
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                mask &= self.frame[column].isin(values).to_numpy()
+        return np.flatnonzero(mask)
+
+    def _column(self, name, positions):
+        """Float values of a metric column for some rows (NaN where missing)"""
+        if name not in self.frame:
+            return np.full(len(positions), np.nan)
+        return self.frame[name].to_numpy(dtype=float, na_value=np.nan)[positions]
+
+
+_default_store = None
+_default_store_version = None
+
+
+def get_campaign_store():
+    """Get the store built from CAMPAIGN_DATA, creating it on first use and again after upsert_campaign"""
+    global _default_store, _default_store_version
+    version = campaign_data_version()
+    if _default_store is None or _default_store_version != version:
+        # A batch of upserts (event_ingest.apply_metrics) costs one rebuild
+        _default_store = CampaignStore.from_records(CAMPAIGN_DATA)
+        _default_store_version = version
+    return _default_store
+
+
+def _fired_rules(store, positions):
+    """
+    Evaluate the analyze_campaign_data rules for many rows at once
+
+    Returns:
+        tuple: (codes, combinations) where codes[i] has one bit per rule that
+            fired for row i, and combinations maps each distinct code to its
+            (insights, recommendations) lists
+    """
+    campaign_types = store.frame["campaign_type"].to_numpy()[positions]
+    is_email = campaign_types == "email"
+    is_social = campaign_types == "social"
+    is_webinar = campaign_types == "webinar"
+    open_rate = store._column("open_rate", positions)
+    click_rate = store._column("click_rate", positions)
+    engagement_rate = store._column("engagement_rate", positions)
+    attendance_rate = store._column("attendance_rate", positions)
+    conversion_rate = np.nan_to_num(store._column("conversion_rate", positions), nan=0.0)
+
+    # (mask, insight, recommendation) in the order analyze_campaign_data applies them
+    rules = [
+        (is_email & (open_rate > 20), "Open rate is above industry average (20%)", None),
+        (is_email & ~(open_rate > 20), "Open rate is below industry average (20%)",
+         "Improve subject lines and sender name"),
+        (is_email & (click_rate < 4), "Click rate could be improved",
+         "Review call-to-action clarity and placement"),
+        # PLATFORM_RULE_BIT: the only insight that depends on a text column
+        (is_social & (engagement_rate > 3), "Strong engagement rate on {platform}", None),
+        (is_social & ~(engagement_rate > 3), "Engagement rate needs improvement",
+         "Increase visual content and post at optimal times"),
+        (is_webinar & (attendance_rate > 60), "Excellent attendance rate", None),
+        (is_webinar & ~(attendance_rate > 60), "Attendance rate could be improved",
+         "Send more reminder emails and add calendar invites"),
+        (conversion_rate < 2, "Conversion rate needs improvement",
+         "Strengthen calls-to-action and landing page design"),
+    ]
+
+    codes = np.zeros(len(positions), dtype=np.int64)
+    for bit, (mask, _, _) in enumerate(rules):
+        codes |= mask.astype(np.int64) << bit
+
+    # Rows that fired the same rules get the same insights, so each distinct
+    # combination is built once instead of appending row by row
+    combinations = {}
+    for code in np.unique(codes).tolist():
+        fired = [rule for bit, rule in enumerate(rules) if code >> bit & 1]
+        combinations[code] = (
+            [insight for _, insight, _ in fired],
+            [recommendation for _, _, recommendation in fired if recommendation],
+        )
+    return codes, combinations
+
+
+def _platforms(store, positions):
+    if "top_performing_platform" not in store.frame:
+        return np.full(len(positions), None, dtype=object)
+    return store.frame["top_performing_platform"].to_numpy(dtype=object)[positions]
+
+
+def analyze_campaigns_frame(ids=None, filter=None, store=None):
+    """
+    Analyze many campaigns and return the results as a DataFrame
+
+    This avoids building one dict per campaign, which dominates the cost of
+    analyze_campaigns for tens of thousands of rows.
+
+    Args:
+        ids (list): Campaign IDs to analyze (default: all campaigns)
+        filter: Column filter, see CampaignStore.select
+        store (CampaignStore): Store to read (default: CAMPAIGN_DATA)
+
+    Returns:
+        pandas.DataFrame: campaign_type, insights and recommendations columns
+            indexed by campaign_id (unknown IDs are left out). Rows with the
+            same outcome share their lists; copy one before changing it.
+    """
+    store = store or get_campaign_store()
+    positions = store.select(ids, filter)
+    codes, combinations = _fired_rules(store, positions)
+
+    code_series = pd.Series(codes, index=store.frame.index[positions])
+    insights = code_series.map({code: value[0] for code, value in combinations.items()})
+    recommendations = code_series.map({code: value[1] for code, value in combinations.items()})
+
+    with_platform = np.flatnonzero(codes & PLATFORM_RULE_BIT)
+    if len(with_platform):
+        # Format each distinct (rules, platform) pair once
+        platforms = _platforms(store, positions)[with_platform].tolist()
+        formatted = {}
+        values = insights.to_numpy(dtype=object).copy()
+        for row, code, platform in zip(with_platform.tolist(), codes[with_platform].tolist(), platforms):
+            key = (code, platform)
+            if key not in formatted:
+                formatted[key] = [insight.format(platform=platform) for insight in combinations[code][0]]
+            values[row] = formatted[key]
+        insights = pd.Series(values, index=insights.index)
+
+    return pd.DataFrame({
+        "campaign_type": store.frame["campaign_type"].iloc[positions],
+        "insights": insights,
+        "recommendations": recommendations,
+    })
+
+
+def analyze_campaigns(ids=None, filter=None, store=None, include_metrics=True):
+    """
+    Analyze many campaigns at once with vectorized threshold checks
+
+    Applies the same rules as actions.analyze_campaign_data, so
+    analyze_campaigns([campaign_id])[campaign_id] equals
+    analyze_campaign_data(campaign_id).
+
+    Args:
+        ids (list): Campaign IDs to analyze (default: all campaigns)
+        filter: Column filter, see CampaignStore.select
+        store (CampaignStore): Store to read (default: CAMPAIGN_DATA)
+        include_metrics (bool): Include each campaign's metrics dict
+
+    Returns:
+        dict: campaign_id -> analysis (or error for unknown IDs)
+    """
+    store = store or get_campaign_store()
+    positions = store.select(ids, filter)
+    codes, combinations = _fired_rules(store, positions)
+    platforms = _platforms(store, positions)
+
+    analysis_date = datetime.now().strftime("%Y-%m-%d")
+    campaign_ids = store.frame.index.to_numpy()[positions].tolist()
+    metrics = store.metrics_many(positions) if include_metrics else None
+    results = {}
+    for row, code in enumerate(codes.tolist()):
+        campaign_id = campaign_ids[row]
+        insights, recommendations = combinations[code]
+        if code & PLATFORM_RULE_BIT:
+            insights = [insight.format(platform=platforms[row]) for insight in insights]
+        analysis = {"campaign_id": campaign_id}
+        if include_metrics:
+            analysis["metrics"] = metrics[row]
+        analysis["insights"] = list(insights)
+        analysis["recommendations"] = list(recommendations)
+        analysis["analysis_date"] = analysis_date
+        results[campaign_id] = analysis
+
+    for campaign_id in ids or []:
+        if campaign_id not in store:
+            results[campaign_id] = {
+                "error": f"Campaign '{campaign_id}' not found",
+                "available_campaigns": store.campaign_ids
+            }
+    return results
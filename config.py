@@ -0,0 +1,31 @@
+# config.py
+# Settings from the environment and .env, loaded on first use rather than at
+# import time so short-lived workers don't pay for python-dotenv up front.
+import os
+
+_loaded = False
+
+
+def load_config():
+    """Load .env into the environment (once)"""
+    global _loaded
+    if not _loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _loaded = True
+
+
+def get_setting(name, default=None):
+    """
+    Read a setting from the environment, loading .env first
+
+    Args:
+        name (str): Variable name, e.g. "OPENAI_API_KEY"
+        default: Value if the variable is unset or empty
+
+    Returns:
+        str: The setting
+    """
+    load_config()
+    return os.getenv(name) or default
@@ -0,0 +1,142 @@
+# content_templates.py
+import json
+import os
+from collections import namedtuple
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_templates.json")
+
+LENGTHS = ("short", "medium", "long")
+
+# Everything generate_content needs for one (tone, platform, length) combination
+ContentVariant = namedtuple("ContentVariant", [
+    "templates",               # Body templates to choose from ({topic}, {audience})
+    "first_sentence_only",     # Cut the body after its first sentence (short length)
+    "long_context",            # Text appended to the body for long length
+    "fixed_content",           # Replaces the body entirely (LinkedIn), or None
+    "max_length",              # Truncate to this many characters, or None
+    "wrapper",                 # Format string around the body ({content}), or None
+    "hashtags",                # Hashtag templates ({topic_tag}, {topic_tag_clean})
+    "estimated_reading_time",
+])
+
+
+class ContentTemplateRegistry:
+    """
+    Content templates compiled once and indexed by (tone, platform, length)
+
+    Tone and platform aliases (e.g. "friendly" -> casual, "x" -> twitter) are
+    resolved when the registry is built, so a lookup is two dict reads.
+
+    Args:
+        config (dict): Parsed content_templates.json
+    """
+
+    def __init__(self, config):
+        self.default_tone = config["default_tone"]
+        self.tone_aliases = {}
+        for tone, tone_config in config["tones"].items():
+            for alias in tone_config.get("aliases", [tone]):
+                self.tone_aliases[alias] = tone
+
+        self.platform_aliases = {}
+        for platform, platform_config in config["platforms"].items():
+            for alias in platform_config.get("aliases", [platform]):
+                self.platform_aliases[alias] = platform
+
+        # Unknown platforms get no platform-specific treatment, like no platform
+        platforms = dict(config["platforms"])
+        platforms[None] = {}
+
+        self.variants = {}
+        for tone, tone_config in config["tones"].items():
+            templates = tuple(tone_config["templates"])
+            for platform, platform_config in platforms.items():
+                for length in LENGTHS + (None,):
+                    fixed_content = platform_config.get("content")
+                    if fixed_content is not None:
+                        fixed_content = fixed_content.get(length, fixed_content["default"])
+                    self.variants[(tone, platform, length)] = ContentVariant(
+                        templates=templates,
+                        first_sentence_only=length == "short",
+                        long_context=config["long_context"] if length == "long" else None,
+                        fixed_content=fixed_content,
+                        max_length=platform_config.get("max_length"),
+                        wrapper=platform_config.get("wrapper"),
+                        hashtags=tuple(platform_config.get("hashtags", ())),
+                        estimated_reading_time=platform_config.get("estimated_reading_time", ""),
+                    )
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_TEMPLATES_PATH):
+        """Load and compile a templates file"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def lookup(self, tone, platform, length):
+        """
+        Find the compiled variant for a request
+
+        Args:
+            tone (str): Tone of voice (unknown tones use the default tone)
+            platform (str): Platform, or None
+            length (str): short, medium or long (anything else is treated
+                like medium, except that LinkedIn uses its default copy)
+
+        Returns:
+            ContentVariant: The compiled variant
+        """
+        tone_key = self.tone_aliases.get(tone.lower(), self.default_tone)
+        platform_key = self.platform_aliases.get(platform.lower()) if platform else None
+        length_key = length.lower()
+        if length_key not in LENGTHS:
+            length_key = None
+        return self.variants[(tone_key, platform_key, length_key)]
+
+
+def render_content(variant, topic, audience, rng):
+    """
+    Fill in a compiled variant
+
+    Args:
+        variant (ContentVariant): Variant from ContentTemplateRegistry.lookup
+        topic (str): Content topic
+        audience (str): Target audience
+        rng (random.Random): Source of randomness for the template choice
+
+    Returns:
+        tuple: (content, hashtags)
+    """
+    # The template is always drawn so seeded runs stay in step
+    content = rng.choice(variant.templates).format(topic=topic, audience=audience)
+
+    if variant.first_sentence_only:
+        first_sentence_end = content.find('.')
+        if first_sentence_end > 0:
+            content = content[:first_sentence_end + 1]
+    elif variant.long_context:
+        content += variant.long_context.format(topic=topic, audience=audience)
+
+    if variant.fixed_content is not None:
+        content = variant.fixed_content
+    if variant.max_length and len(content) > variant.max_length:
+        content = content[:variant.max_length - 3] + "..."
+    if variant.wrapper:
+        content = variant.wrapper.format(topic=topic, audience=audience, content=content)
+
+    topic_tag = topic.replace(' ', '')
+    hashtags = [
+        hashtag.format(topic_tag=topic_tag, topic_tag_clean=topic_tag.replace(':', ''))
+        for hashtag in variant.hashtags
+    ]
+    return content, hashtags
+
+
+_registry = None
+
+
+def get_registry():
+    """Get the registry compiled from content_templates.json, loading it on first use"""
+    global _registry
+    if _registry is None:
+        _registry = ContentTemplateRegistry.from_file()
+    return _registry
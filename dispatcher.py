@@ -0,0 +1,411 @@
+# dispatcher.py
+"""
+Publish scheduled content when it falls due
+
+Usage:
+    python dispatcher.py            # publish everything that is due, then exit
+    python dispatcher.py --watch    # keep running and publish items as they fall due
+"""
+import argparse
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from schedule_store import PUBLISH_AT_FORMAT, get_schedule_store
+
+# Requests per second and burst size for each platform's token bucket
+DEFAULT_RATE_LIMITS = {
+    "linkedin": (5, 10),
+    "twitter": (10, 20),
+    "x": (10, 20),
+    "instagram": (5, 10),
+    "email": (50, 100),
+}
+
+
+class PublishError(Exception):
+    """
+    A publisher could not publish an item
+
+    Args:
+        message (str): What went wrong
+        retryable (bool): Whether trying again later might succeed
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class StandInPublisher:
+    """
+    Local stand-in for a platform's publishing API
+
+    Args:
+        platform (str): Platform name
+        latency (float): Seconds each publish call takes
+        failure_rate (float): Chance of a transient failure per call
+        max_length (int): Reject longer content (permanent failure), or None
+        seed (int): Seed for the failure draws
+    """
+
+    def __init__(self, platform, latency=0.0, failure_rate=0.0, max_length=None, seed=None):
+        self.platform = platform
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_length = max_length
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+
+    def publish(self, item):
+        """
+        Publish one scheduled item
+
+        Returns:
+            dict: Receipt with the platform's post ID
+
+        Raises:
+            PublishError: If publishing failed
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if self.max_length and len(item["content"]) > self.max_length:
+            raise PublishError(f"Content exceeds {self.max_length} characters", retryable=False)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise PublishError(f"{self.platform} is temporarily unavailable")
+        post_id = f"{self.platform}_{next(self._ids)}"
+        return {
+            "scheduling_id": item["scheduling_id"],
+            "platform": self.platform,
+            "post_id": post_id,
+            "published_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+
+def default_publishers(**options):
+    """Stand-in publishers for LinkedIn, Twitter/X, Instagram and email"""
+    twitter = StandInPublisher("twitter", max_length=280, **options)
+    return {
+        "linkedin": StandInPublisher("linkedin", **options),
+        "twitter": twitter,
+        "x": twitter,
+        "instagram": StandInPublisher("instagram", **options),
+        "email": StandInPublisher("email", **options),
+    }
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter (used from the dispatcher loop only)
+
+    Args:
+        rate (float): Tokens added per second, or None for no limit
+        capacity (float): Maximum burst
+    """
+
+    def __init__(self, rate, capacity=None, now=0.0):
+        self.rate = rate
+        self.capacity = capacity or rate or 1
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def ready_at(self, now):
+        """Earliest time a token is available"""
+        if not self.rate:
+            return now
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Take a token if one is available"""
+        if not self.rate:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def due_timestamp(item):
+    """Epoch time an item is due (publish_at is local time)"""
+    return datetime.strptime(item["publish_at"], PUBLISH_AT_FORMAT).timestamp()
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class PublishDispatcher:
+    """
+    Hands scheduled items to platform publishers as they fall due
+
+    Each platform has its own min-heap of due times and its own token bucket,
+    so a throttled platform waits without holding up the others. Publishing
+    runs on a bounded worker pool; failed items are retried with exponential
+    backoff and the outcome is written back to the schedule store in batches.
+
+    Items are marked "publishing" in the store before they are handed to a
+    publisher, so after a crash mid-publish they are not loaded (and posted)
+    again; check such items by hand. An item waiting for a retry is
+    "scheduled" again.
+
+    Args:
+        store (ScheduleStore): Where items come from and statuses go (default:
+            the shared store)
+        publishers (dict): platform -> object with publish(item)
+        rate_limits (dict): platform -> (rate per second, burst); platforms
+            without an entry are not limited
+        max_workers (int): Concurrent publish calls
+        max_attempts (int): Attempts per item before it is marked failed
+        backoff_seconds (float): Delay before the first retry (doubles each time)
+        on_result (callable): Called with (item, receipt, error) after each
+            final outcome
+        clock (callable): Time source (epoch seconds)
+    """
+
+    def __init__(self, store=None, publishers=None, rate_limits=None, max_workers=8,
+                 max_attempts=3, backoff_seconds=1.0, on_result=None, clock=time.time):
+        self.store = store if store is not None else get_schedule_store()
+        self.publishers = publishers if publishers is not None else default_publishers()
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.on_result = on_result
+        self.clock = clock
+
+        self._queues = {}    # platform -> heap of (due, sequence, attempt, item)
+        self._buckets = {}   # platform -> TokenBucket
+        self._queued = set()
+        self._sequence = itertools.count()
+        self._completed = []
+        self._completed_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._in_flight = 0
+        self._next_platform = 0  # where _dispatch_ready starts (see there)
+        self._status_updates = []
+
+        self.lags = []
+        self.counts = {"published": 0, "failed": 0, "retried": 0}
+
+    def __len__(self):
+        """Items waiting in the queues"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def add(self, item, due=None, attempt=1):
+        """
+        Queue an item
+
+        Args:
+            item (dict): Schedule store row (scheduling_id, platform, content, publish_at)
+            due (float): Epoch time to publish (default: the item's publish_at)
+            attempt (int): Attempt number
+        """
+        platform = item["platform"].lower()
+        if platform not in self._queues:
+            self._queues[platform] = []
+            rate, burst = self.rate_limits.get(platform, (None, None))
+            self._buckets[platform] = TokenBucket(rate, burst, now=self.clock())
+        due = due_timestamp(item) if due is None else due
+        heapq.heappush(self._queues[platform], (due, next(self._sequence), attempt, item))
+        self._queued.add(item["scheduling_id"])
+        self._wakeup.set()
+
+    def load_due(self, until=None):
+        """
+        Queue items from the store that are due by a time
+
+        Args:
+            until (datetime): Latest publish time to load (default: now)
+
+        Returns:
+            int: Number of items queued
+        """
+        until = until or datetime.now()
+        end = (until + timedelta(minutes=1)).strftime(PUBLISH_AT_FORMAT)
+        loaded = 0
+        for item in self.store.query(end=end, status="scheduled"):
+            if item["scheduling_id"] not in self._queued:
+                self.add(item)
+                loaded += 1
+        return loaded
+
+    def _publish(self, item, attempt):
+        publisher = self.publishers.get(item["platform"].lower())
+        try:
+            if publisher is None:
+                raise PublishError(f"No publisher for platform '{item['platform']}'", retryable=False)
+            outcome = (publisher.publish(item), None)
+        except Exception as e:
+            outcome = (None, e)
+        finally:
+            self._slots.release()
+        with self._completed_lock:
+            self._completed.append((item, attempt) + outcome)
+        self._wakeup.set()
+
+    def _handle_completed(self):
+        with self._completed_lock:
+            completed, self._completed = self._completed, []
+        for item, attempt, receipt, error in completed:
+            self._in_flight -= 1
+            if error is None:
+                self._finish(item, "published", receipt, None)
+            elif getattr(error, "retryable", True) and attempt < self.max_attempts:
+                delay = self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                self.counts["retried"] += 1
+                self._status_updates.append((item["scheduling_id"], "scheduled"))
+                self.add(item, due=self.clock() + delay, attempt=attempt + 1)
+            else:
+                self._finish(item, "failed", None, error)
+        self._flush_statuses()
+
+    def _finish(self, item, status, receipt, error):
+        self.counts[status] += 1
+        self._queued.discard(item["scheduling_id"])
+        self._status_updates.append((item["scheduling_id"], status))
+        if self.on_result:
+            self.on_result(item, receipt, error)
+
+    def _flush_statuses(self):
+        if self._status_updates:
+            self.store.set_status_many(self._status_updates)
+        self._status_updates = []
+
+    def _dispatch_ready(self, executor):
+        """
+        Submit every item whose due time has passed and whose bucket has a token
+
+        Stops early when every worker is busy; a worker that finishes sets
+        the wakeup event, so the loop comes back without blocking here.
+
+        Returns:
+            float: Time the next item becomes ready, or None if the queues are
+                empty or every worker is busy
+        """
+        next_ready = None
+        ready_items = []
+        platforms = list(self._queues)
+        # Start after the platform that last found every worker busy, so one
+        # busy platform can't take every worker that frees up
+        start = self._next_platform % len(platforms) if platforms else 0
+        for position, platform in enumerate(platforms[start:] + platforms[:start]):
+            queue, bucket = self._queues[platform], self._buckets[platform]
+            full = False
+            while queue:
+                now = self.clock()
+                ready = max(queue[0][0], bucket.ready_at(now))
+                if ready > now:
+                    next_ready = ready if next_ready is None else min(next_ready, ready)
+                    break
+                # Back-pressure: leave the item queued instead of queueing in the pool
+                if not self._slots.acquire(blocking=False):
+                    full = True
+                    break
+                bucket.take(now)
+                due, _, attempt, item = heapq.heappop(queue)
+                ready_items.append((due, attempt, item))
+            if full:
+                self._next_platform = start + position + 1
+                next_ready = None
+                break
+
+        if ready_items:
+            # Recorded before any publish call starts (see the class docstring)
+            self.store.set_status_many([(item["scheduling_id"], "publishing") for _, _, item in ready_items])
+        for due, attempt, item in ready_items:
+            self._in_flight += 1
+            self.lags.append(self.clock() - due)
+            executor.submit(self._publish, item, attempt)
+        return next_ready
+
+    def run(self, stop_when_idle=True, poll_interval=1.0, stop_event=None, reload_interval=None):
+        """
+        Publish queued items as they fall due
+
+        Args:
+            stop_when_idle (bool): Return once the queues are empty and nothing
+                is in flight (otherwise run until stop_event is set)
+            poll_interval (float): Longest sleep between checks
+            stop_event (threading.Event): Set to stop the loop
+            reload_interval (float): Call load_due this often (seconds) to pick
+                up newly scheduled items, or None
+
+        Returns:
+            dict: stats()
+        """
+        last_reload = self.clock()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not (stop_event and stop_event.is_set()):
+                self._wakeup.clear()
+                if reload_interval and self.clock() - last_reload >= reload_interval:
+                    self.load_due()
+                    last_reload = self.clock()
+                self._handle_completed()
+                next_ready = self._dispatch_ready(executor)
+                if stop_when_idle and next_ready is None and self._in_flight == 0:
+                    break
+                timeout = poll_interval
+                if next_ready is not None:
+                    timeout = min(timeout, max(0.0, next_ready - self.clock()))
+                if timeout:
+                    self._wakeup.wait(timeout)
+        self._handle_completed()
+        return self.stats()
+
+    def stats(self):
+        """
+        Outcome counts and dispatch lag (seconds between due time and hand-off)
+
+        Returns:
+            dict: Counts, queue length and lag percentiles
+        """
+        lags = sorted(self.lags)
+        return {
+            **self.counts,
+            "queued": len(self),
+            "in_flight": self._in_flight,
+            "lag_p50": _percentile(lags, 50),
+            "lag_p95": _percentile(lags, 95),
+            "lag_p99": _percentile(lags, 99),
+            "lag_max": lags[-1] if lags else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish scheduled content that is due")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and publish items as they fall due")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    def report(item, receipt, error):
+        outcome = receipt["post_id"] if receipt else f"failed: {error}"
+        print(f"{item['publish_at']} {item['platform']:<10} {item['scheduling_id']} {outcome}")
+
+    dispatcher = PublishDispatcher(max_workers=args.workers, on_result=report)
+    dispatcher.load_due()
+    if not args.watch:
+        print(dispatcher.run())
+    else:
+        # Publish times have minute resolution, so reloading once a minute is enough
+        try:
+            dispatcher.run(stop_when_idle=False, reload_interval=60)
+        except KeyboardInterrupt:
+            print(dispatcher.stats())
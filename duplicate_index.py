@@ -0,0 +1,450 @@
+# duplicate_index.py
+"""
+Near-duplicate index of generated and scheduled posts (MinHash + LSH)
+
+Each post is cut into shingles (runs of SHINGLE_WORDS consecutive words,
+lowercased, punctuation dropped) and summarised by a MinHash signature of
+NUM_PERM values; the share of positions where two signatures agree
+estimates the Jaccard similarity of the two shingle sets. Signatures are
+split into BANDS bands, and posts that agree on a whole band share a
+bucket, so a lookup compares a post only with the posts it shares a bucket
+with rather than with every post in the index. With 32 bands of 4 values,
+posts at the default 0.7 similarity almost always share a bucket, while
+posts at 0.3 share one less than a quarter of the time.
+
+Buckets are kept per platform and week, so a lookup limited to a platform
+and date window only reads the weeks in the window, and buckets are read
+newest first in small rounds until enough matches are found, so a post with
+thousands of near-duplicates costs no more than one with a few. Posts with
+the same signature on the same platform and week (the same template filled
+in the same way) are kept as one group, so exact repeats do not grow the
+buckets. Matches can also be limited to a kind of entry ("generated" or
+"scheduled"), and the index is kept in SQLite so it lasts across runs.
+
+Usage:
+    python duplicate_index.py stats [path]
+"""
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime
+
+import numpy as np
+
+from config import get_setting
+
+DEFAULT_INDEX_PATH = ".data/duplicates.sqlite"
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 2
+DEFAULT_THRESHOLD = 0.7
+
+# Days either side of a post's date searched by the actions
+DEFAULT_WINDOW_DAYS = 30
+
+# Seed of the MinHash and band hash functions; signatures stored with one
+# seed can't be compared with another
+HASH_SEED = 20240501
+
+KINDS = ("generated", "scheduled")
+
+# Days per bucket shard
+SHARD_DAYS = 7
+
+# Candidates read from each bucket per round of a lookup
+CANDIDATE_CHUNK = 32
+
+WORD_PATTERN = re.compile(r"[a-z0-9#@']+")
+
+
+def new_content_id():
+    """ID for a generated post (scheduled posts use their scheduling_id)"""
+    return f"gen_{os.urandom(8).hex()}"
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """
+    Hashed word shingles of a post
+
+    Returns:
+        numpy.ndarray: Distinct 32-bit shingle hashes (one for the whole
+            text if it has fewer than size words)
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.uint64)
+
+
+def _day(value):
+    """Date ordinal of a date, datetime or YYYY-MM-DD string (None stays None)"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DuplicateIndex:
+    """
+    MinHash/LSH index of posts with platform, date and kind
+
+    Args:
+        path (str): SQLite file (":memory:" for a throwaway index); defaults
+            to the DUPLICATE_DB_PATH setting, then DEFAULT_INDEX_PATH
+        threshold (float): Default similarity at which posts count as
+            near-duplicates
+        num_perm (int): MinHash signature length
+        bands (int): LSH bands (must divide num_perm)
+    """
+
+    def __init__(self, path=None, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        path = path or get_setting("DUPLICATE_DB_PATH", DEFAULT_INDEX_PATH)
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        rng = np.random.default_rng(HASH_SEED)
+        # Multiply-shift hash functions: h(x) = (a * x + b) >> 32, modulo 2**64
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self._lock = threading.RLock()
+        self._ids = []  # doc position -> doc_id
+        self._positions = {}  # doc_id -> doc position
+        self._doc_kind = []  # doc position -> index in KINDS
+        self._doc_day = []  # doc position -> date ordinal or None
+        self._groups = {}  # (signature bytes, shard) -> group
+        self._group_members = []  # group -> doc positions, oldest first
+        self._group_platform = []  # group -> platform
+        self._group_signatures = np.zeros((1024, num_perm), dtype=np.uint32)  # grown by doubling
+        self._shards = {}  # (platform, week or None) -> {band key -> groups, oldest first}
+        self._platform_weeks = {}  # platform -> weeks with posts (None for undated posts)
+        self._bucket_count = 0
+        self._largest_bucket = 0
+        self.counts = {"queries": 0, "candidates": 0, "flagged": 0}
+
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " doc_id TEXT PRIMARY KEY, kind TEXT NOT NULL, platform TEXT NOT NULL, day INTEGER,"
+            " signature BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._check_settings()
+        self._load()
+
+    def _check_settings(self):
+        settings = {"num_perm": str(self.num_perm), "hash_seed": str(HASH_SEED), "shingle_words": str(SHINGLE_WORDS)}
+        stored = dict(self._db.execute("SELECT name, value FROM settings").fetchall())
+        if stored and stored != settings:
+            raise ValueError(f"{self.path} was built with different MinHash settings ({stored})")
+        if not stored:
+            with self._db:
+                self._db.executemany("INSERT INTO settings VALUES (?, ?)", settings.items())
+
+    def _load(self):
+        rows = self._db.execute("SELECT doc_id, kind, platform, day, signature FROM posts ORDER BY rowid").fetchall()
+        if not rows:
+            return
+        signatures = np.frombuffer(b"".join(row[4] for row in rows), dtype=np.uint32).reshape(len(rows), -1)
+        self._index_many([(row[0], row[1], row[2], row[3]) for row in rows], signatures)
+
+    def signature(self, text):
+        """MinHash signature of a post (numpy array of num_perm uint32 values)"""
+        hashes = shingles(text)
+        values = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signatures):
+        """One key per band of each signature (rows of signatures)"""
+        mixed = signatures.astype(np.uint64) * self._band_mix
+        return mixed.reshape(len(signatures), self.bands, -1).sum(axis=2, dtype=np.uint64) + np.arange(
+            self.bands, dtype=np.uint64)
+
+    def _index_many(self, entries, signatures):
+        """Add (doc_id, kind, platform, day) entries with their signatures to the in-memory index"""
+        keys = self._band_keys(signatures).tolist()
+        for (doc_id, kind, platform, day), signature, band_keys in zip(entries, signatures, keys):
+            shard = (platform, None if day is None else day // SHARD_DAYS)
+            group_key = (signature.tobytes(), shard)
+            group = self._groups.get(group_key)
+            if group is None:
+                group = self._groups[group_key] = len(self._group_members)
+                if group == len(self._group_signatures):
+                    self._group_signatures = np.concatenate([self._group_signatures, self._group_signatures])
+                self._group_signatures[group] = signature
+                self._group_members.append([])
+                self._group_platform.append(platform)
+                buckets = self._shards.get(shard)
+                if buckets is None:
+                    buckets = self._shards[shard] = {}
+                    self._platform_weeks.setdefault(platform, set()).add(shard[1])
+                for key in band_keys:
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        bucket = buckets[key] = []
+                        self._bucket_count += 1
+                    bucket.append(group)
+                    self._largest_bucket = max(self._largest_bucket, len(bucket))
+            self._positions[doc_id] = len(self._ids)
+            self._group_members[group].append(len(self._ids))
+            self._ids.append(doc_id)
+            self._doc_kind.append(KINDS.index(kind))
+            self._doc_day.append(day)
+
+    def add_many(self, posts):
+        """
+        Add posts in a single transaction
+
+        Args:
+            posts (list): Dicts with doc_id, text, and optionally platform,
+                date (YYYY-MM-DD, date or datetime) and kind ("generated" or
+                "scheduled", the default); IDs already in the index are skipped
+        """
+        with self._lock:
+            entries, signatures, seen = [], [], set()
+            for post in posts:
+                if post["doc_id"] in self._positions or post["doc_id"] in seen:
+                    continue
+                seen.add(post["doc_id"])
+                signature = post.get("signature")
+                if signature is None:
+                    signature = self.signature(post["text"])
+                entries.append((post["doc_id"], post.get("kind", "scheduled"), (post.get("platform") or "").lower(),
+                                _day(post.get("date"))))
+                signatures.append(signature)
+            if not entries:
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO posts (doc_id, kind, platform, day, signature) VALUES (?, ?, ?, ?, ?)",
+                    [(*entry, signature.tobytes()) for entry, signature in zip(entries, signatures)]
+                )
+            self._index_many(entries, np.array(signatures))
+
+    def add(self, doc_id, text, platform=None, date=None, kind="scheduled"):
+        """Add one post (see add_many)"""
+        self.add_many([{"doc_id": doc_id, "text": text, "platform": platform, "date": date, "kind": kind}])
+
+    def _query_shards(self, platform, start, end):
+        """Shards that can hold posts on the platform (None: any) dated from start to end"""
+        platforms = list(self._platform_weeks) if platform is None else [platform]
+        first = None if start is None else start // SHARD_DAYS
+        last = None if end is None else end // SHARD_DAYS
+        return [
+            (name, week) for name in platforms for week in self._platform_weeks.get(name, ())
+            if (start is None and end is None) or (
+                week is not None and (first is None or week >= first) and (last is None or week <= last)
+            )
+        ]
+
+    def query(self, text, platform=None, start=None, end=None, kinds=None, threshold=None, limit=10,
+              exclude=None, signature=None):
+        """
+        Posts similar to a text
+
+        Args:
+            text (str): Post to look up
+            platform (str): Only posts on this platform (default: any)
+            start, end: Only posts dated in this range, inclusive (YYYY-MM-DD,
+                date or datetime); posts without a date are left out when a
+                range is given
+            kinds (list): Only these kinds of entry (default: all)
+            threshold (float): Minimum similarity (default: the index's)
+            limit (int): Maximum number of matches
+            exclude (str): doc_id to leave out (the post itself)
+            signature (numpy.ndarray): Precomputed signature of text
+
+        Returns:
+            list: Dicts with doc_id, kind, platform, date and similarity,
+                most similar first; when there are more than limit matches,
+                the most recently added are returned
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(text) if signature is None else signature
+        platform = platform.lower() if platform else None
+        start, end = _day(start), _day(end)
+        kind_codes = None if kinds is None else {KINDS.index(kind) for kind in kinds}
+
+        with self._lock:
+            keys = self._band_keys(signature[None, :])[0].tolist()
+            buckets = [
+                bucket for shard in self._query_shards(platform, start, end)
+                for bucket in map(self._shards[shard].get, keys) if bucket
+            ]
+            seen, matches, read = set(), [], 0
+            # Newest candidates first, a chunk of each bucket per round
+            while buckets and len(matches) < limit:
+                fresh = []
+                for bucket in buckets:
+                    stop = len(bucket) - read
+                    for group in bucket[max(0, stop - CANDIDATE_CHUNK):stop]:
+                        if group not in seen:
+                            seen.add(group)
+                            fresh.append(group)
+                read += CANDIDATE_CHUNK
+                buckets = [bucket for bucket in buckets if len(bucket) > read]
+                if not fresh:
+                    continue
+                groups = np.array(fresh)
+                similarity = (self._group_signatures[groups] == signature).mean(axis=1)
+                order = np.argsort(-similarity, kind="stable")
+                for group, score in zip(groups[order].tolist(), similarity[order].tolist()):
+                    if score < threshold or len(matches) >= limit:
+                        break
+                    self._collect(group, score, start, end, kind_codes, exclude, limit, matches)
+            self.counts["queries"] += 1
+            self.counts["candidates"] += len(seen)
+            if matches:
+                self.counts["flagged"] += 1
+            matches.sort(key=lambda match: -match["similarity"])
+            return matches
+
+    def _collect(self, group, score, start, end, kind_codes, exclude, limit, matches):
+        """Append the members of a matching group that pass the filters, newest first"""
+        for position in reversed(self._group_members[group]):
+            day = self._doc_day[position]
+            if kind_codes is not None and self._doc_kind[position] not in kind_codes:
+                continue
+            if (start is not None or end is not None) and day is None:
+                continue
+            if (start is not None and day < start) or (end is not None and day > end):
+                continue
+            if self._ids[position] == exclude:
+                continue
+            matches.append({
+                "doc_id": self._ids[position],
+                "kind": KINDS[self._doc_kind[position]],
+                "platform": self._group_platform[group] or None,
+                "date": date.fromordinal(day).isoformat() if day is not None else None,
+                "similarity": round(score, 3),
+            })
+            if len(matches) >= limit:
+                return
+
+    def check(self, doc_id, text, platform=None, date=None, kind="scheduled", window_days=None, kinds=None,
+              limit=5):
+        """
+        Look up near-duplicates of a post, then add it
+
+        Args:
+            doc_id (str): ID of the new post
+            text (str): Post text
+            platform (str): Platform; matches are limited to it when given
+            date: Post date; with window_days, matches are limited to posts
+                dated within that many days of it
+            kind (str): Kind of the new post
+            window_days (int): Date window (default: no limit)
+            kinds (list): Kinds of entry to match (default: all)
+            limit (int): Maximum number of matches
+
+        Returns:
+            list: Matches, as returned by query
+        """
+        day = _day(date)
+        start = end = None
+        if window_days is not None and day is not None:
+            start, end = day - window_days, day + window_days
+        signature = self.signature(text)
+        with self._lock:
+            matches = self.query(text, platform=platform, start=start, end=end, kinds=kinds, limit=limit,
+                                 exclude=doc_id, signature=signature)
+            self.add_many([{"doc_id": doc_id, "text": text, "platform": platform, "date": day, "kind": kind,
+                            "signature": signature}])
+        return matches
+
+    def __len__(self):
+        return len(self._ids)
+
+    def stats(self):
+        """
+        Size of the index and query counters
+
+        Returns:
+            dict: posts, groups, shards, buckets, largest_bucket, queries,
+                flagged and candidates_per_query (groups compared per lookup)
+        """
+        with self._lock:
+            queries = self.counts["queries"]
+            return {
+                "posts": len(self._ids),
+                "groups": len(self._group_members),
+                "shards": len(self._shards),
+                "buckets": self._bucket_count,
+                "largest_bucket": self._largest_bucket,
+                "queries": queries,
+                "flagged": self.counts["flagged"],
+                "candidates_per_query": round(self.counts["candidates"] / queries, 2) if queries else 0.0,
+            }
+
+
+# Not opened yet (None means checks are turned off)
+_UNSET = object()
+_default_index = _UNSET
+_default_index_lock = threading.Lock()
+
+
+def get_duplicate_index():
+    """Get the index at DUPLICATE_DB_PATH, opening it on first use, or None if checks are off"""
+    global _default_index
+    if _default_index is _UNSET:
+        with _default_index_lock:
+            if _default_index is _UNSET:
+                _default_index = DuplicateIndex()
+    return _default_index
+
+
+def current_duplicate_index():
+    """The index used by the actions if one is open, without opening it (for stats and health checks)"""
+    index = _default_index
+    return None if index is _UNSET else index
+
+
+def set_duplicate_index(index):
+    """
+    Replace the index used by the actions (None: no checks)
+
+    Returns:
+        The previous value, to pass back to set_duplicate_index to restore it
+    """
+    global _default_index
+    with _default_index_lock:
+        previous, _default_index = _default_index, index
+    return previous
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Near-duplicate index of posts")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subcommands.add_parser("stats", help="Size of the index")
+    stats_parser.add_argument("path", nargs="?", default=None)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(DuplicateIndex(args.path).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
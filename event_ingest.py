@@ -0,0 +1,541 @@
+# event_ingest.py
+"""
+Campaign metrics from raw send/open/click event logs
+
+Event files are CSV (with a header) or JSONL, one event per line, with the
+columns campaign_id, event (send, open, click, conversion) and timestamp
+(ISO 8601 text or Unix seconds), and optionally segment, subject and
+platform. Files are memory-mapped and read in blocks of whole lines; each
+block is parsed with pandas and reduced to per-campaign counters, so memory
+stays bounded by the block size and the number of campaigns however large
+the logs are:
+
+- event counts (for total_sends, open_rate, click_rate, conversion_rate)
+- engagement (open and click) histograms by weekday and hour, for
+  peak_engagement_day and peak_engagement_time
+- counts by segment, subject and platform (segment breakdown, top and worst
+  performing subject)
+
+Hours and weekdays are taken as written in ISO timestamps (no time zone
+conversion); Unix timestamps are read as UTC.
+
+The ingestor remembers how far it has read each file (and a fingerprint of
+its start), so running it again after more events were appended only reads
+the new lines. A file that was truncated or replaced is read again from the
+start. apply_metrics() writes the results into CAMPAIGN_DATA, where
+analyze_campaign_data picks them up.
+
+Usage:
+    python event_ingest.py events.csv [more.jsonl ...] [--state .data/ingest_state.json] [--apply]
+    python event_ingest.py --sample 1000000 --output events.csv
+"""
+import hashlib
+import io
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from actions import CAMPAIGN_DATA, upsert_campaign
+
+REQUIRED_COLUMNS = ["campaign_id", "event", "timestamp"]
+BREAKDOWN_COLUMNS = ["segment", "subject", "platform"]
+
+# Events counted in the weekday and hour histograms
+ENGAGEMENT_EVENTS = ("open", "click")
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Bytes read and parsed at a time
+BLOCK_BYTES = 16 * 1024 * 1024
+
+# Bytes between state checkpoints while a large file is read
+CHECKPOINT_BYTES = 256 * 1024 * 1024
+
+# Bytes at the start of a file that identify it
+FINGERPRINT_BYTES = 4096
+
+# Distinct values kept per breakdown column and campaign; further values are
+# counted under OTHER
+MAX_CATEGORIES = 100
+OTHER = "(other)"
+
+DEFAULT_STATE_PATH = ".data/ingest_state.json"
+
+
+def _rate(count, total):
+    return round(count / total * 100, 2) if total else 0.0
+
+
+def _hour_label(hour):
+    return f"{hour % 12 or 12}:00 {'AM' if hour < 12 else 'PM'}"
+
+
+class CampaignAggregate:
+    """Running event counts for one campaign"""
+
+    def __init__(self):
+        self.events = {}  # event -> count
+        self.days = [0] * 7  # engagement events per weekday, Monday first
+        self.hours = [0] * 24  # engagement events per hour of day
+        self.breakdowns = {}  # column -> value -> event -> count
+
+    def add_breakdown(self, column, value, event, count, max_categories=MAX_CATEGORIES):
+        values = self.breakdowns.setdefault(column, {})
+        if value not in values and len(values) >= max_categories:
+            value = OTHER
+        events = values.setdefault(value, {})
+        events[event] = events.get(event, 0) + count
+
+    def merge(self, other, max_categories=MAX_CATEGORIES):
+        """Add another aggregate's counts to this one"""
+        for event, count in other.events.items():
+            self.events[event] = self.events.get(event, 0) + count
+        self.days = [a + b for a, b in zip(self.days, other.days)]
+        self.hours = [a + b for a, b in zip(self.hours, other.hours)]
+        for column, values in other.breakdowns.items():
+            for value, events in values.items():
+                for event, count in events.items():
+                    self.add_breakdown(column, value, event, count, max_categories)
+
+    def to_dict(self):
+        return {"events": self.events, "days": self.days, "hours": self.hours, "breakdowns": self.breakdowns}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.events = dict(data["events"])
+        aggregate.days = list(data["days"])
+        aggregate.hours = list(data["hours"])
+        aggregate.breakdowns = data["breakdowns"]
+        return aggregate
+
+    def metrics(self):
+        """
+        Campaign metrics in the CAMPAIGN_DATA format
+
+        Returns:
+            dict: total_sends, open_rate, click_rate, conversion_rate,
+                peak_engagement_day/time, top/worst_performing_subject,
+                audience_segments and segment_breakdown (fields without
+                data are left out)
+        """
+        events = self.events
+        sends = events.get("send", 0)
+        metrics = {}
+        if sends:
+            metrics.update({
+                "open_rate": _rate(events.get("open", 0), sends),
+                "click_rate": _rate(events.get("click", 0), sends),
+                "conversion_rate": _rate(events.get("conversion", 0), sends),
+                "total_sends": sends,
+            })
+        if any(self.days):
+            metrics["peak_engagement_day"] = DAY_NAMES[int(np.argmax(self.days))]
+            metrics["peak_engagement_time"] = _hour_label(int(np.argmax(self.hours)))
+
+        subjects = {
+            subject: _rate(counts.get("open", 0), counts["send"])
+            for subject, counts in self.breakdowns.get("subject", {}).items()
+            if counts.get("send") and subject != OTHER
+        }
+        if len(subjects) > 1:
+            metrics["top_performing_subject"] = max(subjects, key=subjects.get)
+            metrics["worst_performing_subject"] = min(subjects, key=subjects.get)
+
+        segments = {
+            segment: {
+                "sends": counts["send"],
+                "open_rate": _rate(counts.get("open", 0), counts["send"]),
+                "click_rate": _rate(counts.get("click", 0), counts["send"]),
+            }
+            for segment, counts in self.breakdowns.get("segment", {}).items()
+            if counts.get("send")
+        }
+        if segments:
+            # Most engaged first
+            metrics["audience_segments"] = sorted(
+                segments, key=lambda segment: (-segments[segment]["click_rate"], -segments[segment]["open_rate"])
+            )
+            metrics["segment_breakdown"] = segments
+        return metrics
+
+
+def _timestamp_parts(timestamps):
+    """
+    Weekday (Monday = 0) and hour of each timestamp
+
+    Returns:
+        tuple: (weekday, hour, valid) numpy arrays; rows with a timestamp
+            that cannot be read have valid False
+    """
+    values = pd.to_numeric(timestamps, errors="coerce") if not pd.api.types.is_numeric_dtype(timestamps) \
+        else timestamps
+    numeric = np.asarray(values, dtype=float)
+    if np.isfinite(numeric).mean() > 0.5:
+        valid = np.isfinite(numeric)
+        seconds = np.where(valid, numeric, 0).astype(np.int64)
+        days = seconds // 86400
+        return (days + 3) % 7, (seconds % 86400) // 3600, valid
+
+    # ISO text: read the digits straight from the bytes ("2024-03-05T10:15:00Z")
+    raw = timestamps.fillna("").to_numpy(dtype="S19")
+    digits = raw.view(np.uint8).reshape(len(raw), 19)
+    valid = (digits[:, 4] == ord("-")) & (digits[:, 7] == ord("-")) & np.isin(digits[:, 10], (ord("T"), ord(" ")))
+    hour = (digits[:, 11].astype(np.int64) - 48) * 10 + (digits[:, 12].astype(np.int64) - 48)
+    valid &= (hour >= 0) & (hour < 24)
+    try:
+        days = raw.astype("S10").astype("datetime64[D]").astype(np.int64)
+    except ValueError:
+        # Some date is not a real date; parse the slow way
+        parsed = pd.to_datetime(pd.Series(raw.astype("S10").astype(str)), errors="coerce", format="%Y-%m-%d")
+        valid &= parsed.notna().to_numpy()
+        days = np.where(valid, parsed.to_numpy(dtype="datetime64[D]").astype(np.int64), 0)
+    return (days + 3) % 7, np.where(valid, hour, 0), valid
+
+
+def _counts(*codes_and_sizes):
+    """Occurrences of each combination of codes (rows with a missing code are skipped)"""
+    keep = np.ones(len(codes_and_sizes[0][0]), dtype=bool)
+    key = np.zeros(len(keep), dtype=np.int64)
+    for codes, size in codes_and_sizes:
+        keep &= codes >= 0
+        key = key * size + codes
+    keys, counts = np.unique(key[keep], return_counts=True)
+    parts = []
+    for _, size in reversed(codes_and_sizes):
+        parts.append(keys % size)
+        keys = keys // size
+    return list(zip(*reversed(parts), counts.tolist()))
+
+
+def aggregate_frame(frame, aggregates, max_categories=MAX_CATEGORIES):
+    """
+    Add the events in a DataFrame to per-campaign aggregates
+
+    Args:
+        frame (pandas.DataFrame): Events (see the module docstring for columns)
+        aggregates (dict): campaign_id -> CampaignAggregate, updated in place
+        max_categories (int): Distinct breakdown values kept per campaign
+
+    Returns:
+        int: Events read
+    """
+    if frame.empty:
+        return 0
+    campaign_codes, campaigns = pd.factorize(frame["campaign_id"])
+    event_codes, events = pd.factorize(frame["event"])
+    campaigns = [str(campaign) for campaign in campaigns]
+    events = [str(event).strip().lower() for event in events]
+    for campaign in campaigns:
+        if campaign not in aggregates:
+            aggregates[campaign] = CampaignAggregate()
+
+    for campaign, event, count in _counts((campaign_codes, len(campaigns)), (event_codes, len(events))):
+        counts = aggregates[campaigns[campaign]].events
+        counts[events[event]] = counts.get(events[event], 0) + count
+
+    weekday, hour, valid = _timestamp_parts(frame["timestamp"])
+    engaged = np.isin(event_codes, [code for code, event in enumerate(events) if event in ENGAGEMENT_EVENTS])
+    engaged &= valid
+    engaged_codes = np.where(engaged, campaign_codes, -1)
+    for campaign, day, count in _counts((engaged_codes, len(campaigns)), (weekday, 7)):
+        aggregates[campaigns[campaign]].days[day] += count
+    for campaign, hour_of_day, count in _counts((engaged_codes, len(campaigns)), (hour, 24)):
+        aggregates[campaigns[campaign]].hours[hour_of_day] += count
+
+    for column in BREAKDOWN_COLUMNS:
+        if column not in frame:
+            continue
+        value_codes, values = pd.factorize(frame[column])
+        if not len(values):
+            continue
+        values = [str(value) for value in values]
+        for campaign, value, event, count in _counts(
+            (campaign_codes, len(campaigns)), (value_codes, len(values)), (event_codes, len(events))
+        ):
+            aggregates[campaigns[campaign]].add_breakdown(column, values[value], events[event], count, max_categories)
+    return len(frame)
+
+
+def _blocks(path, start, block_bytes):
+    """
+    Yield (block, end offset) for the complete lines of a file from start
+
+    A last line without a newline is left for a later run (it may still be
+    being written). Pages already parsed are handed back to the OS, so the
+    mapping does not grow the resident memory with the file.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start
+            released = start - start % mmap.PAGESIZE
+            while position < size:
+                end = min(size, position + block_bytes)
+                cut = mapped.rfind(b"\n", position, end)
+                if cut == -1:
+                    # One line longer than a block
+                    cut = mapped.find(b"\n", end)
+                    if cut == -1:
+                        return
+                yield mapped[position:cut + 1], cut + 1
+                position = cut + 1
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    done = position - position % mmap.PAGESIZE
+                    if done > released:
+                        mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+                        released = done
+
+
+def _fingerprint(path, length):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _file_format(path, format=None):
+    if format:
+        return format
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _parse_block(block, file_format, columns, header):
+    if file_format == "jsonl":
+        frame = pd.read_json(io.BytesIO(block), lines=True, dtype=False)
+        for column in REQUIRED_COLUMNS:
+            if column not in frame:
+                raise ValueError(f"Events are missing the {column!r} field")
+        return frame
+    wanted = [column for column in columns if column in REQUIRED_COLUMNS or column in BREAKDOWN_COLUMNS]
+    return pd.read_csv(io.BytesIO(block), header=None, names=columns, usecols=wanted, dtype=str,
+                       skiprows=1 if header else 0, keep_default_na=False, na_values=[""])
+
+
+class EventIngestor:
+    """
+    Incremental, bounded-memory aggregation of event files
+
+    Args:
+        state_path (str): JSON file holding read offsets and aggregates
+            between runs, or None to keep them in memory only
+        block_bytes (int): Bytes parsed at a time
+        max_categories (int): Distinct breakdown values kept per campaign
+    """
+
+    def __init__(self, state_path=DEFAULT_STATE_PATH, block_bytes=BLOCK_BYTES, max_categories=MAX_CATEGORIES):
+        self.state_path = state_path
+        self.block_bytes = block_bytes
+        self.max_categories = max_categories
+        self.files = {}  # path -> {offset, fingerprint, ..., campaigns}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.files = json.load(f)["files"]
+        self._aggregates = {}  # path -> {campaign_id: CampaignAggregate}, decoded on first use
+
+    def save(self):
+        """Write offsets and aggregates to the state file"""
+        if not self.state_path:
+            return
+        for path, aggregates in self._aggregates.items():
+            self.files[path]["campaigns"] = {campaign: aggregate.to_dict() for campaign, aggregate in aggregates.items()}
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(temporary, self.state_path)
+
+    def _file_aggregates(self, path):
+        if path not in self._aggregates:
+            campaigns = self.files.get(path, {}).get("campaigns", {})
+            self._aggregates[path] = {
+                campaign: CampaignAggregate.from_dict(data) for campaign, data in campaigns.items()
+            }
+        return self._aggregates[path]
+
+    def ingest(self, path, format=None):
+        """
+        Read the events added to a file since the last run
+
+        Args:
+            path (str): CSV or JSONL event file
+            format (str): "csv" or "jsonl" (default: from the file extension)
+
+        Returns:
+            dict: rows and bytes read, seconds taken, and whether the file
+                was read from the start
+        """
+        path = os.path.abspath(path)
+        started = time.perf_counter()
+        size = os.path.getsize(path)
+        entry = self.files.get(path)
+        if entry is not None and (
+            size < entry["offset"]
+            or _fingerprint(path, entry["fingerprint_bytes"]) != entry["fingerprint"]
+        ):
+            # Truncated or replaced: start over
+            entry = None
+            self._aggregates.pop(path, None)
+        if entry is None:
+            length = min(size, FINGERPRINT_BYTES)
+            entry = self.files[path] = {
+                "format": _file_format(path, format),
+                "offset": 0,
+                "rows": 0,
+                "fingerprint": _fingerprint(path, length),
+                "fingerprint_bytes": length,
+                "columns": None,
+                "campaigns": {},
+            }
+            self._aggregates[path] = {}
+        from_start = entry["offset"] == 0
+        aggregates = self._file_aggregates(path)
+
+        rows, read, unsaved = 0, 0, 0
+        for block, end in _blocks(path, entry["offset"], self.block_bytes):
+            header = False
+            if entry["format"] == "csv" and entry["columns"] is None:
+                entry["columns"] = block[:block.index(b"\n")].decode("utf-8").strip().split(",")
+                header = True
+                missing = [column for column in REQUIRED_COLUMNS if column not in entry["columns"]]
+                if missing:
+                    raise ValueError(f"{path} is missing the column(s) {', '.join(missing)}")
+            frame = _parse_block(block, entry["format"], entry["columns"], header)
+            count = aggregate_frame(frame, aggregates, self.max_categories)
+            rows += count
+            read += len(block)
+            unsaved += len(block)
+            entry["offset"] = end
+            entry["rows"] += count
+            if unsaved >= CHECKPOINT_BYTES:
+                self.save()
+                unsaved = 0
+        self.save()
+        return {"path": path, "rows": rows, "bytes": read, "seconds": round(time.perf_counter() - started, 3),
+                "from_start": from_start}
+
+    def aggregates(self):
+        """Aggregates of every file read so far, merged per campaign"""
+        merged = {}
+        for path in self.files:
+            for campaign, aggregate in self._file_aggregates(path).items():
+                merged.setdefault(campaign, CampaignAggregate()).merge(aggregate, self.max_categories)
+        return merged
+
+    def metrics(self):
+        """
+        Metrics per campaign from every file read so far
+
+        Returns:
+            dict: campaign_id -> metrics (see CampaignAggregate.metrics)
+        """
+        return {campaign: aggregate.metrics() for campaign, aggregate in self.aggregates().items()}
+
+
+def apply_metrics(metrics):
+    """
+    Write ingested metrics into CAMPAIGN_DATA for analyze_campaign_data
+
+    Fields the events do not cover (content themes, ...) are kept.
+
+    Args:
+        metrics (dict): campaign_id -> metrics (see EventIngestor.metrics)
+
+    Returns:
+        list: Updated campaign IDs
+    """
+    for campaign_id, campaign_metrics in metrics.items():
+        upsert_campaign(campaign_id, {**CAMPAIGN_DATA.get(campaign_id, {}), **campaign_metrics})
+    return list(metrics)
+
+
+def sample_events(rows, campaigns=20, seed=0, start="2024-01-01"):
+    """
+    Synthetic email events for trying the pipeline
+
+    Opens cluster on weekday mornings (most on Tuesdays at 10 AM), and each
+    campaign has three subject lines and four segments with different
+    engagement.
+
+    Returns:
+        pandas.DataFrame: campaign_id, event, timestamp, segment, subject
+    """
+    rng = np.random.default_rng(seed)
+    campaign = rng.integers(0, campaigns, rows)
+    segment = rng.integers(0, 4, rows)
+    subject = rng.integers(0, 3, rows)
+    # Engagement varies by segment and subject line
+    open_chance = 0.15 + 0.04 * segment + 0.03 * subject
+    draw = rng.random(rows)
+    event = np.where(draw < open_chance * 0.2, "conversion",
+                     np.where(draw < open_chance * 0.45, "click", np.where(draw < open_chance, "open", "send")))
+    day_weights = np.array([0.18, 0.26, 0.2, 0.16, 0.12, 0.04, 0.04])
+    hour_weights = np.exp(-0.5 * ((np.arange(24) - 10) / 3) ** 2) + 0.02
+    days = rng.choice(7, rows, p=day_weights) + 7 * rng.integers(0, 12, rows)
+    hours = rng.choice(24, rows, p=hour_weights / hour_weights.sum())
+    seconds = rng.integers(0, 3600, rows)
+    # start is a Monday by default, so day 0 is Monday
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(days * 86400 + hours * 3600 + seconds, unit="s")
+    return pd.DataFrame({
+        "campaign_id": np.char.add("email_campaign_", campaign.astype(str)),
+        "event": event,
+        "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "segment": np.array(["Marketing Managers", "Digital Marketers", "CMOs", "Founders"])[segment],
+        "subject": np.char.add("Subject line ", (subject + 1).astype(str)),
+    })
+
+
+def write_events(frame, path, append=False):
+    """Write events as CSV or JSONL (by extension), optionally appending"""
+    if _file_format(path) == "jsonl":
+        with open(path, "a" if append else "w", encoding="utf-8") as f:
+            f.write(frame.to_json(orient="records", lines=True))
+            f.write("\n")
+    else:
+        frame.to_csv(path, index=False, mode="a" if append else "w", header=not append)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Campaign metrics from event logs")
+    parser.add_argument("paths", nargs="*", help="CSV or JSONL event files")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Offsets and aggregates between runs")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+    parser.add_argument("--apply", action="store_true", help="Write the metrics into CAMPAIGN_DATA and analyze them")
+    parser.add_argument("--sample", type=int, default=None, metavar="ROWS",
+                        help="Write ROWS synthetic events to --output and exit")
+    parser.add_argument("--output", default="events.csv")
+    args = parser.parse_args()
+
+    if args.sample is not None:
+        write_events(sample_events(args.sample), args.output)
+        return
+    if not args.paths:
+        parser.error("at least one event file is required")
+
+    ingestor = EventIngestor(args.state)
+    for path in args.paths:
+        stats = ingestor.ingest(path, args.format)
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"{path}: {stats['rows']} new events in {stats['seconds']:.2f} s ({rate:,.0f} events/s)")
+    metrics = ingestor.metrics()
+    if args.apply:
+        from actions import analyze_campaign_data
+
+        apply_metrics(metrics)
+        for campaign_id in metrics:
+            print(json.dumps({campaign_id: analyze_campaign_data(campaign_id)}, default=str))
+    else:
+        print(json.dumps(metrics, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# history.py
+from result_encoder import ResultEncoder
+from token_counter import TOKENS_PER_REPLY, count_tokens, count_tool_call_tokens, count_tool_tokens, message_tokens
+
+
+class ConversationHistory:
+    """
+    Conversation state for the agent loop with a token budget
+
+    Messages are stored once and the prompt is rebuilt for every call. When
+    the prompt would go over the budget it is shrunk in stages:
+
+    1. Action results older than the most recent turns are replaced by
+       short summaries (see ResultEncoder.summarize)
+    2. Finished tasks are collapsed to the user's question and final reply
+    3. Finished tasks are dropped, oldest first
+
+    The system prompt and the current task's recent turns are always kept
+    verbatim.
+
+    Compaction only moves forward, and only when the budget is exceeded: a
+    stage once reached is kept, and the point up to which the current task
+    is compacted only advances when needed. Between those events each
+    prompt starts with exactly the messages of the previous one, which is
+    what provider-side prompt caching needs.
+
+    Every build() is logged in usage with its prompt tokens and the tokens
+    it shares with the previous prompt (prefix_tokens); record_completion()
+    adds the reply's tokens. All counts come from the local tokenizer.
+
+    Args:
+        system_prompt (str): System prompt sent with every call
+        token_budget (int): Maximum prompt tokens, or None for no limit
+        keep_recent (int): Number of most recent messages never compacted
+        model (str): Model whose tokenizer is used for counting
+        tools (list): Tool schemas sent with every call (counted as part of
+            the prompt)
+        encoder (ResultEncoder): How action results are written for the
+            model (default: compact projections with content previews)
+    """
+
+    def __init__(self, system_prompt, token_budget=None, keep_recent=4, model="gpt-3.5-turbo", tools=None,
+                 encoder=None):
+        self.system_prompt = system_prompt
+        self.encoder = encoder or ResultEncoder()
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.model = model
+        self.tool_tokens = count_tool_tokens(tools, model)
+        self.tasks = []           # Each task is a list of message entries
+        self.token_log = []       # Prompt tokens of every build() call
+        self.usage = []           # Per call: prompt, prefix and completion tokens
+        self.last_token_count = 0
+        self.last_prefix_tokens = 0
+        self._stage = 0           # Compaction stage reached so far (see build)
+        self._compact_through = 0 # Current-task entries before this are compacted
+        self._last_messages = None
+
+    def start_task(self, user_input):
+        """Start a new user task; earlier tasks count as finished"""
+        self.tasks.append([{"role": "user", "content": user_input}])
+        self._compact_through = 0
+
+    def add_assistant(self, content):
+        """Record a model reply in the current task"""
+        self.tasks[-1].append({"role": "assistant", "content": content})
+
+    def add_action_response(self, function_name, result, content=None):
+        """
+        Record an action result in the current task
+
+        Args:
+            function_name (str): Action that produced the result
+            result: The raw action result
+            content (str): Message text (defaults to "Action_Response: " and
+                the encoded result)
+
+        Returns:
+            str: The message text
+        """
+        if content is None:
+            content = f"Action_Response: {self.encoder.encode(function_name, result)}"
+        self.tasks[-1].append({
+            "role": "user",
+            "content": content,
+            "function_name": function_name,
+            "result": result,
+        })
+        return content
+
+    def add_tool_calls(self, content, tool_calls):
+        """
+        Record a model reply that calls tools (native tool-calling mode)
+
+        Args:
+            content (str): Reply text, may be None
+            tool_calls (list): Tool calls in the chat API format
+        """
+        self.tasks[-1].append({"role": "assistant", "content": content, "tool_calls": tool_calls})
+
+    def add_tool_result(self, tool_call_id, function_name, result):
+        """
+        Record the result of a tool call
+
+        Args:
+            tool_call_id (str): ID of the call being answered
+            function_name (str): Action that produced the result
+            result: The raw action result
+
+        Returns:
+            str: The message text (the encoded result)
+        """
+        content = self.encoder.encode(function_name, result)
+        self.tasks[-1].append({
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": content,
+            "function_name": function_name,
+            "result": result,
+        })
+        return content
+
+    def add_message(self, role, content):
+        """Record any other message in the current task"""
+        self.tasks[-1].append({"role": role, "content": content})
+
+    def _render(self, stage):
+        compact_results, collapse_finished = stage >= 1, stage >= 2
+        drop_finished = max(0, stage - 2)
+        messages = [{"role": "system", "content": self.system_prompt}]
+        finished, current = self.tasks[:-1], self.tasks[-1:] or [[]]
+
+        for task in finished[drop_finished:]:
+            if collapse_finished:
+                # Keep only the question and the last reply (a tool call or
+                # tool result can't stand on its own without its pair)
+                replies = [entry for entry in task[1:]
+                           if entry["role"] == "assistant" and not entry.get("tool_calls")]
+                task = [task[0]] + replies[-1:]
+            messages.extend(self._render_task(task, len(task) if compact_results else 0))
+        messages.extend(self._render_task(current[0], self._compact_through if compact_results else 0))
+        return messages
+
+    def _render_task(self, task, compact_before):
+        rendered = []
+        for index, entry in enumerate(task):
+            content = entry["content"]
+            if "result" in entry and index < compact_before:
+                summary = self.encoder.summarize(entry["function_name"], entry["result"])
+                summary = summary if entry["role"] == "tool" else f"Action_Response (summary): {summary}"
+                # The encoded result can already be shorter than the summary
+                content = min(content, summary, key=len)
+            message = {"role": entry["role"], "content": content}
+            if "tool_calls" in entry:
+                message["tool_calls"] = entry["tool_calls"]
+            if "tool_call_id" in entry:
+                message["tool_call_id"] = entry["tool_call_id"]
+            rendered.append(message)
+        return rendered
+
+    def build(self):
+        """
+        Build the message list for the next model call
+
+        Returns:
+            list: Chat messages within the token budget where possible
+        """
+        messages = self._render(self._stage)
+        tokens = self._count(messages)
+
+        # Over budget: compact the current task up to its recent turns, then
+        # move to the next stage (1: compact results, 2: collapse finished
+        # tasks, 3+: drop finished tasks), until the prompt fits
+        last_stage = 2 + max(0, len(self.tasks) - 1)
+        while self.token_budget is not None and tokens > self.token_budget:
+            cutoff = max(0, len(self.tasks[-1]) - self.keep_recent) if self.tasks else 0
+            if self._stage >= 1 and self._compact_through < cutoff:
+                self._compact_through = cutoff
+            elif self._stage < last_stage:
+                self._stage += 1
+            else:
+                break
+            messages = self._render(self._stage)
+            tokens = self._count(messages)
+
+        self.last_prefix_tokens = self._shared_prefix_tokens(messages)
+        self._last_messages = messages
+        self.last_token_count = tokens
+        self.token_log.append(tokens)
+        self.usage.append({"prompt_tokens": tokens, "prefix_tokens": self.last_prefix_tokens,
+                           "completion_tokens": None})
+        return messages
+
+    def _count(self, messages):
+        return TOKENS_PER_REPLY + self.tool_tokens + sum(message_tokens(m, self.model) for m in messages)
+
+    def _shared_prefix_tokens(self, messages):
+        """Tokens at the start of messages that the previous prompt also began with"""
+        if self._last_messages is None:
+            return 0
+        tokens = self.tool_tokens
+        for previous, message in zip(self._last_messages, messages):
+            if previous != message:
+                break
+            tokens += message_tokens(message, self.model)
+        return tokens
+
+    def record_completion(self, content, tool_calls=None):
+        """
+        Count the tokens of the reply to the last built prompt
+
+        Args:
+            content (str): Reply text
+            tool_calls (list): Tool calls in the reply
+
+        Returns:
+            dict: The call's usage entry
+        """
+        entry = self.usage[-1]
+        entry["completion_tokens"] = count_tokens(content, self.model) + sum(
+            count_tool_call_tokens(call, self.model) for call in tool_calls or []
+        )
+        return entry
+
+    def usage_totals(self):
+        """
+        Token totals over every call so far
+
+        Returns:
+            dict: calls, prompt_tokens, prefix_tokens and completion_tokens
+        """
+        return {
+            "calls": len(self.usage),
+            "prompt_tokens": sum(entry["prompt_tokens"] for entry in self.usage),
+            "prefix_tokens": sum(entry["prefix_tokens"] for entry in self.usage),
+            "completion_tokens": sum(entry["completion_tokens"] or 0 for entry in self.usage),
+        }
@@ -0,0 +1,534 @@
+# http_service.py
+"""
+HTTP service for workflow sessions, with server-sent-event streaming
+
+Endpoints:
+    POST   /sessions                 create a session -> {"session_id": ...}
+    GET    /sessions/<id>            session summary (tasks, token usage)
+    DELETE /sessions/<id>            end a session
+    POST   /sessions/<id>/tasks      run a task: {"task": "..."}
+    GET    /health                   load and counters
+
+A task request answers with JSON once the task is done, or, when the client
+sends "Accept: text/event-stream" (or ?stream=1), streams thought, action,
+action_response and answer events as they happen, then a done event.
+
+All sessions share one AsyncWorkflowEngine, so one pooled model client and
+one fair limit on model requests in flight. Sessions live in an in-memory
+LRU that drops sessions idle for too long. When too many tasks are running
+the service answers 429 with Retry-After instead of queueing without bound.
+
+Usage:
+    python http_service.py [--port 8080] [--offline --latency 0.2]
+    curl -s -X POST localhost:8080/sessions
+    curl -N -H "Accept: text/event-stream" -d '{"task": "Analyze email_campaign_q1"}' localhost:8080/sessions/<id>/tasks
+"""
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from action_cache import get_action_cache
+from async_engine import AsyncWorkflowEngine
+from duplicate_index import current_duplicate_index
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+
+_SESSION_PATH = re.compile(r"^/sessions/([\w-]+)$")
+_TASK_PATH = re.compile(r"^/sessions/([\w-]+)/tasks$")
+
+
+class HTTPError(Exception):
+    """
+    An error response
+
+    Args:
+        status (HTTPStatus): Response status
+        message (str): Error text for the JSON body
+        headers (dict): Extra response headers (e.g. Retry-After)
+    """
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class _PooledSession:
+    __slots__ = ("session", "last_used", "busy", "tasks")
+
+    def __init__(self, session, now):
+        self.session = session
+        self.last_used = now
+        self.busy = False
+        self.tasks = 0
+
+
+class SessionPool:
+    """
+    In-memory LRU of sessions with idle eviction
+
+    Args:
+        engine (AsyncWorkflowEngine): Engine that creates the sessions
+        max_sessions (int): Sessions kept at once; creating one more drops
+            the least recently used idle session
+        idle_timeout (float): Seconds without use before a session is dropped
+        clock (callable): Time source (seconds)
+    """
+
+    def __init__(self, engine, max_sessions=1000, idle_timeout=900, clock=time.monotonic):
+        self.engine = engine
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._entries = OrderedDict()  # session_id -> _PooledSession, least recently used first
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def create(self, **options):
+        """
+        Create a session
+
+        Args:
+            **options: Passed to engine.create_session (token_budget, few_shot)
+
+        Returns:
+            _PooledSession: The new entry
+
+        Raises:
+            HTTPError: 503 if the pool is full of busy sessions
+        """
+        self.evict_idle()
+        if len(self._entries) >= self.max_sessions:
+            victim = next((session_id for session_id, entry in self._entries.items() if not entry.busy), None)
+            if victim is None:
+                raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many active sessions",
+                                {"Retry-After": "1"})
+            del self._entries[victim]
+            self.evicted += 1
+        session = self.engine.create_session(**options)
+        entry = _PooledSession(session, self.clock())
+        self._entries[session.session_id] = entry
+        return entry
+
+    def get(self, session_id):
+        """Look up a session and mark it as recently used (None if unknown)"""
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            entry.last_used = self.clock()
+            self._entries.move_to_end(session_id)
+        return entry
+
+    def remove(self, session_id):
+        """Drop a session; returns whether it existed"""
+        return self._entries.pop(session_id, None) is not None
+
+    def evict_idle(self):
+        """
+        Drop sessions idle for longer than idle_timeout
+
+        Returns:
+            int: Number of sessions dropped
+        """
+        deadline = self.clock() - self.idle_timeout
+        expired = []
+        # Least recently used first, so stop at the first recent one
+        for session_id, entry in self._entries.items():
+            if entry.last_used > deadline:
+                break
+            if not entry.busy:
+                expired.append(session_id)
+        for session_id in expired:
+            del self._entries[session_id]
+        self.evicted += len(expired)
+        return len(expired)
+
+
+def _split_reply(content):
+    """(thought, answer) parts of a ReAct reply; answer is None without "Answer:" """
+    text, answer = content, None
+    if "Answer:" in text:
+        text, answer = text.split("Answer:", 1)
+        answer = answer.strip()
+    text = text.split("Action:", 1)[0].strip()
+    if text.startswith("Thought:"):
+        text = text[len("Thought:"):].strip()
+    return text, answer
+
+
+class _EventMapper:
+    """Turns session events into client events (thought, action, action_response, answer, error)"""
+
+    def __init__(self):
+        self._reply = None
+
+    def feed(self, event):
+        kind = event["type"]
+        if kind == "response":
+            self._reply = event["content"]
+            return []
+        if kind == "action_call":
+            thought, _ = _split_reply(self._reply or "")
+            self._reply = None
+            events = [("thought", {"content": thought})] if thought else []
+            return events + [("action", {"function_name": event["name"], "function_parms": event["parms"]})]
+        if kind == "action":
+            return [("action_response", {"function_name": event["name"], "result": event["result"]})]
+        if kind == "error":
+            self._reply = None
+            return [("error", {"message": event["content"]})]
+        return []
+
+    def finish(self):
+        """Events for the final reply"""
+        if self._reply is None:
+            return []
+        thought, answer = _split_reply(self._reply)
+        if answer is None:
+            # A final reply without the Answer: label is the answer itself
+            return [("answer", {"content": self._reply.strip()})]
+        events = [("thought", {"content": thought})] if thought else []
+        return events + [("answer", {"content": answer})]
+
+
+class AgentService:
+    """
+    Serves workflow sessions over HTTP
+
+    Args:
+        engine (AsyncWorkflowEngine): Shared engine (default: one using the
+            shared model backend)
+        max_sessions (int): Sessions kept in memory
+        idle_timeout (float): Seconds before an unused session is dropped
+        max_active_tasks (int): Tasks running at once; more are answered
+            with 429
+        clock (callable): Time source for idle tracking
+    """
+
+    def __init__(self, engine=None, max_sessions=1000, idle_timeout=900, max_active_tasks=64,
+                 clock=time.monotonic):
+        self.engine = engine or AsyncWorkflowEngine()
+        self.sessions = SessionPool(self.engine, max_sessions, idle_timeout, clock)
+        self.max_active_tasks = max_active_tasks
+        self.active_tasks = 0
+        self.counts = {"requests": 0, "tasks": 0, "rejected": 0, "failed": 0}
+        self._server = None
+        self._sweeper = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """
+        Start listening (port 0 picks a free port)
+
+        Returns:
+            tuple: (host, port) the server is bound to
+        """
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._sweeper = asyncio.ensure_future(self._sweep())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self, host="127.0.0.1", port=8080):
+        host, port = await self.start(host, port)
+        print(f"Serving workflow sessions on http://{host}:{port}", flush=True)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _sweep(self):
+        interval = max(1.0, self.sessions.idle_timeout / 4)
+        while True:
+            await asyncio.sleep(interval)
+            self.sessions.evict_idle()
+
+    def health(self):
+        cache = get_action_cache()
+        duplicates = current_duplicate_index()
+        return {
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "evicted_sessions": self.sessions.evicted,
+            "active_tasks": self.active_tasks,
+            "max_active_tasks": self.max_active_tasks,
+            "llm_in_flight": self.engine.limiter.in_use,
+            "llm_queue_depth": self.engine.limiter.queue_depth,
+            **self.counts,
+            "llm_client": self.engine.backend.stats() if hasattr(self.engine.backend, "stats") else None,
+            "routes": self.engine.router.stats() if self.engine.router is not None else None,
+            "action_cache": cache.stats() if cache is not None else None,
+            "duplicates": duplicates.stats() if duplicates is not None else None,
+        }
+
+    # --- HTTP plumbing ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body, keep_alive = request
+                self.counts["requests"] += 1
+                try:
+                    keep_alive = await self._route(method, path, query, headers, body, writer, keep_alive)
+                except HTTPError as e:
+                    if e.status == HTTPStatus.TOO_MANY_REQUESTS or e.status == HTTPStatus.SERVICE_UNAVAILABLE:
+                        self.counts["rejected"] += 1
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Parse one HTTP/1.1 request; None when the client closed the connection"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            return None
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        url = urlsplit(target)
+        return method.upper(), url.path.rstrip("/") or "/", parse_qs(url.query), headers, body, keep_alive
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status, payload, keep_alive, headers=None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        writer.write(self._head(status, {
+            "Content-Type": "application/json",
+            "Content-Length": len(body),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(headers or {}),
+        }) + body)
+        await writer.drain()
+
+    @staticmethod
+    def _json_body(body):
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return payload
+
+    async def _route(self, method, path, query, headers, body, writer, keep_alive):
+        """Handle one request; returns whether the connection stays open"""
+        if path == "/health" and method == "GET":
+            await self._send_json(writer, HTTPStatus.OK, self.health(), keep_alive)
+            return keep_alive
+
+        if path == "/sessions" and method == "POST":
+            options = self._json_body(body)
+            token_budget = options.get("token_budget")
+            if token_budget is not None and not isinstance(token_budget, int):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, '"token_budget" must be an integer')
+            try:
+                entry = self.sessions.create(token_budget=token_budget, few_shot=options.get("few_shot", "full"))
+            except ValueError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+            await self._send_json(writer, HTTPStatus.CREATED, {"session_id": entry.session.session_id}, keep_alive)
+            return keep_alive
+
+        match = _SESSION_PATH.match(path)
+        if match and method in ("GET", "DELETE"):
+            entry = self._session(match.group(1))
+            if method == "DELETE":
+                self.sessions.remove(match.group(1))
+                await self._send_json(writer, HTTPStatus.OK, {"deleted": match.group(1)}, keep_alive)
+            else:
+                await self._send_json(writer, HTTPStatus.OK, {
+                    "session_id": match.group(1),
+                    "tasks": entry.tasks,
+                    "busy": entry.busy,
+                    "usage": entry.session.history.usage_totals(),
+                }, keep_alive)
+            return keep_alive
+
+        match = _TASK_PATH.match(path)
+        if match and method == "POST":
+            entry = self._session(match.group(1))
+            task = self._json_body(body).get("task")
+            if not isinstance(task, str) or not task.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Body needs a non-empty "task" string')
+            self._admit(entry)
+            stream = "text/event-stream" in headers.get("accept", "") or query.get("stream") == ["1"]
+            if stream:
+                await self._stream_task(entry, task, writer)
+                return False
+            await self._json_task(entry, task, writer, keep_alive)
+            return keep_alive
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    def _session(self, session_id):
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown session '{session_id}'")
+        return entry
+
+    def _admit(self, entry):
+        """Backpressure: refuse work beyond the task limit instead of queueing it"""
+        if entry.busy:
+            raise HTTPError(HTTPStatus.CONFLICT, "Session is already running a task")
+        if self.active_tasks >= self.max_active_tasks:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Too many tasks running", {"Retry-After": "1"})
+        # Claimed here, before any await, so concurrent requests see it
+        entry.busy = True
+        self.active_tasks += 1
+
+    async def _run_task(self, entry, task, on_event):
+        try:
+            return await entry.session.run_task(task, on_event=on_event)
+        finally:
+            entry.busy = False
+            entry.tasks += 1
+            entry.last_used = self.sessions.clock()
+            self.active_tasks -= 1
+            self.counts["tasks"] += 1
+
+    async def _json_task(self, entry, task, writer, keep_alive):
+        mapper = _EventMapper()
+        events = []
+        try:
+            answer = await self._run_task(entry, task, lambda event: events.extend(mapper.feed(event)))
+        except Exception as e:
+            self.counts["failed"] += 1
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Task failed: {type(e).__name__}: {e}")
+        events.extend(mapper.finish())
+        await self._send_json(writer, HTTPStatus.OK, {
+            "answer": _split_reply(answer)[1] or answer,
+            "events": [{"event": name, **data} for name, data in events],
+            "usage": entry.session.history.usage_totals(),
+        }, keep_alive)
+
+    async def _stream_task(self, entry, task, writer):
+        writer.write(self._head(HTTPStatus.OK, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Connection": "close",
+        }))
+        queue = asyncio.Queue()
+        runner = asyncio.ensure_future(self._run_task(entry, task, queue.put_nowait))
+        runner.add_done_callback(lambda _: queue.put_nowait(None))
+
+        mapper = _EventMapper()
+        event_ids = iter(range(1, 1 << 62))
+        connected = True
+
+        async def send(events):
+            nonlocal connected
+            if not connected:
+                return
+            try:
+                for name, data in events:
+                    writer.write(f"id: {next(event_ids)}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+                                 .encode("utf-8"))
+                # Waits while the client is slow to read
+                await writer.drain()
+            except ConnectionError:
+                # The client left; the task still finishes so the session stays consistent
+                connected = False
+
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            await send(mapper.feed(event))
+
+        if runner.exception() is not None:
+            self.counts["failed"] += 1
+            error = runner.exception()
+            await send([("error", {"message": f"Task failed: {type(error).__name__}: {error}"})])
+        else:
+            await send(mapper.finish())
+        await send([("done", {"usage": entry.session.history.usage_totals()})])
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP service for workflow sessions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--idle-timeout", type=float, default=900, help="Seconds before an unused session is dropped")
+    parser.add_argument("--max-active-tasks", type=int, default=64, help="Running tasks before answering 429")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Model requests in flight")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the scripted in-process model instead of an API, and keep scheduled posts in "
+                             "memory instead of the schedule store and duplicate index")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per call (--offline)")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="Simulated generation speed (--offline)")
+    parser.add_argument("--route", action="store_true",
+                        help="Pick a model per step (see model_router.py; models from LLM_*_MODEL settings)")
+    args = parser.parse_args()
+
+    backend = None
+    if args.offline:
+        from duplicate_index import DuplicateIndex, set_duplicate_index
+        from llm_backend import ScriptedBackend
+        from schedule_store import ScheduleStore, set_schedule_store
+
+        backend = ScriptedBackend(latency=args.latency, tokens_per_second=args.tokens_per_second)
+        # A stand-in run must not queue real posts for the dispatcher
+        set_schedule_store(ScheduleStore(":memory:"))
+        set_duplicate_index(DuplicateIndex(":memory:"))
+    router = None
+    if args.route:
+        from model_router import ModelRouter
+        router = ModelRouter.from_settings()
+    engine = AsyncWorkflowEngine(max_concurrency=args.max_concurrency, backend=backend, router=router)
+    service = AgentService(engine, max_sessions=args.max_sessions, idle_timeout=args.idle_timeout,
+                           max_active_tasks=args.max_active_tasks)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
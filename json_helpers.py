@@ -2,38 +2,221 @@
 import re
 import json
 
+from tracing import span
+
+# Characters that change parser state inside a JSON object / inside a string
+_STRUCTURAL = re.compile(r'[{}"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# A JSON object opens with '{' followed by a key or '}' (prose braces do not)
+_OBJECT_OPEN = re.compile(r'\{\s*')
+
+
+def is_action(obj):
+    """
+    Check whether a parsed JSON object is an agent action
+
+    Args:
+        obj: Parsed JSON value
+
+    Returns:
+        bool: True if obj has both "function_name" and "function_parms"
+    """
+    return isinstance(obj, dict) and "function_name" in obj and "function_parms" in obj
+
+
+def extract_actions(text):
+    """
+    Extract the agent actions from a model reply
+
+    Other JSON in the reply (an example, a data snippet) is ignored.
+
+    Args:
+        text (str): Model reply
+
+    Returns:
+        list: Action objects in order of appearance (empty if there are none)
+    """
+    return [obj for obj in extract_json(text) or [] if is_action(obj)]
+
+
+class JSONStreamParser:
+    """
+    Single-pass, incremental extractor for JSON objects embedded in text
+
+    Text can be fed in chunks as it arrives (e.g. from a streamed completion).
+    The parser tracks brace depth and string state, so braces inside string
+    values are ignored, and every character is scanned once. Only top-level
+    objects are handed to json.loads; if a top-level candidate is not valid
+    JSON (e.g. "{...}" in prose), its nested objects are tried instead.
+
+    Args:
+        actions_only (bool): Only emit objects that look like agent actions
+    """
+
+    def __init__(self, actions_only=False):
+        self.actions_only = actions_only
+        self.objects = []
+        self._pieces = []      # Chunks of the current top-level candidate
+        self._offset = 0       # Length of the current candidate so far
+        self._stack = []       # Open objects: [start_offset, children]
+        self._in_string = False
+        self._escape = False
+        self._tail_start = 0   # Where the unfinished candidate starts in a chunk
+        self._carry = ''       # '{' + whitespace cut off at the end of a chunk
+
+    def feed(self, chunk):
+        """
+        Feed the next chunk of text
+
+        Args:
+            chunk (str): Next piece of the text
+
+        Returns:
+            list: JSON objects completed by this chunk (possibly empty)
+        """
+        found = []
+        if self._carry:
+            chunk = self._carry + chunk
+            self._carry = ''
+        pos = 0
+        end = len(chunk)
+
+        while pos < end:
+            if not self._stack:
+                # Outside any object: skip straight to the next opening brace
+                match = _OBJECT_OPEN.search(chunk, pos)
+                if match is None:
+                    break
+                start = match.start()
+                if match.end() == end:
+                    # Can't tell yet whether this brace opens an object
+                    self._carry = chunk[start:]
+                    break
+                if chunk[match.end()] not in '"}':
+                    # A brace in prose, not the start of a JSON object
+                    pos = start + 1
+                    continue
+                self._pieces = []
+                self._offset = 0
+                self._stack.append([0, []])
+                pos = self._scan(chunk, start + 1, start, found)
+            else:
+                pos = self._scan(chunk, pos, pos, found)
+
+        if self._stack:
+            # Keep the unfinished candidate for the next chunk
+            tail_start = self._tail_start
+            self._pieces.append(chunk[tail_start:])
+            self._offset += end - tail_start
+
+        self.objects.extend(found)
+        return found
+
+    def _scan(self, chunk, pos, chunk_base, found):
+        """Scan chunk from pos while inside an object; returns the resume position"""
+        end = len(chunk)
+        self._tail_start = chunk_base
+
+        while pos < end:
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+
+            if self._in_string:
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if match is None:
+                    return end
+                if match.group() == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                return end
+            char = match.group()
+            pos = match.end()
+            # Offset of this character within the current top-level candidate
+            offset = self._offset + (match.start() - chunk_base)
+
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._stack.append([offset, []])
+            else:
+                start, children = self._stack.pop()
+                node = (start, offset + 1, children)
+                if self._stack:
+                    self._stack[-1][1].append(node)
+                else:
+                    # Top-level object closed: decode it and reset
+                    self._pieces.append(chunk[chunk_base:pos])
+                    self._emit(''.join(self._pieces), node, found)
+                    self._pieces = []
+                    self._offset = 0
+                    return pos
+
+        return end
+
+    def _emit(self, text, node, found):
+        """Decode a closed object, falling back to its nested objects"""
+        start, end, children = node
+        try:
+            obj = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            for child in children:
+                self._emit(text, child, found)
+            return
+        if not self.actions_only or is_action(obj):
+            found.append(obj)
+
+    def close(self):
+        """
+        Signal end of input and return every object found
+
+        An unterminated object at the end of the text is discarded.
+
+        Returns:
+            list: All JSON objects extracted so far
+        """
+        self._pieces = []
+        self._offset = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._carry = ''
+        return self.objects
+
+
 def extract_json(text):
     """
     Extract JSON object from text
-    
+
     Args:
         text (str): Text containing JSON
-        
+
     Returns:
         list: List of extracted JSON objects, or None if none found
     """
-    pattern = r'\{.*?\}'
-    matches = re.finditer(pattern, text, re.DOTALL)
-    json_objects = []
-
-    for match in matches:
-        json_str = extend_search(text, match.span())
-        try:
-            json_obj = json.loads(json_str)
-            json_objects.append(json_obj)
-        except json.JSONDecodeError:
-            continue
+    with span("extract_json", chars=len(text)) as parse:
+        parser = JSONStreamParser()
+        parser.feed(text)
+        json_objects = parser.close()
+        parse.set(objects=len(json_objects))
 
     return json_objects if json_objects else None
 
 def extend_search(text, span):
     """
     Handle nested JSON structures
-    
+
     Args:
         text (str): Full text
         span (tuple): Start and end position of the match
-        
+
     Returns:
         str: Extended JSON string
     """
@@ -46,4 +229,4 @@ def extend_search(text, span):
             nest_count -= 1
             if nest_count == 0:
                 return text[start:i+1]
-    return text[start:end]
\ No newline at end of file
+    return text[start:end]
@@ -0,0 +1,289 @@
+# llm_backend.py
+import time
+from collections import namedtuple
+
+from config import get_setting
+from token_counter import count_message_tokens, count_tokens, count_tool_call_tokens, count_tool_tokens
+
+# Model used when no other is given (and the "action" route of model_router)
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Result of a non-streaming model call. tool_calls is a list of tool calls in
+# the chat API format ({"id", "type", "function": {"name", "arguments"}}), or
+# None when the model replied with text only.
+Completion = namedtuple("Completion", ["text", "model", "prompt_tokens", "completion_tokens", "tool_calls"],
+                        defaults=(None,))
+
+
+class LLMBackend:
+    """
+    Interface behind generate_response
+
+    Subclasses implement complete(); stream() and acomplete() fall back to it.
+    Backends that set supports_tools also implement complete_with_tools().
+    """
+
+    supports_tools = False
+
+    def complete(self, messages, model):
+        """
+        Generate a full reply
+
+        Args:
+            messages (list): Chat messages
+            model (str): Model name
+
+        Returns:
+            Completion: Reply text and token usage
+        """
+        raise NotImplementedError
+
+    def complete_with_tools(self, messages, model, tools):
+        """
+        Generate a reply that may call tools (native function calling)
+
+        Args:
+            messages (list): Chat messages (tool results as "tool" messages)
+            model (str): Model name
+            tools (list): Tool schemas (see tool_schemas.tool_schemas)
+
+        Returns:
+            Completion: Reply text (may be None) and tool_calls
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support tool calls")
+
+    def stream(self, messages, model):
+        """
+        Generate a reply as a stream of text deltas
+
+        Closing the generator cancels the rest of the generation.
+
+        Yields:
+            str: Text deltas
+        """
+        yield self.complete(messages, model).text
+
+    async def acomplete(self, messages, model):
+        """Async version of complete()"""
+        import asyncio
+
+        return await asyncio.to_thread(self.complete, messages, model)
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    OpenAI (or any OpenAI-compatible server) backend
+
+    Settings and clients are loaded on first use, so importing costs nothing
+    and no API key is needed until a call is made.
+
+    Args:
+        api_key (str): API key (defaults to the OPENAI_API_KEY setting)
+        base_url (str): Server URL, e.g. the local stand-in (defaults to the
+            LLM_BASE_URL setting, then the OpenAI API)
+        max_retries (int): Retries made by the openai client itself (default:
+            the client's own; 0 when ResilientBackend retries instead)
+        timeout (float): Seconds per request (default: the client's own)
+    """
+
+    supports_tools = True
+
+    def __init__(self, api_key=None, base_url=None, max_retries=None, timeout=None):
+        self._api_key = api_key
+        self._base_url = base_url
+        self._options = {
+            name: value for name, value in (("max_retries", max_retries), ("timeout", timeout)) if value is not None
+        }
+        self._client = None
+        self._async_client = None
+
+    @property
+    def api_key(self):
+        return self._api_key or get_setting("OPENAI_API_KEY")
+
+    @property
+    def base_url(self):
+        return self._base_url or get_setting("LLM_BASE_URL")
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, **self._options)
+        return self._client
+
+    @property
+    def async_client(self):
+        # Shared by every async session so HTTP connections are pooled
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, **self._options)
+        return self._async_client
+
+    @staticmethod
+    def _to_completion(response, model):
+        usage = response.usage
+        message = response.choices[0].message
+        tool_calls = None
+        if message.tool_calls:
+            tool_calls = [{
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            } for call in message.tool_calls]
+        return Completion(
+            text=message.content,
+            model=response.model or model,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            tool_calls=tool_calls,
+        )
+
+    def complete(self, messages, model):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+        return self._to_completion(response, model)
+
+    def complete_with_tools(self, messages, model, tools):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=tools
+        )
+        return self._to_completion(response, model)
+
+    def stream(self, messages, model):
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Cancel the rest of the generation
+            stream.response.close()
+
+    async def acomplete(self, messages, model):
+        response = await self.async_client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+        return self._to_completion(response, model)
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    In-process fake model for offline runs and benchmarks
+
+    Args:
+        reply (callable): messages -> reply text (defaults to the scripted
+            ReAct workflow of the stand-in server)
+        latency (float): Seconds before the first token
+        tokens_per_second (float): Output speed, or None for instant replies
+        tool_reply (callable): messages -> assistant message with tool_calls
+            for complete_with_tools (defaults to the same scripted workflow
+            as native tool calls)
+    """
+
+    supports_tools = True
+
+    def __init__(self, reply=None, latency=0.0, tokens_per_second=None, tool_reply=None):
+        if reply is None:
+            from stub_llm_server import scripted_react_reply as reply
+        if tool_reply is None:
+            from stub_llm_server import scripted_tool_reply as tool_reply
+        self.reply = reply
+        self.tool_reply = tool_reply
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+
+    def _completion(self, messages, model, text):
+        return Completion(text, model, count_message_tokens(messages, model), count_tokens(text, model))
+
+    def _generation_time(self, text, completion_tokens=None):
+        if not self.tokens_per_second:
+            return self.latency
+        if completion_tokens is None:
+            completion_tokens = count_tokens(text)
+        return self.latency + completion_tokens / self.tokens_per_second
+
+    def complete(self, messages, model):
+        text = self.reply(messages)
+        delay = self._generation_time(text)
+        if delay:
+            time.sleep(delay)
+        return self._completion(messages, model, text)
+
+    def complete_with_tools(self, messages, model, tools):
+        message = self.tool_reply(messages)
+        text = message.get("content")
+        tool_calls = message.get("tool_calls")
+        completion_tokens = count_tokens(text, model) + sum(
+            count_tool_call_tokens(call, model) for call in tool_calls or []
+        )
+        delay = self._generation_time(text, completion_tokens)
+        if delay:
+            time.sleep(delay)
+        prompt_tokens = count_message_tokens(messages, model) + count_tool_tokens(tools, model)
+        return Completion(text, model, prompt_tokens, completion_tokens, tool_calls)
+
+    def stream(self, messages, model):
+        from stub_llm_server import split_tokens
+
+        text = self.reply(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for piece in split_tokens(text):
+            if delay:
+                time.sleep(delay)
+            yield piece
+
+    async def acomplete(self, messages, model):
+        import asyncio
+
+        text = self.reply(messages)
+        delay = self._generation_time(text)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._completion(messages, model, text)
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Get the active backend
+
+    Unless set_backend was called, this is an OpenAIBackend behind
+    llm_client.ResilientBackend (rate budgets, retries, coalescing).
+    """
+    global _backend
+    if _backend is None:
+        from llm_client import default_backend
+
+        _backend = default_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the backend used by generate_response
+
+    Args:
+        backend (LLMBackend): New backend
+
+    Returns:
+        LLMBackend: The previous backend
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,466 @@
+# llm_client.py
+"""
+Rate limiting, retries and request coalescing for model calls
+
+ResilientBackend wraps another backend (by default the OpenAI one):
+
+- Each call reserves its estimated tokens and one request from shared
+  per-minute budgets and waits while they are spent, so bursts from many
+  sessions are spread out instead of being answered with 429.
+- A 429 pauses every caller for the server's Retry-After and cuts the
+  budgets by a quarter (once per pause, however many callers hit it); they
+  recover a little with each successful call.
+- Rate limits, timeouts, connection errors and 5xx responses are retried
+  with jittered exponential backoff. When the retries run out (or the API
+  rejects the request outright) LLMUnavailableError is raised, so an error
+  is never passed on as if it were the model's reply.
+- Identical requests in flight at the same time share one upstream call.
+
+stats() reports calls, retries, coalesced requests, how many callers are
+waiting for budget (queue depth) and how long they waited.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from config import get_setting
+from llm_backend import LLMBackend, OpenAIBackend
+from response_cache import cache_key
+from token_counter import count_message_tokens, count_tokens, count_tool_tokens
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# openai exceptions without a status code that are worth retrying
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+# Budget that can be spent in one burst, in seconds' worth of the rate (a
+# server counting requests over a sliding minute would reject a full
+# minute's budget spent at once followed by the steady rate)
+BURST_SECONDS = 6
+
+# Share of the budgets kept after a 429, and the lowest share after many
+BUDGET_BACKOFF = 0.75
+MIN_BUDGET_SCALE = 0.1
+
+# Share of the configured budgets won back per successful call
+BUDGET_RECOVERY = 0.05
+
+
+class LLMUnavailableError(RuntimeError):
+    """The model could not be reached (retries ran out or the request was rejected)"""
+
+
+def is_retryable(error):
+    """Whether a failed model call may succeed if tried again"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after(error):
+    """Seconds from the Retry-After header of a failed call, or None"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateBudget:
+    """
+    Token bucket refilled continuously at per_minute, holding BURST_SECONDS
+    worth of units
+
+    reserve() always succeeds and returns how long the caller has to wait
+    before using what it took. The bucket can go into debt, which later
+    callers wait out in turn, so waiters are served first come, first served.
+    Not thread-safe; ResilientBackend holds its lock around every call.
+
+    Args:
+        per_minute (float): Units per minute (tokens or requests)
+        clock (callable): Returns the current time in seconds
+    """
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.per_minute = per_minute
+        self.scale = 1.0  # share of per_minute in effect (lowered after 429s)
+        self.clock = clock
+        self._available = self.burst
+        self._updated = clock()
+
+    @property
+    def rate(self):
+        """Units per second in effect"""
+        return self.per_minute * self.scale / 60
+
+    @property
+    def burst(self):
+        return self.rate * BURST_SECONDS
+
+    def _refill(self):
+        now = self.clock()
+        self._available = min(self.burst, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        """Take amount units; returns seconds until they are covered"""
+        self._refill()
+        self._available -= amount
+        return max(0.0, -self._available / self.rate)
+
+    def adjust(self, amount):
+        """Give back (positive) or take (negative) units after the fact"""
+        self._refill()
+        self._available = min(self.burst, self._available + amount)
+
+
+class _SharedCall:
+    """An upstream call that identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncSharedCall:
+    """An upstream call, run as its own task, that identical async requests wait on"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class ResilientBackend(LLMBackend):
+    """
+    Backend wrapper with shared rate budgets, retries and request coalescing
+
+    Args:
+        backend (LLMBackend): Backend that makes the calls (give it no
+            retries of its own, e.g. OpenAIBackend(max_retries=0))
+        tokens_per_minute (int): Token budget (prompt + completion) shared
+            by every caller, or None for no limit
+        requests_per_minute (int): Request budget, or None for no limit
+        max_retries (int): Retries per call after the first attempt
+        base_delay (float): Backoff before the first retry, in seconds; it
+            doubles with each retry and is drawn with full jitter
+        max_delay (float): Longest backoff
+        expected_completion_tokens (int): Completion tokens reserved per call
+            until the real usage is known
+        coalesce (bool): Share one upstream call between identical requests
+            in flight at the same time
+        clock (callable): Returns the current time in seconds
+        seed (int): Seed for the backoff jitter
+    """
+
+    def __init__(self, backend, tokens_per_minute=None, requests_per_minute=None, max_retries=5,
+                 base_delay=0.5, max_delay=30.0, expected_completion_tokens=256, coalesce=True,
+                 clock=time.monotonic, seed=None):
+        self.backend = backend
+        self.tokens = RateBudget(tokens_per_minute, clock) if tokens_per_minute else None
+        self.requests = RateBudget(requests_per_minute, clock) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.expected_completion_tokens = expected_completion_tokens
+        self.coalesce = coalesce
+        self.clock = clock
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._inflight = {}  # request key -> _SharedCall
+        self._async_inflight = {}  # (event loop id, request key) -> _AsyncSharedCall
+        self.counts = {"calls": 0, "upstream_calls": 0, "coalesced": 0, "retries": 0,
+                       "rate_limited": 0, "failures": 0, "throttled": 0}
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.throttle_wait_seconds = 0.0
+
+    @property
+    def supports_tools(self):
+        return self.backend.supports_tools
+
+    # --- budgets and retries ---
+
+    def _budgets(self):
+        return [budget for budget in (self.tokens, self.requests) if budget is not None]
+
+    def _estimate(self, messages, model, tools=None):
+        tokens = count_message_tokens(messages, model) + self.expected_completion_tokens
+        if tools:
+            tokens += count_tool_tokens(tools, model)
+        return tokens
+
+    def _reserve(self, estimate):
+        """Reserve budget for one attempt; returns seconds to wait (counted as queued)"""
+        with self._lock:
+            self.counts["upstream_calls"] += 1
+            wait = max(0.0, self._paused_until - self.clock())
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(estimate))
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1))
+            if wait:
+                self.counts["throttled"] += 1
+                self.throttle_wait_seconds += wait
+                self.queue_depth += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return wait
+
+    def _dequeue(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def _settle(self, estimate, used):
+        """Replace the estimated tokens reserved for a call with the tokens it used"""
+        if self.tokens is not None:
+            with self._lock:
+                self.tokens.adjust(estimate - used)
+
+    def _succeeded(self, estimate, completion):
+        if completion is not None and completion.prompt_tokens is not None:
+            self._settle(estimate, completion.prompt_tokens + (completion.completion_tokens or 0))
+        with self._lock:
+            for budget in self._budgets():
+                budget.scale = min(1.0, budget.scale + BUDGET_RECOVERY)
+
+    def _failed(self, error, estimate, attempt):
+        """
+        Account for a failed attempt
+
+        Returns:
+            float: Backoff before the next attempt
+
+        Raises:
+            LLMUnavailableError: The call should not be tried again
+        """
+        retryable = is_retryable(error)
+        status = getattr(error, "status_code", None)
+        with self._lock:
+            # A rejected request used no tokens
+            if self.tokens is not None:
+                self.tokens.adjust(estimate)
+            if status == 429:
+                self.counts["rate_limited"] += 1
+                now = self.clock()
+                # Callers that were already in flight when the first 429 came
+                # back do not cut the budgets again
+                if now >= self._paused_until:
+                    for budget in self._budgets():
+                        budget.scale = max(MIN_BUDGET_SCALE, budget.scale * BUDGET_BACKOFF)
+                self._paused_until = max(self._paused_until, now + (retry_after(error) or 0.0))
+            if retryable and attempt < self.max_retries:
+                self.counts["retries"] += 1
+                return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            self.counts["failures"] += 1
+        if retryable or status is not None:
+            raise LLMUnavailableError(
+                f"Model request failed after {attempt + 1} attempt(s): {type(error).__name__}: {error}"
+            ) from error
+        raise error
+
+    def _call(self, estimate, call):
+        attempt = 0
+        while True:
+            wait = self._reserve(estimate)
+            if wait:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._dequeue()
+            try:
+                completion = call()
+            except Exception as error:
+                time.sleep(self._failed(error, estimate, attempt))
+                attempt += 1
+                continue
+            self._succeeded(estimate, completion)
+            return completion
+
+    async def _acall(self, estimate, call):
+        attempt = 0
+        while True:
+            wait = self._reserve(estimate)
+            if wait:
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._dequeue()
+            try:
+                completion = await call()
+            except Exception as error:
+                await asyncio.sleep(self._failed(error, estimate, attempt))
+                attempt += 1
+                continue
+            self._succeeded(estimate, completion)
+            return completion
+
+    # --- coalescing ---
+
+    def _shared(self, key, run):
+        with self._lock:
+            self.counts["calls"] += 1
+            shared = self._inflight.get(key) if self.coalesce else None
+            if shared is not None:
+                self.counts["coalesced"] += 1
+            elif self.coalesce:
+                self._inflight[key] = owned = _SharedCall()
+        if shared is not None:
+            shared.done.wait()
+            if shared.error is not None:
+                raise shared.error
+            return shared.result
+        if not self.coalesce:
+            return run()
+
+        try:
+            owned.result = run()
+        except BaseException as error:
+            owned.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            owned.done.set()
+        return owned.result
+
+    async def _async_shared(self, key, run):
+        with self._lock:
+            self.counts["calls"] += 1
+        if not self.coalesce:
+            return await run()
+        loop_key = (id(asyncio.get_running_loop()), key)
+        shared = self._async_inflight.get(loop_key)
+        if shared is None:
+            # The call runs in its own task, so cancelling the caller that
+            # started it does not cancel it for the others
+            shared = self._async_inflight[loop_key] = _AsyncSharedCall(asyncio.ensure_future(run()))
+            shared.task.add_done_callback(lambda task: self._async_done(loop_key, shared))
+        else:
+            with self._lock:
+                self.counts["coalesced"] += 1
+
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                # Every caller gave up: stop the upstream call
+                self._async_forget(loop_key, shared)
+                shared.task.cancel()
+
+    def _async_forget(self, loop_key, shared):
+        if self._async_inflight.get(loop_key) is shared:
+            del self._async_inflight[loop_key]
+
+    def _async_done(self, loop_key, shared):
+        self._async_forget(loop_key, shared)
+        if not shared.task.cancelled():
+            shared.task.exception()  # mark as retrieved even if nobody was waiting
+
+    # --- LLMBackend ---
+
+    def complete(self, messages, model):
+        estimate = self._estimate(messages, model)
+        return self._shared(
+            cache_key(model, messages),
+            lambda: self._call(estimate, lambda: self.backend.complete(messages, model))
+        )
+
+    def complete_with_tools(self, messages, model, tools):
+        estimate = self._estimate(messages, model, tools)
+        return self._shared(
+            cache_key(model, {"messages": messages, "tools": tools}),
+            lambda: self._call(estimate, lambda: self.backend.complete_with_tools(messages, model, tools))
+        )
+
+    async def acomplete(self, messages, model):
+        estimate = self._estimate(messages, model)
+        return await self._async_shared(
+            cache_key(model, messages),
+            lambda: self._acall(estimate, lambda: self.backend.acomplete(messages, model))
+        )
+
+    def stream(self, messages, model):
+        # Streams are not shared, and are only retried before the first delta
+        with self._lock:
+            self.counts["calls"] += 1
+        prompt_tokens = count_message_tokens(messages, model)
+        estimate = prompt_tokens + self.expected_completion_tokens
+        attempt = 0
+        while True:
+            wait = self._reserve(estimate)
+            if wait:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._dequeue()
+            deltas = self.backend.stream(messages, model)
+            streamed = []
+            failed = False
+            try:
+                for delta in deltas:
+                    streamed.append(delta)
+                    yield delta
+            except Exception as error:
+                if streamed:
+                    raise
+                failed = True
+                backoff = self._failed(error, estimate, attempt)
+            finally:
+                deltas.close()
+                # Also reached when the consumer closes the stream early or it
+                # breaks after the first delta: charge what was generated
+                if not failed:
+                    self._settle(estimate, prompt_tokens + count_tokens("".join(streamed), model))
+            if failed:
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            self._succeeded(estimate, None)
+            return
+
+    def stats(self):
+        """
+        Counters and throttling metrics
+
+        Returns:
+            dict: calls, upstream_calls (attempts), coalesced, retries,
+                rate_limited, failures, throttled (attempts that waited for
+                budget), queue_depth, max_queue_depth, throttle_wait_seconds
+                and budget_scale
+        """
+        with self._lock:
+            budgets = self._budgets()
+            return {
+                **self.counts,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "budget_scale": round(min(budget.scale for budget in budgets), 3) if budgets else 1.0,
+            }
+
+
+def default_backend():
+    """
+    The OpenAI backend behind ResilientBackend, configured from settings
+
+    LLM_TOKENS_PER_MINUTE and LLM_REQUESTS_PER_MINUTE set the budgets (unset:
+    no limit), LLM_MAX_RETRIES the retries and LLM_TIMEOUT the seconds per
+    attempt.
+    """
+    tokens_per_minute = get_setting("LLM_TOKENS_PER_MINUTE")
+    requests_per_minute = get_setting("LLM_REQUESTS_PER_MINUTE")
+    return ResilientBackend(
+        OpenAIBackend(max_retries=0, timeout=float(get_setting("LLM_TIMEOUT", 60))),
+        tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None,
+        requests_per_minute=int(requests_per_minute) if requests_per_minute else None,
+        max_retries=int(get_setting("LLM_MAX_RETRIES", 5)),
+    )
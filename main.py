@@ -1,52 +1,400 @@
 # main.py
+import json
 import os
-from dotenv import load_dotenv
-from actions import analyze_campaign_data, generate_content, schedule_content
-from prompts import workflow_system_prompt
-from json_helpers import extract_json
-from openai import OpenAI  # Make sure this import is correct
-
-# Load environment variables
-load_dotenv()
-
-# Set up OpenAI client (create an instance of the client)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Available actions
-available_actions = {
-    "analyze_campaign_data": analyze_campaign_data,
-    "generate_content": generate_content,
-    "schedule_content": schedule_content
-}
-
-def generate_response(messages, model="gpt-3.5-turbo"):
-    """Generate a response from the language model"""
-    response = client.chat.completions.create(  # Use the client instance
-        model=model,
-        messages=messages
+import time
+
+from action_cache import set_action_cache
+from actions import available_actions, invoke_action
+from prompts import build_workflow_prompt, planning_system_prompt, tool_system_prompt
+from json_helpers import extract_actions, JSONStreamParser
+from planner import parse_plan, execute_plan, validate_steps, PlanError
+from history import ConversationHistory
+from result_encoder import compact_json
+from llm_backend import DEFAULT_MODEL, get_backend, set_backend, ScriptedBackend
+from llm_client import LLMUnavailableError
+from token_counter import count_message_tokens, count_tokens
+from tracing import span, set_trace_context, enable_tracing, tracing_enabled
+
+# Optional response cache (see enable_response_cache)
+response_cache = None
+
+def enable_response_cache(path=".cache/responses.sqlite", **options):
+    """
+    Cache model responses keyed by (model, messages)
+
+    Args:
+        path (str): SQLite file for the disk tier, or None for memory only
+        **options: Passed to ResponseCache (size and age limits)
+
+    Returns:
+        ResponseCache: The cache now used by generate_response
+    """
+    from response_cache import ResponseCache
+
+    global response_cache
+    response_cache = ResponseCache(path, **options)
+    return response_cache
+
+def generate_response(messages, model=DEFAULT_MODEL, bypass_cache=False):
+    """
+    Generate a response from the language model
+
+    Args:
+        messages (list): Conversation so far
+        model (str): Model name
+        bypass_cache (bool): Always call the model, even if a response cache
+            is enabled (the fresh response is still stored)
+    """
+    with span("generate_response", model=model) as call:
+        if response_cache is not None and not bypass_cache:
+            cached = response_cache.get(model, messages)
+            if cached is not None:
+                call.set(cached=True)
+                return cached
+
+        completion = get_backend().complete(messages, model)
+        call.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        content = completion.text
+
+        if response_cache is not None:
+            response_cache.set(model, messages, content)
+        return content
+
+def generate_response_stream(messages, model=DEFAULT_MODEL, on_token=None):
+    """
+    Stream a response from the language model, stopping early at an action
+
+    Tokens are read as they arrive. As soon as a complete action object has
+    been seen and the model has written PAUSE (or started inventing its own
+    Action_Response), the rest of the generation is cancelled.
+
+    Args:
+        messages (list): Conversation so far
+        model (str): Model name
+        on_token (callable): Optional callback for each text delta
+
+    Returns:
+        tuple: (response text, list of action objects or None)
+    """
+    with span("generate_response", model=model, stream=True) as call:
+        stream = get_backend().stream(messages, model)
+        parser = JSONStreamParser(actions_only=True)
+        text = ""
+        action_end = None  # Position in text where the first action completed
+        started = time.perf_counter()
+        first_token = None
+
+        try:
+            for delta in stream:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                chunk_start = len(text)
+                text += delta
+                if on_token:
+                    on_token(delta)
+
+                if parser.feed(delta) and action_end is None:
+                    action_end = chunk_start
+                if action_end is not None:
+                    tail = text[action_end:]
+                    if "PAUSE" in tail or "Action_Response" in tail:
+                        call.set(cancelled_early=True)
+                        break
+        finally:
+            # Cancel the rest of the generation
+            stream.close()
+
+        actions = parser.close()
+        call.set(completion_chars=len(text),
+                 first_token_ms=round((first_token - started) * 1000, 3) if first_token else None)
+        if tracing_enabled():
+            # Streams report no usage; count locally, as ConversationHistory.record_completion does
+            call.set(prompt_tokens=count_message_tokens(messages, model), completion_tokens=count_tokens(text, model))
+        return text, actions if actions else None
+
+def generate_tool_response(messages, tools, model=DEFAULT_MODEL):
+    """
+    Generate a response that may call tools (native tool-calling mode)
+
+    Args:
+        messages (list): Conversation so far
+        tools (list): Tool schemas (see tool_schemas.tool_schemas)
+        model (str): Model name
+
+    Returns:
+        Completion: Reply text and tool_calls
+    """
+    with span("generate_response", model=model, tools=True) as call:
+        completion = get_backend().complete_with_tools(messages, model, tools)
+        call.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens,
+                 tool_calls=len(completion.tool_calls or []))
+        return completion
+
+def print_route(step, model):
+    """Show when the router retries on a bigger model or writes the Answer on the answer model"""
+    if step != "action":
+        print(f"\n[{step.capitalize()} on {model}]")
+
+def generate_step(messages, stream=False, router=None):
+    """
+    One turn of the agent loop: the model's reply and the actions in it
+
+    Args:
+        messages (list): Conversation so far
+        stream (bool): Print the reply as it arrives and stop at PAUSE
+        router (ModelRouter): Picks the model for the turn (and retries on
+            a bigger one if no valid action can be extracted), or None to
+            use the default model
+
+    Returns:
+        tuple: (response text, list of action objects or None)
+    """
+    on_token = lambda delta: print(delta, end="", flush=True)
+    if router is None:
+        if stream:
+            return generate_response_stream(messages, on_token=on_token)
+        ai_response = generate_response(messages)
+        return ai_response, extract_actions(ai_response)
+
+    def generate(messages, model):
+        if stream:
+            return generate_response_stream(messages, model=model, on_token=on_token)[0]
+        return generate_response(messages, model=model)
+
+    ai_response, _ = router.run_step(messages, generate, available_actions, on_call=print_route)
+    return ai_response, extract_actions(ai_response)
+
+def print_call_usage(usage):
+    """Print one call's token counts (see ConversationHistory.record_completion)"""
+    print(f"[Tokens: prompt {usage['prompt_tokens']} ({usage['prefix_tokens']} same prefix as the last call), "
+          f"completion {usage['completion_tokens']}]")
+
+def print_session_usage(history):
+    """Print token totals for the session"""
+    totals = history.usage_totals()
+    if not totals["calls"]:
+        return
+    reused = totals["prefix_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0
+    print(f"[Session: {totals['calls']} calls, {totals['prompt_tokens']} prompt tokens "
+          f"({reused:.0%} reusable prefix), {totals['completion_tokens']} completion tokens]")
+
+def run_tool_call(tool_call, encoder=None):
+    """
+    Run one tool call from the model
+
+    Args:
+        tool_call (dict): Tool call in the chat API format
+        encoder (ResultEncoder): Resolves content references in the arguments
+
+    Returns:
+        tuple: (function name, result); bad calls give an {"error": ...}
+            result so the model can correct itself
+    """
+    function_name = tool_call["function"]["name"]
+    if function_name not in available_actions:
+        return function_name, {"error": f"Unknown action '{function_name}'"}
+    try:
+        function_parms = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError as e:
+        return function_name, {"error": f"Arguments are not valid JSON: {e}"}
+    if encoder is not None:
+        function_parms = encoder.resolve(function_parms)
+    return function_name, invoke_action(available_actions[function_name], function_parms)
+
+def run_tool_task(history, tools, model=DEFAULT_MODEL, max_turns=5, session_id=None, router=None):
+    """
+    Native tool-calling mode: actions are read from the response's tool_calls
+
+    If the model answers with the text protocol instead (an action JSON in
+    the reply text), that action is run as in the ReAct loop.
+
+    Args:
+        history (ConversationHistory): Conversation, with the task started
+        tools (list): Tool schemas for the available actions
+        model (str): Model name
+        max_turns (int): Most model calls for the task
+        session_id (str): Session ID for trace records
+        router (ModelRouter): Picks the model per turn instead of model
+            (see ModelRouter.run_step)
+
+    Returns:
+        str: The final reply, or None if the turn limit was reached
+    """
+    for turn in range(1, max_turns + 1):
+        set_trace_context(session_id=session_id, turn=turn)
+        print(f"\n[Thinking... Step {turn}/{max_turns}]")
+
+        messages = history.build()
+        if router is None:
+            completion = generate_tool_response(messages, tools, model=model)
+        else:
+            completion, _ = router.run_step(
+                messages, lambda messages, model: generate_tool_response(messages, tools, model=model),
+                available_actions, on_call=print_route, tools=True
+            )
+        usage = history.record_completion(completion.text, completion.tool_calls)
+
+        if completion.tool_calls:
+            if completion.text:
+                print(f"\nWorkflow Agent: {completion.text}")
+            print_call_usage(usage)
+            history.add_tool_calls(completion.text, completion.tool_calls)
+            for tool_call in completion.tool_calls:
+                print(f"\n[Executing {tool_call['function']['name']}...]")
+                function_name, result = run_tool_call(tool_call, history.encoder)
+                content = history.add_tool_result(tool_call["id"], function_name, result)
+                print(f"\n[Result: {content}]")
+            continue
+
+        ai_response = completion.text or ""
+        print(f"\nWorkflow Agent: {ai_response}")
+        print_call_usage(usage)
+        json_function = extract_actions(ai_response)
+        if json_function and json_function[0]["function_name"] in available_actions:
+            # Text protocol fallback
+            function_name = json_function[0]["function_name"]
+            print(f"\n[Executing {function_name}...]")
+            function_parms = history.encoder.resolve(json_function[0]["function_parms"])
+            result = invoke_action(available_actions[function_name], function_parms)
+            history.add_assistant(ai_response)
+            print(f"\n[Result: {history.add_action_response(function_name, result)}]")
+            continue
+
+        history.add_assistant(ai_response)
+        return ai_response
+    return None
+
+def run_planned_task(history, model=DEFAULT_MODEL, router=None):
+    """
+    Plan-then-execute mode: one LLM call to plan, one to write the Answer
+
+    The model returns a dependency graph of actions for the current user
+    task. The graph runs locally (independent steps in parallel) and the
+    model is only called again to write the final Answer.
+
+    Args:
+        history (ConversationHistory): Conversation, with the task started
+        model (str): Model name
+        router (ModelRouter): Picks the planning ("action") and Answer
+            models instead, retrying the plan on a bigger model if it cannot
+            be parsed
+
+    Returns:
+        str: The final Answer, or None if the model did not return a usable
+            plan (the caller should fall back to the ReAct loop)
+    """
+    plan_messages = [
+        {"role": "system", "content": planning_system_prompt},
+        {"role": "user", "content": history.tasks[-1][0]["content"]}
+    ]
+    if router is None:
+        plan_reply = generate_response(plan_messages, model=model)
+    else:
+        plan_reply, _, _ = router.run("action", plan_messages, generate_response, accept=parse_plan,
+                                      on_call=print_route)
+    steps = parse_plan(plan_reply)
+    if not steps:
+        return None
+
+    try:
+        validate_steps(steps)
+        print(f"\n[Plan: {len(steps)} steps]")
+        for step in steps:
+            print(f"  {step['id']}: {step.get('function_name')} {step.get('function_parms')}")
+        results = execute_plan(
+            steps,
+            available_actions,
+            on_step=lambda step_id, name, result: print(f"\n[Executed {step_id} ({name})]")
+        )
+    except PlanError as e:
+        print(f"Error: Invalid plan: {e}")
+        return None
+
+    # Ask for the final Answer with every result in one message
+    history.add_assistant(plan_reply)
+    encoded = compact_json({
+        step["id"]: history.encoder.project(step["function_name"], results[step["id"]]) for step in steps
+    })
+    history.add_action_response(
+        "plan", results,
+        content=f"Action_Response: {encoded}\n\nAll planned actions have run. Write the Answer."
     )
-    return response.choices[0].message.content
+    if router is None:
+        answer = generate_response(history.build(), model=model)
+    else:
+        answer, _, _ = router.run("answer", history.build(), generate_response, on_call=print_route)
+    history.record_completion(answer)
+    history.add_assistant(answer)
+    return answer
+
+def run_workflow_agent(stream=False, plan=False, token_budget=None, tools=False, few_shot="full", router=None):
+    """
+    Run the Marketing Workflow Agent
 
-def run_workflow_agent():
-    """Run the Marketing Workflow Agent"""
+    Args:
+        stream (bool): Stream model output and dispatch actions as soon as
+            the model writes PAUSE, instead of waiting for the full reply
+        plan (bool): Plan all actions up front and run them locally, falling
+            back to the step-by-step loop if no valid plan is returned
+        token_budget (int): Maximum prompt tokens per call; older action
+            results and finished tasks are compacted to stay under it
+        tools (bool): Send the actions as tool schemas and read the model's
+            tool calls directly instead of parsing actions out of the text
+        few_shot (str): Worked example in the system prompt: "full",
+            "compact" or "none" (fixed for the session so the prompt prefix
+            stays cacheable)
+        router (ModelRouter): Pick a model per step (action selection,
+            Answer, retry after an unusable reply) instead of using one
+            model throughout
+    """
+    session_id = os.urandom(6).hex()
     print("\n=== Marketing Workflow Agent ===")
     print("This agent can analyze campaigns, generate content, and schedule posts.")
     print("Type 'exit' to quit.\n")
+
+    tool_list = None
+    if tools:
+        if get_backend().supports_tools:
+            from tool_schemas import tool_schemas
+            tool_list = tool_schemas(available_actions)
+        else:
+            print("Note: this model backend does not support tool calls; using the text protocol.")
     
     # Initialize conversation with system prompt
-    messages = [
-        {"role": "system", "content": workflow_system_prompt}
-    ]
+    system_prompt = tool_system_prompt if tool_list else build_workflow_prompt(few_shot)
+    history = ConversationHistory(system_prompt, token_budget=token_budget, tools=tool_list)
     
     while True:
         # Get user input
         user_input = input("\nWhat marketing task can I help you with? ")
         if user_input.lower() == 'exit':
+            print_session_usage(history)
+            if router is not None and router.stats():
+                from model_router import print_stats
+                print_stats(router.stats())
             print("Goodbye!")
             break
         
-        # Add user input to messages
-        messages.append({"role": "user", "content": user_input})
+        # Add user input to the conversation
+        history.start_task(user_input)
+
+        if tool_list:
+            try:
+                run_tool_task(history, tool_list, session_id=session_id, router=router)
+            except LLMUnavailableError as e:
+                print(f"\nError: {e}")
+            continue
+
+        if plan:
+            set_trace_context(session_id=session_id, turn=0)
+            try:
+                answer = run_planned_task(history, router=router)
+            except LLMUnavailableError as e:
+                print(f"\nError: {e}")
+                continue
+            if answer is not None:
+                print(f"\nWorkflow Agent: {answer}")
+                continue
         
         # Initialize loop variables
         turn_count = 1
@@ -54,14 +402,26 @@ def run_workflow_agent():
         
         # Agent loop
         while turn_count < max_turns:
+            set_trace_context(session_id=session_id, turn=turn_count)
             print(f"\n[Thinking... Step {turn_count}/{max_turns}]")
+
+            messages = history.build()
             
-            # Get response from language model
-            ai_response = generate_response(messages)
-            print(f"\nWorkflow Agent: {ai_response}")
-            
-            # Check if we need to execute an action
-            json_function = extract_json(ai_response)
+            # Get response from language model (after retries, a model
+            # that cannot be reached ends the task rather than the session)
+            try:
+                if stream:
+                    print("\nWorkflow Agent: ", end="", flush=True)
+                    ai_response, json_function = generate_step(messages, stream=True, router=router)
+                    print()
+                else:
+                    # Also checks if we need to execute an action
+                    ai_response, json_function = generate_step(messages, router=router)
+                    print(f"\nWorkflow Agent: {ai_response}")
+            except LLMUnavailableError as e:
+                print(f"\nError: {e}")
+                break
+            print_call_usage(history.record_completion(ai_response))
             
             if json_function:
                 # We found a function call
@@ -75,22 +435,76 @@ def run_workflow_agent():
                 
                 # Execute the function
                 print(f"\n[Executing {function_name}...]")
-                action_function = available_actions[function_name]
-                result = action_function(**function_parms)
+                result = invoke_action(available_actions[function_name], history.encoder.resolve(function_parms))
                 
-                # Format the result
-                function_result_message = f"Action_Response: {result}"
+                # Add messages to conversation (the result is encoded compactly)
+                history.add_assistant(ai_response)
+                function_result_message = history.add_action_response(function_name, result)
                 print(f"\n[Result: {function_result_message}]")
                 
-                # Add messages to conversation
-                messages.append({"role": "assistant", "content": ai_response})
-                messages.append({"role": "user", "content": function_result_message})
-                
                 turn_count += 1
             else:
                 # No function call, we're done
-                messages.append({"role": "assistant", "content": ai_response})
+                history.add_assistant(ai_response)
                 break
 
+def main():
+    """Command-line entry point (the marketing-agent console script)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Marketing Workflow Agent")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream model output and start actions as soon as the model pauses")
+    parser.add_argument("--plan", action="store_true",
+                        help="Plan all actions in one call and run them locally")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Maximum prompt tokens per call (older results are compacted)")
+    parser.add_argument("--cache", nargs="?", const=".cache/responses.sqlite", default=None,
+                        metavar="PATH", help="Cache model responses in a SQLite file")
+    parser.add_argument("--tools", action="store_true",
+                        help="Use native tool calling instead of the text action protocol")
+    parser.add_argument("--few-shot", choices=["full", "compact", "none"], default="full",
+                        help="Worked example in the system prompt")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the scripted in-process model instead of an API, and keep scheduled posts in "
+                             "memory instead of the schedule store and duplicate index")
+    parser.add_argument("--trace", nargs="?", const=".data/traces.jsonl", default=None,
+                        metavar="PATH", help="Record spans to a JSONL file (see tracing.py summary)")
+    parser.add_argument("--no-action-cache", action="store_true",
+                        help="Run every action call instead of reusing results of repeat calls")
+    parser.add_argument("--route", action="store_true",
+                        help="Pick a model per step (see model_router.py; models from LLM_*_MODEL settings)")
+    parser.add_argument("--latency-budget-ms", type=float, default=None,
+                        help="With --route: highest acceptable p95 latency per call")
+    parser.add_argument("--cost-budget", type=float, default=None,
+                        help="With --route: highest estimated cost per call in USD")
+    parser.add_argument("--route-traces", default=None, metavar="PATH",
+                        help="With --route: start from the route statistics in a trace file")
+    args = parser.parse_args()
+
+    if args.offline:
+        from duplicate_index import DuplicateIndex, set_duplicate_index
+        from schedule_store import ScheduleStore, set_schedule_store
+
+        set_backend(ScriptedBackend())
+        # A stand-in run must not queue real posts for the dispatcher
+        set_schedule_store(ScheduleStore(":memory:"))
+        set_duplicate_index(DuplicateIndex(":memory:"))
+    if args.cache:
+        enable_response_cache(args.cache)
+    if args.trace:
+        enable_tracing(args.trace)
+    if args.no_action_cache:
+        set_action_cache(None)
+    router = None
+    if args.route:
+        from model_router import ModelRouter
+        router = ModelRouter.from_settings(latency_budget_ms=args.latency_budget_ms, cost_budget=args.cost_budget)
+        if args.route_traces:
+            router.load_traces(args.route_traces)
+
+    run_workflow_agent(stream=args.stream, plan=args.plan, token_budget=args.token_budget, tools=args.tools,
+                       few_shot=args.few_shot, router=router)
+
 if __name__ == "__main__":
-    run_workflow_agent()
\ No newline at end of file
+    main()
\ No newline at end of file
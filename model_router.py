@@ -0,0 +1,446 @@
+# model_router.py
+"""
+Per-step model routing
+
+Picking the first action of a task is easy for a small model; the turns
+that may write the final Answer are worth a bigger one. ModelRouter picks a
+model for each step from its type:
+
+- "action": choosing the next action (and writing the plan in plan mode)
+- "answer": writing the final Answer
+- "retry": calling again after a reply that could not be used (no valid
+  action could be extracted), one rung up the model ladder
+
+The step of a ReAct turn is decided before the call, so no turn is
+generated twice: a turn that follows an action result (of any action, or
+only of those in answer_after) is an "answer" step, since it may be the
+last one, and the first turn of a task is an "action" step. The answer model
+can still run another action.
+
+The ladder lists models from cheapest to most capable. For "action" and
+"answer" steps the router starts at the configured model and steps down the
+ladder while the route's observed p95 latency is over the latency budget or
+the estimated cost of the call is over the cost budget.
+
+Every routed call is timed and recorded as a "route" span, and per-route
+latency and success statistics are kept; load_traces() rebuilds them from a
+trace file so the budgets can be tuned against real runs.
+
+Usage:
+    python main.py --route [--latency-budget-ms 1500] [--cost-budget 0.002] --trace .data/traces.jsonl
+    python model_router.py stats .data/traces.jsonl
+"""
+import time
+from collections import deque
+
+from config import get_setting
+from json_helpers import extract_json
+from llm_backend import DEFAULT_MODEL
+from token_counter import count_message_tokens, count_tokens
+from tracing import load_spans, span
+
+STEP_TYPES = ("action", "answer", "retry")
+
+# Model for answers and retries unless LLM_ANSWER_MODEL / LLM_RETRY_MODEL say otherwise
+LARGE_MODEL = "gpt-4o"
+
+# Models from cheapest to most capable
+DEFAULT_LADDER = [DEFAULT_MODEL, LARGE_MODEL]
+
+# Step type -> model; actions use the model the agent uses without routing
+DEFAULT_ROUTES = {"action": DEFAULT_MODEL, "answer": LARGE_MODEL, "retry": LARGE_MODEL}
+
+# USD per million tokens (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Latency samples a route needs before the latency budget applies to it
+MIN_SAMPLES = 5
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Cost of a call in USD, or None for a model without a known price"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def attempted_action(text):
+    """Whether a reply tries to run an action (as opposed to answering)"""
+    return "function_name" in text or "PAUSE" in text
+
+
+def _reply_text(reply):
+    """Text of a reply, or of a Completion with its tool call arguments"""
+    if reply is None or isinstance(reply, str):
+        return reply or ""
+    calls = reply.tool_calls or []
+    return (reply.text or "") + "".join(call["function"].get("arguments") or "" for call in calls)
+
+
+def usable_completion(completion, actions):
+    """
+    Whether a tool-calling Completion can be acted on
+
+    Returns:
+        bool: True if every tool call names a known action, or if there are
+            no tool calls and the text is a usable ReAct reply
+    """
+    if completion.tool_calls:
+        return all(call["function"]["name"] in actions for call in completion.tool_calls)
+    return usable_reply(completion.text or "", actions)
+
+
+def _is_action_result(message):
+    return message.get("role") == "tool" or (
+        message.get("role") == "user" and (message.get("content") or "").startswith("Action_Response")
+    )
+
+
+def last_action(message):
+    """Name of the (last) action an assistant message calls, or None"""
+    calls = message.get("tool_calls")
+    if calls:
+        return calls[-1]["function"]["name"]
+    found = extract_json(message.get("content") or "")
+    return found[0].get("function_name") if found and isinstance(found[0], dict) else None
+
+
+def usable_reply(text, actions):
+    """
+    Whether a ReAct reply can be acted on
+
+    Args:
+        text (str): Model reply
+        actions (dict): Available actions by name
+
+    Returns:
+        bool: True for a valid call of a known action, or for a reply that
+            does not try to run one (an Answer)
+    """
+    if not text or not text.strip():
+        return False
+    found = extract_json(text)
+    if not found:
+        return not attempted_action(text)
+    call = found[0]
+    return call.get("function_name") in actions and isinstance(call.get("function_parms", {}), dict)
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _RouteStats:
+    __slots__ = ("calls", "successes", "cost_usd", "latencies")
+
+    def __init__(self, window):
+        self.calls = 0
+        self.successes = 0
+        self.cost_usd = 0.0
+        self.latencies = deque(maxlen=window)  # seconds, most recent calls
+
+    def p95(self):
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        return _percentile(sorted(self.latencies), 95)
+
+
+class ModelRouter:
+    """
+    Picks a model per step and records how each route performs
+
+    Args:
+        routes (dict): Step type -> model (default: DEFAULT_ROUTES)
+        ladder (list): Models from cheapest to most capable (default:
+            DEFAULT_LADDER); models not on it are used as configured
+        latency_budget_ms (float): Highest acceptable p95 latency per call,
+            or None
+        cost_budget (float): Highest estimated cost per call in USD, or None
+        expected_completion_tokens (int): Completion tokens assumed when
+            estimating the cost of a call
+        max_retries (int): Retries (each one rung up the ladder) after an
+            unusable reply
+        window (int): Latency samples kept per route
+        answer_after (tuple): Actions after whose result the next turn is an
+            "answer" step, or None for every action
+    """
+
+    def __init__(self, routes=None, ladder=None, latency_budget_ms=None, cost_budget=None,
+                 expected_completion_tokens=200, max_retries=1, window=500, answer_after=None):
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.answer_after = None if answer_after is None else tuple(answer_after)
+        self.ladder = list(DEFAULT_LADDER if ladder is None else ladder)
+        self.latency_budget_ms = latency_budget_ms
+        self.cost_budget = cost_budget
+        self.expected_completion_tokens = expected_completion_tokens
+        self.max_retries = max_retries
+        self.window = window
+        self._stats = {}  # (step, model) -> _RouteStats
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        """
+        Router configured from LLM_ACTION_MODEL, LLM_ANSWER_MODEL,
+        LLM_RETRY_MODEL, LLM_MODEL_LADDER (comma-separated, cheapest first),
+        LLM_LATENCY_BUDGET_MS and LLM_COST_BUDGET; keyword arguments win
+        """
+        routes = {step: get_setting(f"LLM_{step.upper()}_MODEL") for step in STEP_TYPES}
+        ladder = get_setting("LLM_MODEL_LADDER")
+        latency_budget_ms = get_setting("LLM_LATENCY_BUDGET_MS")
+        cost_budget = get_setting("LLM_COST_BUDGET")
+        options = {
+            "routes": {step: model for step, model in routes.items() if model},
+            "ladder": [model.strip() for model in ladder.split(",")] if ladder else None,
+            "latency_budget_ms": float(latency_budget_ms) if latency_budget_ms else None,
+            "cost_budget": float(cost_budget) if cost_budget else None,
+        }
+        options.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**options)
+
+    # --- policy ---
+
+    def _route(self, step, model):
+        key = (step, model)
+        if key not in self._stats:
+            self._stats[key] = _RouteStats(self.window)
+        return self._stats[key]
+
+    def _within_budget(self, step, model, prompt_tokens):
+        if self.latency_budget_ms is not None:
+            p95 = self._route(step, model).p95()
+            if p95 is not None and p95 * 1000 > self.latency_budget_ms:
+                return False
+        if self.cost_budget is not None and prompt_tokens is not None:
+            cost = estimate_cost(model, prompt_tokens, self.expected_completion_tokens)
+            if cost is not None and cost > self.cost_budget:
+                return False
+        return True
+
+    def choose(self, step, messages=None, failed_model=None):
+        """
+        Model for a step
+
+        Args:
+            step (str): "action", "answer" or "retry"
+            messages (list): The call's messages (for the cost estimate)
+            failed_model (str): For "retry", the model whose reply failed
+
+        Returns:
+            str: Model name
+        """
+        if step not in STEP_TYPES:
+            raise ValueError(f"Unknown step type {step!r} (expected one of {', '.join(STEP_TYPES)})")
+        preferred = self.routes[step]
+
+        if step == "retry":
+            # One rung above the failed model, and at least the retry model
+            if failed_model in self.ladder:
+                rung = min(self.ladder.index(failed_model) + 1, len(self.ladder) - 1)
+                if preferred not in self.ladder or self.ladder.index(preferred) < rung:
+                    return self.ladder[rung]
+            return preferred
+
+        if preferred not in self.ladder:
+            return preferred
+        candidates = self.ladder[:self.ladder.index(preferred) + 1][::-1]
+        prompt_tokens = count_message_tokens(messages) if messages and self.cost_budget is not None else None
+        for model in candidates:
+            if self._within_budget(step, model, prompt_tokens):
+                return model
+        return candidates[-1]
+
+    def next_step(self, messages):
+        """
+        Step type of the next ReAct turn, decided before the call
+
+        Returns:
+            str: "answer" if the last message is an action result (of an
+                action in answer_after, if set), otherwise "action"
+        """
+        position = len(messages) - 1
+        while position > 0 and _is_action_result(messages[position]):
+            position -= 1
+        if position == len(messages) - 1 or messages[position].get("role") != "assistant":
+            return "action"
+        if self.answer_after is None or last_action(messages[position]) in self.answer_after:
+            return "answer"
+        return "action"
+
+    # --- statistics ---
+
+    def record(self, step, model, seconds, success, cost_usd=None):
+        """Record one routed call"""
+        route = self._route(step, model)
+        route.calls += 1
+        route.successes += bool(success)
+        route.latencies.append(seconds)
+        if cost_usd:
+            route.cost_usd += cost_usd
+
+    def load_traces(self, spans):
+        """
+        Add the routed calls in trace records (or a trace file) to the statistics
+
+        Args:
+            spans (list or str): Span records, or the path of a JSONL trace file
+
+        Returns:
+            int: Routed calls loaded
+        """
+        if isinstance(spans, str):
+            spans = load_spans(spans)
+        loaded = 0
+        for record in spans:
+            if record.get("name") != "route" or record.get("step") not in STEP_TYPES:
+                continue
+            self.record(record["step"], record.get("model"), record["duration_ms"] / 1000,
+                        record.get("success", True) and "error" not in record, record.get("cost_usd"))
+            loaded += 1
+        return loaded
+
+    def stats(self):
+        """
+        Per-route statistics
+
+        Returns:
+            dict: "step:model" -> calls, success_rate, p50_ms, p95_ms and cost_usd
+        """
+        summary = {}
+        for (step, model), route in sorted(self._stats.items()):
+            if not route.calls:
+                continue
+            latencies = sorted(route.latencies)
+            summary[f"{step}:{model}"] = {
+                "calls": route.calls,
+                "success_rate": round(route.successes / route.calls, 4),
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+                "cost_usd": round(route.cost_usd, 6),
+            }
+        return summary
+
+    # --- running steps ---
+
+    def _finish(self, route_span, step, model, messages, reply, started, accept):
+        seconds = time.perf_counter() - started
+        success = accept(reply) if accept else bool(reply)
+        cost = estimate_cost(model, count_message_tokens(messages, model), count_tokens(_reply_text(reply), model))
+        route_span.set(success=success, cost_usd=cost)
+        self.record(step, model, seconds, success, cost)
+        return success
+
+    def _attempt(self, step, model, messages, generate, accept, on_call):
+        if on_call is not None:
+            on_call(step, model)
+        with span("route", step=step, model=model) as route_span:
+            started = time.perf_counter()
+            try:
+                reply = generate(messages, model)
+            except Exception:
+                self.record(step, model, time.perf_counter() - started, False)
+                raise
+            return reply, self._finish(route_span, step, model, messages, reply, started, accept)
+
+    async def _aattempt(self, step, model, messages, agenerate, accept, on_call):
+        if on_call is not None:
+            on_call(step, model)
+        with span("route", step=step, model=model) as route_span:
+            started = time.perf_counter()
+            try:
+                reply = await agenerate(messages, model)
+            except Exception:
+                self.record(step, model, time.perf_counter() - started, False)
+                raise
+            return reply, self._finish(route_span, step, model, messages, reply, started, accept)
+
+    def run(self, step, messages, generate, accept=None, on_call=None):
+        """
+        Make one call for a step, retrying up the ladder if the reply is not accepted
+
+        Args:
+            step (str): "action" or "answer"
+            messages (list): Chat messages
+            generate (callable): (messages, model) -> reply text (or a
+                Completion, in tool-calling mode)
+            accept (callable): reply -> whether it can be used (default: non-empty)
+            on_call (callable): Called with (step, model) before each call
+
+        Returns:
+            tuple: (reply, model, accepted) - the last reply if none was accepted
+        """
+        model = self.choose(step, messages)
+        reply, accepted = self._attempt(step, model, messages, generate, accept, on_call)
+        for _ in range(self.max_retries):
+            if accepted:
+                break
+            model = self.choose("retry", messages, failed_model=model)
+            reply, accepted = self._attempt("retry", model, messages, generate, accept, on_call)
+        return reply, model, accepted
+
+    async def arun(self, step, messages, agenerate, accept=None, on_call=None):
+        """Async version of run(); agenerate is a coroutine function"""
+        model = self.choose(step, messages)
+        reply, accepted = await self._aattempt(step, model, messages, agenerate, accept, on_call)
+        for _ in range(self.max_retries):
+            if accepted:
+                break
+            model = self.choose("retry", messages, failed_model=model)
+            reply, accepted = await self._aattempt("retry", model, messages, agenerate, accept, on_call)
+        return reply, model, accepted
+
+    def run_step(self, messages, generate, actions, on_call=None, tools=False):
+        """
+        One turn of the ReAct (or tool-calling) loop, on the model for its step
+
+        The step type comes from next_step(), so each turn is generated once
+        (plus retries of unusable replies).
+
+        Args:
+            messages (list): Chat messages
+            generate (callable): (messages, model) -> reply text, or a
+                Completion with tools
+            actions (dict): Available actions by name
+            on_call (callable): Called with (step, model) before each call
+            tools (bool): generate returns Completions with tool calls
+
+        Returns:
+            tuple: (reply, model)
+        """
+        accept = (lambda completion: usable_completion(completion, actions)) if tools \
+            else (lambda text: usable_reply(text, actions))
+        reply, model, _ = self.run(self.next_step(messages), messages, generate, accept, on_call)
+        return reply, model
+
+    async def arun_step(self, messages, agenerate, actions, on_call=None, tools=False):
+        """Async version of run_step(); agenerate is a coroutine function"""
+        accept = (lambda completion: usable_completion(completion, actions)) if tools \
+            else (lambda text: usable_reply(text, actions))
+        reply, model, _ = await self.arun(self.next_step(messages), messages, agenerate, accept, on_call)
+        return reply, model
+
+
+def print_stats(stats):
+    print(f"{'route':<28} {'calls':>7} {'success':>8} {'p50 ms':>9} {'p95 ms':>9} {'cost USD':>10}")
+    for name, route in stats.items():
+        print(f"{name:<28} {route['calls']:>7} {route['success_rate']:>8.1%} "
+              f"{route['p50_ms']:>9.1f} {route['p95_ms']:>9.1f} {route['cost_usd']:>10.4f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Model routing tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats", help="Per-route latency and success from a trace file")
+    stats_parser.add_argument("path", nargs="?", default=".data/traces.jsonl")
+    args = parser.parse_args()
+
+    router = ModelRouter()
+    router.load_traces(args.path)
+    print_stats(router.stats())
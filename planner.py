@@ -0,0 +1,204 @@
+# planner.py
+from json_helpers import extract_json
+
+
+class PlanError(Exception):
+    """Raised when a plan is malformed (unknown action, bad reference, cycle)"""
+
+
+def parse_plan(text):
+    """
+    Extract a plan from a model reply
+
+    Args:
+        text (str): Model reply containing a {"steps": [...]} object
+
+    Returns:
+        list: Plan steps, or None if the reply has no plan
+    """
+    for obj in extract_json(text) or []:
+        if isinstance(obj, dict) and isinstance(obj.get("steps"), list):
+            return obj["steps"]
+    return None
+
+
+def _is_reference(value, step_ids):
+    """
+    Whether a parameter value is "$<step id>" or "$<step id>.<path>"
+
+    Other strings starting with "$" ("$50 off your first order") are text.
+    """
+    return isinstance(value, str) and value.startswith("$") and value[1:].split(".")[0] in step_ids
+
+
+def _find_references(value, step_ids):
+    """Yield every "$step.path" reference string inside a parameter value"""
+    if _is_reference(value, step_ids):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _find_references(item, step_ids)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _find_references(item, step_ids)
+
+
+def _resolve_reference(reference, results):
+    """Look up "$step.field.0" in the results of completed steps"""
+    step_id, *path = reference[1:].split(".")
+    value = results[step_id]
+    for key in path:
+        if isinstance(value, list):
+            value = value[int(key)]
+        else:
+            value = value[key]
+    return value
+
+
+def _resolve(value, results):
+    # Every step a step references is one of its dependencies, so references
+    # are exactly the "$..." strings naming a step in results
+    if _is_reference(value, results):
+        return _resolve_reference(value, results)
+    if isinstance(value, dict):
+        return {key: _resolve(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, results) for item in value]
+    return value
+
+
+def validate_steps(steps):
+    """
+    Check the shape of plan steps
+
+    Args:
+        steps (list): Plan steps from parse_plan
+
+    Raises:
+        PlanError: If a step is not an object, has no string 'id', or has
+            function_parms that are not an object or depends_on that is not
+            a list
+    """
+    for position, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise PlanError(f"Step {position} is not a JSON object")
+        if not isinstance(step.get("id"), str) or not step["id"]:
+            raise PlanError("Every step needs a unique 'id'")
+        if not isinstance(step.get("function_parms", {}), dict):
+            raise PlanError(f"Step '{step['id']}' has function_parms that are not a JSON object")
+        if not isinstance(step.get("depends_on") or [], list):
+            raise PlanError(f"Step '{step['id']}' has depends_on that is not a list")
+
+
+def build_graph(steps, actions):
+    """
+    Validate plan steps and work out their dependencies
+
+    Args:
+        steps (list): Plan steps from parse_plan
+        actions (dict): Available actions by name
+
+    Returns:
+        dict: step id -> set of step ids it depends on
+
+    Raises:
+        PlanError: If a step is malformed, references an unknown step or the
+            plan has a cycle
+    """
+    validate_steps(steps)
+    step_ids = [step["id"] for step in steps]
+    if len(set(step_ids)) != len(step_ids):
+        raise PlanError("Every step needs a unique 'id'")
+
+    graph = {}
+    for step in steps:
+        if step.get("function_name") not in actions:
+            raise PlanError(f"Unknown action '{step.get('function_name')}' in step '{step['id']}'")
+        depends_on = set(step.get("depends_on") or [])
+        for reference in _find_references(step.get("function_parms", {}), step_ids):
+            depends_on.add(reference[1:].split(".")[0])
+        unknown = depends_on - set(step_ids)
+        if unknown:
+            raise PlanError(f"Step '{step['id']}' depends on unknown steps: {sorted(unknown)}")
+        graph[step["id"]] = depends_on
+
+    # Reject cycles (Kahn's algorithm)
+    remaining = {step_id: set(deps) for step_id, deps in graph.items()}
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise PlanError(f"Plan has a dependency cycle between steps: {sorted(remaining)}")
+        for step_id in ready:
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    return graph
+
+
+def execute_plan(steps, actions, max_workers=4, on_step=None):
+    """
+    Run a plan locally, with independent steps in parallel
+
+    A step starts as soon as every step it depends on has finished. If a
+    step fails, steps that depend on it are skipped.
+
+    Args:
+        steps (list): Plan steps from parse_plan
+        actions (dict): Available actions by name
+        max_workers (int): Size of the thread pool
+        on_step (callable): Optional callback(step_id, function_name, result)
+
+    Returns:
+        dict: step id -> action result (or {"error": ...})
+
+    Raises:
+        PlanError: If the plan is invalid
+    """
+    # Imported here: concurrent.futures (and the logging module it loads) is
+    # only needed once a plan runs, not at agent startup
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    graph = build_graph(steps, actions)
+    steps_by_id = {step["id"]: step for step in steps}
+    results = {}
+    failed = set()
+    pending = dict(graph)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for step_id, deps in list(pending.items()):
+                if deps & failed:
+                    results[step_id] = {"error": f"Skipped: depends on failed steps {sorted(deps & failed)}"}
+                    failed.add(step_id)
+                    del pending[step_id]
+                elif deps.issubset(results):
+                    step = steps_by_id[step_id]
+                    try:
+                        function_parms = _resolve(step.get("function_parms", {}), results)
+                    except (KeyError, IndexError, ValueError, TypeError) as e:
+                        results[step_id] = {"error": f"Could not resolve reference: {e}"}
+                        failed.add(step_id)
+                    else:
+                        action_function = actions[step["function_name"]]
+                        running[executor.submit(action_function, **function_parms)] = step_id
+                    del pending[step_id]
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step_id = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                if isinstance(result, dict) and "error" in result:
+                    failed.add(step_id)
+                results[step_id] = result
+                if on_step:
+                    on_step(step_id, steps_by_id[step_id]["function_name"], result)
+
+    return results
@@ -0,0 +1,198 @@
+# response_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Access times of memory-tier hits written back to SQLite at once (they decide
+# which entries are least recently used on disk)
+TOUCH_BATCH = 64
+
+
+def cache_key(model, messages):
+    """
+    Content-addressed key for a model call
+
+    Args:
+        model (str): Model name
+        messages (list): Chat messages
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON of (model, messages)
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of model responses: in-memory LRU in front of SQLite
+
+    Disk entries older than max_age_seconds are ignored and removed, and the
+    least recently used entries are evicted once the stored responses go over
+    max_disk_bytes.
+
+    Args:
+        path (str): SQLite file, or None for a memory-only cache
+        max_memory_entries (int): Size of the in-memory LRU tier
+        max_disk_bytes (int): Size limit for stored responses on disk
+        max_age_seconds (float): Maximum age of an entry, or None to keep forever
+    """
+
+    def __init__(self, path=".cache/responses.sqlite", max_memory_entries=256,
+                 max_disk_bytes=100 * 1024 * 1024, max_age_seconds=None):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> last access of memory hits not yet written to disk
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "lookup_seconds": 0.0}
+
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+                " size INTEGER, created_at REAL, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._db.commit()
+            # Kept up to date on every insert and delete from here on
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _expired(self, created_at, now):
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model, messages):
+        """
+        Look up a cached response
+
+        Returns:
+            str: The cached response, or None on a miss
+        """
+        start = time.perf_counter()
+        key = cache_key(model, messages)
+        now = time.time()
+        response = None
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                response = entry[0]
+                if self._db is not None:
+                    self._touched[key] = now
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._write_touched()
+                        self._db.commit()
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and not self._expired(row[1], now):
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row)
+                    self.counters["disk_hits"] += 1
+                    response = row[0]
+
+            if response is None:
+                self._memory.pop(key, None)
+                self.counters["misses"] += 1
+            self.counters["lookup_seconds"] += time.perf_counter() - start
+
+        return response
+
+    def set(self, model, messages, response):
+        """Store a response in both tiers"""
+        key = cache_key(model, messages)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, (response, now))
+            if self._db is not None:
+                size = len(response.encode("utf-8"))
+                replaced = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now)
+                )
+                self._disk_bytes += size - (replaced[0] if replaced else 0)
+                self._touched.pop(key, None)
+                self._evict(now)
+                self._db.commit()
+
+    def _write_touched(self):
+        """Write the access times of memory hits to SQLite"""
+        self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                             [(accessed, key) for key, accessed in self._touched.items()])
+        self._touched.clear()
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones over the size limit"""
+        if self.max_age_seconds is not None:
+            cutoff = now - self.max_age_seconds
+            expired = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (cutoff,)
+            ).fetchone()[0]
+            if expired:
+                self._db.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+                self._disk_bytes -= expired
+
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        # Entries hot in the memory tier must not look unused on disk
+        self._write_touched()
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            stale.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def stats(self):
+        """
+        Hit/miss/latency counters
+
+        Returns:
+            dict: Counters plus hit rate and mean lookup latency in ms
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["mean_lookup_ms"] = stats["lookup_seconds"] * 1000 / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,157 @@
+# result_encoder.py
+# Compact encoding of action results for the model: minimal JSON, only the
+# fields the model needs to reason about, and long content replaced by a
+# preview plus a reference to the full text, which stays local.
+import json
+
+# Default length of a content preview
+PREVIEW_CHARS = 160
+
+# Longest other string passed through (e.g. a long conflict warning)
+STRING_LIMIT = 300
+
+# Longest string (and content preview) in a compacted summary of an older result
+SUMMARY_STRING_LIMIT = 120
+
+# Fields sent back for each action. Inputs the model just chose (topic,
+# platform, dates, ...) and bookkeeping (timestamps) are left out.
+ENCODED_FIELDS = {
+    "analyze_campaign_data": ["metrics", "percentiles", "insights", "recommendations", "error",
+                              "available_campaigns"],
+    "generate_content": ["content", "hashtags", "estimated_reading_time", "near_duplicates", "error"],
+    "schedule_content": ["status", "scheduling_id", "warnings", "error"],
+}
+
+# Fields holding content bodies, sent as a preview plus a reference
+CONTENT_FIELDS = ("content",)
+
+REF_PREFIX = "@content_"
+
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _shorten(value, limit):
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit - 3] + "..."
+    if isinstance(value, list):
+        return [_shorten(item, limit) for item in value]
+    if isinstance(value, dict):
+        return {key: _shorten(item, limit) for key, item in value.items()}
+    return value
+
+
+def compact_json(value):
+    """JSON without spaces or ASCII escaping"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ResultEncoder:
+    """
+    Encodes action results for the model and keeps full content locally
+
+    Content longer than the preview is sent as its first preview_chars
+    characters with a "content_ref" such as "@content_1". Passing that
+    reference as an action parameter stands for the full text (see
+    resolve()). The same text always gets the same reference, so a
+    compacted summary of a result (see summarize()) keeps the handle the
+    model was given.
+
+    Args:
+        preview_chars (int): Characters of content to send, or None to send
+            content in full
+        fields (dict): Action name -> fields to send (default: ENCODED_FIELDS);
+            other actions send every non-empty field
+    """
+
+    def __init__(self, preview_chars=PREVIEW_CHARS, fields=None):
+        self.preview_chars = preview_chars
+        self.fields = ENCODED_FIELDS if fields is None else fields
+        self.contents = {}  # reference -> full text
+        self._references = {}  # full text -> reference
+
+    def project(self, function_name, result):
+        """
+        The part of a result the model sees
+
+        Args:
+            function_name (str): Action that produced the result
+            result: The raw action result
+
+        Returns:
+            The projected result (a new object; result is not changed)
+        """
+        return self._project(function_name, result, STRING_LIMIT, self.preview_chars)
+
+    def _project(self, function_name, result, string_limit, preview_chars):
+        if not isinstance(result, dict):
+            return _shorten(result, string_limit)
+        fields = self.fields.get(function_name) or list(result)
+        projected = {}
+        for key in fields:
+            value = result.get(key)
+            if _is_empty(value):
+                continue
+            if key in CONTENT_FIELDS and isinstance(value, str):
+                projected.update(self._content(key, value, preview_chars))
+            else:
+                projected[key] = _shorten(value, string_limit)
+        return projected
+
+    def _content(self, key, text, preview_chars):
+        if preview_chars is None or len(text) <= preview_chars:
+            return {key: text}
+        reference = self._references.get(text)
+        if reference is None:
+            reference = f"{REF_PREFIX}{len(self.contents) + 1}"
+            self.contents[reference] = text
+            self._references[text] = reference
+        return {key: text[:preview_chars] + "...", f"{key}_ref": reference}
+
+    def encode(self, function_name, result):
+        """
+        Compact JSON for a result
+
+        Returns:
+            str: e.g. {"status":"scheduled","scheduling_id":"sched_..."}
+        """
+        return compact_json(self.project(function_name, result))
+
+    def summarize(self, function_name, result):
+        """
+        Shorter JSON for an older result when the prompt is compacted
+
+        Same fields as encode(), with strings and content previews cut to
+        SUMMARY_STRING_LIMIT; shortened content keeps its content_ref.
+
+        Returns:
+            str: Compact JSON summary of the result
+        """
+        return compact_json(self._project(function_name, result, SUMMARY_STRING_LIMIT, SUMMARY_STRING_LIMIT))
+
+    def resolve(self, function_parms):
+        """
+        Replace content references in action parameters with the full text
+
+        References are replaced at any depth, e.g. in the posts of
+        schedule_content_bulk.
+
+        Args:
+            function_parms (dict): Parameters from the model
+
+        Returns:
+            dict: Parameters to call the action with
+        """
+        if not self.contents or not isinstance(function_parms, dict):
+            return function_parms
+        return self._resolve(function_parms)
+
+    def _resolve(self, value):
+        if isinstance(value, str):
+            return self.contents.get(value, value)
+        if isinstance(value, dict):
+            return {key: self._resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(item) for item in value]
+        return value
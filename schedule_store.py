@@ -0,0 +1,210 @@
+# schedule_store.py
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from config import get_setting
+
+DEFAULT_SCHEDULE_PATH = ".data/schedule.sqlite"
+
+# Sortable text format for publish times ("2025-05-06 09:00")
+PUBLISH_AT_FORMAT = "%Y-%m-%d %H:%M"
+
+COLUMNS = ["scheduling_id", "platform", "publish_at", "publish_date", "time_slot",
+           "content", "status", "scheduled_at"]
+
+
+def new_scheduling_id():
+    """Collision-free scheduling ID (random, unlike the old per-second timestamp)"""
+    return f"sched_{os.urandom(16).hex()}"
+
+
+def parse_time_slot(time_slot):
+    """
+    Parse a time slot such as "9:00 AM" or "14:30"
+
+    Returns:
+        tuple: (hour, minute), or None if the slot can't be parsed
+    """
+    for time_format in ("%I:%M %p", "%I %p", "%H:%M"):
+        try:
+            parsed = datetime.strptime(time_slot.strip().upper(), time_format)
+            return parsed.hour, parsed.minute
+        except ValueError:
+            continue
+    return None
+
+
+def publish_at(publish_date, time_slot):
+    """
+    Combine a YYYY-MM-DD date and a time slot into a sortable publish time
+
+    Without a time slot the item is due at midnight.
+
+    Raises:
+        ValueError: If the time slot can't be parsed
+    """
+    hour, minute = 0, 0
+    if time_slot:
+        parsed = parse_time_slot(time_slot)
+        if parsed is None:
+            raise ValueError(f"Invalid time slot '{time_slot}'")
+        hour, minute = parsed
+    return f"{publish_date} {hour:02d}:{minute:02d}"
+
+
+class ScheduleStore:
+    """
+    Durable store of scheduled content in SQLite (WAL mode)
+
+    Items are indexed by (platform, publish time), so time-range queries and
+    slot-conflict checks are index lookups rather than scans.
+
+    Args:
+        path (str): SQLite file (":memory:" for a throwaway store); defaults to
+            the SCHEDULE_DB_PATH setting, then DEFAULT_SCHEDULE_PATH
+    """
+
+    def __init__(self, path=None):
+        path = path or get_setting("SCHEDULE_DB_PATH", DEFAULT_SCHEDULE_PATH)
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS schedules ("
+            " scheduling_id TEXT PRIMARY KEY, platform TEXT NOT NULL, publish_at TEXT NOT NULL,"
+            " publish_date TEXT NOT NULL, time_slot TEXT, content TEXT NOT NULL,"
+            " status TEXT NOT NULL, scheduled_at TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS schedules_platform_time ON schedules (platform, publish_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS schedules_time ON schedules (publish_at)")
+        self._db.commit()
+
+    def add_many(self, records):
+        """
+        Insert records in a single transaction
+
+        Args:
+            records (list): Dicts with the keys in COLUMNS
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT INTO schedules ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(record[column] for column in COLUMNS) for record in records]
+            )
+
+    def add(self, record):
+        """Insert one record"""
+        self.add_many([record])
+
+    def set_status_many(self, updates):
+        """
+        Change the status of many items in a single transaction
+
+        Args:
+            updates (list): (scheduling_id, status) pairs
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE schedules SET status = ? WHERE scheduling_id = ?",
+                [(status, scheduling_id) for scheduling_id, status in updates]
+            )
+
+    def conflicts(self, platform, publish_at, window_minutes=0):
+        """
+        Scheduled items on a platform within window_minutes of a publish time
+
+        Returns:
+            list: scheduling IDs of conflicting items
+        """
+        start, end = publish_at, publish_at
+        if window_minutes:
+            moment = datetime.strptime(publish_at, PUBLISH_AT_FORMAT)
+            start = (moment - timedelta(minutes=window_minutes)).strftime(PUBLISH_AT_FORMAT)
+            end = (moment + timedelta(minutes=window_minutes)).strftime(PUBLISH_AT_FORMAT)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT scheduling_id FROM schedules"
+                " WHERE platform = ? AND publish_at BETWEEN ? AND ? AND status IN ('scheduled', 'publishing')",
+                (platform.lower(), start, end)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def query(self, platform=None, start=None, end=None, status=None, limit=None):
+        """
+        Scheduled items in a time range, ordered by publish time
+
+        Args:
+            platform (str): Only this platform
+            start (str|datetime): Earliest publish time (inclusive)
+            end (str|datetime): Latest publish time (exclusive)
+            status (str): Only items with this status
+            limit (int): Maximum number of items
+
+        Returns:
+            list: Item dicts
+        """
+        conditions, parameters = [], []
+        if platform:
+            conditions.append("platform = ?")
+            parameters.append(platform.lower())
+        if start is not None:
+            conditions.append("publish_at >= ?")
+            parameters.append(start.strftime(PUBLISH_AT_FORMAT) if isinstance(start, datetime) else start)
+        if end is not None:
+            conditions.append("publish_at < ?")
+            parameters.append(end.strftime(PUBLISH_AT_FORMAT) if isinstance(end, datetime) else end)
+        if status:
+            conditions.append("status = ?")
+            parameters.append(status)
+
+        sql = "SELECT * FROM schedules"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY publish_at"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, parameters)]
+
+    def get(self, scheduling_id):
+        """Look up one item by ID, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM schedules WHERE scheduling_id = ?", (scheduling_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM schedules").fetchone()[0]
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_schedule_store():
+    """Get the store at SCHEDULE_DB_PATH, opening it on first use"""
+    global _default_store
+    if _default_store is None:
+        # Concurrent first calls (worker threads, the dispatcher) must not
+        # each open their own store
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ScheduleStore()
+    return _default_store
+
+
+def set_schedule_store(store):
+    """Replace the store used by schedule_content; returns the previous one"""
+    global _default_store
+    with _default_store_lock:
+        previous, _default_store = _default_store, store
+    return previous
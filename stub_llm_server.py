@@ -0,0 +1,384 @@
+# stub_llm_server.py
+"""
+Local stand-in for the OpenAI chat-completions API
+
+Replies follow a scripted ReAct workflow (analyze -> generate -> schedule ->
+Answer), or come from a JSONL script file, with configurable latency and
+throughput. Streaming requests get server-sent events like the real API.
+To exercise client retries, the server can also answer a share of requests
+with 429 and Retry-After, or enforce a requests-per-minute limit.
+
+Usage:
+    python stub_llm_server.py [--port 8808] [--latency 0.2] [--tokens-per-second 50] [--script replies.jsonl]
+    python stub_llm_server.py --error-rate 0.2 --latency-jitter 0.3 --requests-per-minute 600
+
+Then point the agent at it:
+    LLM_BASE_URL=http://127.0.0.1:8808/v1 python main.py
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from token_counter import count_message_tokens, count_tokens, count_tool_call_tokens, count_tool_tokens
+
+DEFAULT_CAMPAIGN = "email_campaign_q1"
+
+
+def _action(function_name, function_parms):
+    return json.dumps({"function_name": function_name, "function_parms": function_parms}, indent=2)
+
+
+def _script_state(messages):
+    """
+    Find the campaign named in the current task and how many actions have
+    already run for it (Action_Response messages or tool results)
+    """
+    task_index = 0
+    for index, message in enumerate(messages):
+        if message["role"] == "user" and not (message.get("content") or "").startswith("Action_Response"):
+            task_index = index
+    task = messages[task_index]["content"] if messages else ""
+    steps_done = sum(
+        1 for m in messages[task_index + 1:]
+        if m["role"] == "tool"
+        or (m["role"] == "user" and (m.get("content") or "").startswith("Action_Response"))
+    )
+
+    match = re.search(r"\b(email_campaign_q1|social_campaign_summer|webinar_series_2023)\b", task)
+    campaign_id = match.group(1) if match else DEFAULT_CAMPAIGN
+    return campaign_id, steps_done
+
+
+def _script_step(campaign_id, steps_done):
+    """
+    Next step of the scripted workflow
+
+    Returns:
+        tuple: (thought, function_name, function_parms), or (answer, None, None)
+    """
+    if steps_done == 0:
+        return (f"I need to analyze {campaign_id} before creating content.",
+                "analyze_campaign_data", {"campaign_id": campaign_id})
+    if steps_done == 1:
+        return ("The analysis shows where to focus. I will draft a LinkedIn post.",
+                "generate_content", {
+                    "topic": "AI Marketing ROI optimization",
+                    "audience": "Marketing Managers",
+                    "tone": "professional",
+                    "platform": "LinkedIn",
+                    "length": "medium",
+                })
+    if steps_done == 2:
+        return ("The post is ready, so I will schedule it.",
+                "schedule_content", {
+                    "content": "CFOs are increasingly leveraging AI to drive strategic financial decisions.",
+                    "platform": "LinkedIn",
+                    "publish_date": "2099-05-06",
+                    "time_slot": "9:00 AM",
+                })
+    return (f"I analyzed {campaign_id}, drafted a LinkedIn post for Marketing Managers "
+            "and scheduled it for Tuesday morning.", None, None)
+
+
+def scripted_react_reply(messages):
+    """
+    Produce the next ReAct reply for a conversation
+
+    The script analyzes the campaign named in the task, writes a LinkedIn
+    post, schedules it and then answers, based on how many actions have
+    already run for the current task.
+
+    Args:
+        messages (list): Chat messages sent to the model
+
+    Returns:
+        str: The scripted reply
+    """
+    text, function_name, function_parms = _script_step(*_script_state(messages))
+    if function_name is None:
+        return f"Answer: {text}"
+    return f"Thought: {text}\nAction:\n{_action(function_name, function_parms)}\nPAUSE"
+
+
+def scripted_tool_reply(messages):
+    """
+    Produce the next reply of the scripted workflow as a native tool call
+
+    Args:
+        messages (list): Chat messages sent to the model (tool results are
+            "tool" messages)
+
+    Returns:
+        dict: Assistant message with "content" and, unless the workflow is
+            finished, "tool_calls" in the chat API format
+    """
+    text, function_name, function_parms = _script_step(*_script_state(messages))
+    if function_name is None:
+        return {"role": "assistant", "content": text}
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": f"call_{os.urandom(8).hex()}",
+            "type": "function",
+            "function": {"name": function_name, "arguments": json.dumps(function_parms)},
+        }],
+    }
+
+
+def load_script(path):
+    """
+    Load scripted replies from a JSONL file (one {"content": ...} per line)
+
+    Returns:
+        callable: Reply function that cycles through the replies
+    """
+    with open(path, encoding="utf-8") as f:
+        replies = [json.loads(line)["content"] for line in f if line.strip()]
+    cycle = itertools.cycle(replies)
+    lock = threading.Lock()
+
+    def reply(messages):
+        with lock:
+            return next(cycle)
+    return reply
+
+
+def split_tokens(text):
+    """Split text into word-sized pieces for streaming"""
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+class StubConfig:
+    """
+    Behaviour of the stand-in server
+
+    Args:
+        reply (callable): messages -> reply text
+        tool_reply (callable): messages -> assistant message with tool_calls,
+            used for requests that declare tools
+        latency (float): Seconds before the first token
+        tokens_per_second (float): Output speed, or None for instant replies
+        latency_jitter (float): Up to this many extra seconds of latency,
+            drawn at random per request
+        error_rate (float): Share of requests answered with 429
+        requests_per_minute (int): Answer requests over this rate with 429,
+            or None for no limit
+        retry_after (float): Retry-After seconds sent with a 429
+        seed (int): Seed for the random latency and errors
+    """
+
+    def __init__(self, reply=scripted_react_reply, latency=0.0, tokens_per_second=None,
+                 tool_reply=scripted_tool_reply, latency_jitter=0.0, error_rate=0.0,
+                 requests_per_minute=None, retry_after=1.0, seed=None):
+        self.reply = reply
+        self.tool_reply = tool_reply
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.counts = {"requests": 0, "rejected": 0}
+        self._random = random.Random(seed)
+        self._window = deque()  # arrival times of accepted requests in the last minute
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """
+        Decide whether to serve a request
+
+        Returns:
+            tuple: (accepted, latency) - latency is the delay before the first
+                token for an accepted request
+        """
+        with self._lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            over_limit = self.requests_per_minute is not None and len(self._window) >= self.requests_per_minute
+            if over_limit or (self.error_rate and self._random.random() < self.error_rate):
+                self.counts["rejected"] += 1
+                return False, 0.0
+            self._window.append(now)
+            return True, self.latency + self._random.uniform(0, self.latency_jitter)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1/chat/completions"""
+
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        messages = request.get("messages", [])
+        model = request.get("model", "stub")
+        config = self.config
+
+        accepted, latency = config.admit()
+        if not accepted:
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached, please retry", "type": "requests", "code": "rate_limit_exceeded"
+            }}, headers={"Retry-After": str(config.retry_after)})
+            return
+
+        tools = request.get("tools")
+        if tools and config.tool_reply and not request.get("stream"):
+            message = config.tool_reply(messages)
+        else:
+            tools = None
+            message = {"role": "assistant", "content": config.reply(messages)}
+        text = message.get("content") or ""
+        if latency:
+            time.sleep(latency)
+
+        if request.get("stream"):
+            self._stream(text, model)
+            return
+
+        completion_tokens = count_tokens(text) + sum(
+            count_tool_call_tokens(call) for call in message.get("tool_calls") or []
+        )
+        if config.tokens_per_second:
+            time.sleep(completion_tokens / config.tokens_per_second)
+        prompt_tokens = count_message_tokens(messages) + count_tool_tokens(tools)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _stream(self, text, model):
+        """Send the reply as server-sent events, one word per chunk"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for piece in split_tokens(text):
+                if delay:
+                    time.sleep(delay)
+                event({"content": piece})
+            event({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the generation
+            pass
+
+
+def make_stub_server(host="127.0.0.1", port=0, config=None):
+    """Create (but do not start) a stand-in server"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stub_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start the stand-in server on a background thread
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port, or 0 for any free port
+        config (StubConfig): Server behaviour
+
+    Returns:
+        tuple: (server, base_url) - call server.shutdown() to stop it
+    """
+    server = make_stub_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Output throughput")
+    parser.add_argument("--script", help="JSONL file of replies to cycle through")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Answer requests over this rate with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        reply=load_script(args.script) if args.script else scripted_react_reply,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        requests_per_minute=args.requests_per_minute,
+        retry_after=args.retry_after,
+    )
+    server = make_stub_server(args.host, args.port, config)
+    print(f"Stand-in LLM server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# token_counter.py
+# Local token counting for prompts and replies. Uses tiktoken when it is
+# installed, otherwise a ~4 characters per token estimate.
+import json
+from functools import lru_cache
+
+# Per-message overhead of the chat format (role, separators)
+TOKENS_PER_MESSAGE = 4
+# Every reply is primed with <|start|>assistant<|message|>
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Count the tokens in a piece of text
+
+    Args:
+        text (str): Text to count
+        model (str): Model whose tokenizer to use
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    return _count_text(text, model)
+
+
+# The same system prompt and earlier messages are counted on every turn;
+# remembering recent counts keeps per-call accounting cheap
+@lru_cache(maxsize=4096)
+def _count_text(text, model):
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def message_tokens(message, model="gpt-3.5-turbo"):
+    """Tokens of one chat message, including the per-message overhead"""
+    total = TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model)
+    for call in message.get("tool_calls") or []:
+        total += count_tool_call_tokens(call, model)
+    return total
+
+
+def count_message_tokens(messages, model="gpt-3.5-turbo"):
+    """
+    Count the prompt tokens of a list of chat messages
+
+    Args:
+        messages (list): Chat messages with "role" and "content"
+        model (str): Model whose tokenizer to use
+
+    Returns:
+        int: Number of prompt tokens
+    """
+    return TOKENS_PER_REPLY + sum(message_tokens(message, model) for message in messages)
+
+
+def count_tool_call_tokens(call, model="gpt-3.5-turbo"):
+    """Tokens of one tool call (function name and JSON arguments)"""
+    function = call["function"]
+    return count_tokens(function["name"], model) + count_tokens(function["arguments"], model)
+
+
+def count_tool_tokens(tools, model="gpt-3.5-turbo"):
+    """
+    Approximate prompt tokens of tool schemas sent with a request
+
+    Providers render schemas into the prompt in their own format; the
+    compact JSON form is a close stand-in.
+    """
+    if not tools:
+        return 0
+    return count_tokens(json.dumps(tools, separators=(",", ":")), model)
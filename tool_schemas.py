@@ -0,0 +1,130 @@
+# tool_schemas.py
+# Tool (function-calling) schemas generated from action signatures and their
+# Google-style docstrings, so the schemas can't drift from the code.
+import inspect
+import json
+import re
+
+# Docstring types -> JSON schema types
+JSON_TYPES = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "tuple": "array",
+    "dict": "object",
+}
+
+_ARG_LINE = re.compile(r"^(\w+)\s*(?:\(([^)]*)\))?\s*:\s*(.*)$")
+
+
+def parse_docstring(docstring):
+    """
+    Split a Google-style docstring into its summary and Args entries
+
+    Returns:
+        tuple: (summary, {arg name: (type name, description)})
+    """
+    lines = inspect.cleandoc(docstring or "").splitlines()
+    summary = []
+    for line in lines:
+        if not line.strip() or line.strip().endswith(":"):
+            break
+        summary.append(line.strip())
+
+    args = {}
+    in_args = False
+    current = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped == "Args:":
+            in_args = True
+            continue
+        if not in_args:
+            continue
+        if not line.startswith(" ") and stripped:
+            break  # Next section (Returns:, ...)
+        match = _ARG_LINE.match(stripped)
+        if match and line.startswith("    ") and not line.startswith("        "):
+            current = match.group(1)
+            args[current] = [match.group(2) or "", match.group(3)]
+        elif current and stripped:
+            args[current][1] += " " + stripped  # Continuation line
+    return " ".join(summary), {name: tuple(value) for name, value in args.items()}
+
+
+def _json_type(type_name, default):
+    base = type_name.split("|")[0].split("[")[0].strip()
+    if base in JSON_TYPES:
+        return JSON_TYPES[base]
+    if isinstance(default, bool):
+        return "boolean"
+    if isinstance(default, int):
+        return "integer"
+    if isinstance(default, float):
+        return "number"
+    if isinstance(default, (list, tuple)):
+        return "array"
+    return "string"
+
+
+def function_schema(function, name=None):
+    """
+    Build a tool schema for a function
+
+    Parameters without a default are required; types come from the
+    docstring's Args section, falling back to the type of the default.
+
+    Args:
+        function (callable): The action (wrappers made with functools.wraps
+            are followed to the original signature)
+        name (str): Tool name (defaults to the function's name)
+
+    Returns:
+        dict: {"type": "function", "function": {...}} for the chat API
+    """
+    summary, documented = parse_docstring(function.__doc__)
+    properties = {}
+    required = []
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        has_default = parameter.default is not parameter.empty
+        type_name, description = documented.get(parameter.name, ("", ""))
+        schema = {"type": _json_type(type_name, parameter.default if has_default else None)}
+        if schema["type"] == "array":
+            schema["items"] = {"type": "string"}
+        if has_default and parameter.default is not None:
+            description = f"{description} (default: {json.dumps(parameter.default)})".strip()
+        if description:
+            schema["description"] = description
+        properties[parameter.name] = schema
+        if not has_default:
+            required.append(parameter.name)
+
+    return {
+        "type": "function",
+        "function": {
+            "name": name or function.__name__,
+            "description": summary,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+            },
+        },
+    }
+
+
+def tool_schemas(actions):
+    """
+    Tool schemas for an action registry
+
+    Args:
+        actions (dict): name -> callable, like available_actions
+
+    Returns:
+        list: One schema per action
+    """
+    return [function_schema(function, name) for name, function in actions.items()]
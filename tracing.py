@@ -0,0 +1,303 @@
+# tracing.py
+"""
+Spans for model calls, JSON extraction and actions
+
+Tracing is off by default; span() then returns a shared no-op object, so the
+instrumented code pays one global lookup per span.
+
+Usage:
+    python main.py --trace .data/traces.jsonl
+    python tracing.py summary .data/traces.jsonl [--session ID]
+"""
+import atexit
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+DEFAULT_TRACE_PATH = ".data/traces.jsonl"
+
+# Session and turn of the code that is running (per thread / asyncio task)
+_context = contextvars.ContextVar("trace_context", default={})
+_parent = contextvars.ContextVar("trace_parent", default=None)
+
+
+class JSONLSink:
+    """
+    Appends span records to a JSONL file
+
+    Records are buffered and written in batches (and at exit).
+
+    Args:
+        path (str): File to append to
+        buffer_size (int): Records to hold before writing
+    """
+
+    def __init__(self, path=DEFAULT_TRACE_PATH, buffer_size=256):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def write(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) < self.buffer_size:
+                return
+            records, self._buffer = self._buffer, []
+        self._write(records)
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if records:
+            self._write(records)
+
+    def _write(self, records):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class Span:
+    """One timed step; add attributes with set()"""
+
+    __slots__ = ("tracer", "name", "attributes", "span_id", "start", "_started", "_parent_token")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(tracer._ids)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._parent_token = _parent.set(self.span_id)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        _parent.reset(self._parent_token)
+        record = {
+            "name": self.name,
+            "run_id": self.tracer.run_id,
+            "span_id": self.span_id,
+            "parent_id": _parent.get(),
+            "start": self.start,
+            "duration_ms": round(duration * 1000, 3),
+            **_context.get(),
+            **self.attributes,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.sink.write(record)
+        return False
+
+
+class _NoOpSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class Tracer:
+    """
+    Creates spans and sends finished ones to a sink
+
+    Span IDs count from 1 in every process; records also carry a run_id, so
+    parents and children can be matched in a file several runs append to.
+
+    Args:
+        sink: Object with write(record) and flush(), e.g. JSONLSink
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.run_id = os.urandom(4).hex()
+        self._ids = itertools.count(1)
+
+    def span(self, name, **attributes):
+        return Span(self, name, attributes)
+
+
+_tracer = None
+
+
+def enable_tracing(path=DEFAULT_TRACE_PATH, sink=None):
+    """
+    Start recording spans
+
+    Args:
+        path (str): JSONL file to append to
+        sink: Custom sink instead of a JSONL file
+
+    Returns:
+        Tracer: The active tracer
+    """
+    global _tracer
+    _tracer = Tracer(sink or JSONLSink(path))
+    return _tracer
+
+
+def disable_tracing():
+    """Stop recording spans (flushing any buffered records)"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.sink.flush()
+    _tracer = None
+
+
+def tracing_enabled():
+    """Whether spans are being recorded (to skip work only a span needs)"""
+    return _tracer is not None
+
+
+def span(name, **attributes):
+    """
+    Time a step
+
+    Use as a context manager; the returned span's set() adds attributes
+    (e.g. token counts) once they are known.
+
+    Args:
+        name (str): Step name, e.g. "generate_response"
+        **attributes: Extra fields for the record
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.span(name, **attributes)
+
+
+def set_trace_context(**fields):
+    """
+    Attach fields (session_id, turn, ...) to the spans started from now on
+
+    The context is per thread and per asyncio task, so concurrent sessions
+    each keep their own IDs. Actions run with asyncio.to_thread inherit it.
+    """
+    _context.set({**_context.get(), **fields})
+
+
+def traced_action(action_function):
+    """Wrap an action so each call is recorded as an "action" span"""
+    @functools.wraps(action_function)
+    def wrapper(**function_parms):
+        if _tracer is None:
+            return action_function(**function_parms)
+        with _tracer.span("action", function_name=action_function.__name__) as action_span:
+            result = action_function(**function_parms)
+            if isinstance(result, dict) and "error" in result:
+                action_span.set(action_error=result["error"])
+            return result
+    return wrapper
+
+
+def load_spans(path):
+    """Read span records from a JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(spans, session_id=None):
+    """
+    Latency percentiles and token totals per step
+
+    Actions are reported per function ("action:generate_content") and
+    routed model calls per step type and model ("route:action:gpt-3.5-turbo").
+    self_ms is the time spent in a step itself, without its nested spans
+    (e.g. a route without the generate_response call inside it), so the
+    self times of all steps add up to the traced time.
+
+    Args:
+        spans (list): Span records
+        session_id (str): Only spans from this session
+
+    Returns:
+        dict: step -> {count, total_ms, self_ms, p50_ms, p95_ms, p99_ms,
+            prompt_tokens, completion_tokens}
+    """
+    spans = [record for record in spans if not session_id or record.get("session_id") == session_id]
+    nested_ms = {}
+    for record in spans:
+        if record.get("parent_id") is not None:
+            parent = (record.get("run_id"), record["parent_id"])
+            nested_ms[parent] = nested_ms.get(parent, 0.0) + record["duration_ms"]
+
+    steps = {}
+    for record in spans:
+        step = record["name"]
+        if step == "action":
+            step = f"action:{record.get('function_name')}"
+        elif step == "route":
+            step = f"route:{record.get('step')}:{record.get('model')}"
+        entry = steps.setdefault(step, {"durations": [], "self_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        entry["durations"].append(record["duration_ms"])
+        nested = nested_ms.get((record.get("run_id"), record.get("span_id")), 0.0)
+        entry["self_ms"] += max(0.0, record["duration_ms"] - nested)
+        entry["prompt_tokens"] += record.get("prompt_tokens") or 0
+        entry["completion_tokens"] += record.get("completion_tokens") or 0
+
+    summary = {}
+    for step, entry in steps.items():
+        values = sorted(entry["durations"])
+        summary[step] = {
+            "count": len(values),
+            "total_ms": round(sum(values), 3),
+            "self_ms": round(entry["self_ms"], 3),
+            "p50_ms": _percentile(values, 50),
+            "p95_ms": _percentile(values, 95),
+            "p99_ms": _percentile(values, 99),
+            "prompt_tokens": entry["prompt_tokens"],
+            "completion_tokens": entry["completion_tokens"],
+        }
+    return summary
+
+
+def print_summary(summary):
+    # Shares of self time, so nested steps are not counted twice
+    total = sum(step["self_ms"] for step in summary.values()) or 1
+    print(f"{'step':<32} {'count':>7} {'total ms':>11} {'share':>6} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'prompt tok':>11} {'compl tok':>10}")
+    for name, step in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        print(f"{name:<32} {step['count']:>7} {step['total_ms']:>11.1f} {step['self_ms'] / total:>6.1%} "
+              f"{step['p50_ms']:>9.2f} {step['p95_ms']:>9.2f} {step['p99_ms']:>9.2f} "
+              f"{step['prompt_tokens']:>11} {step['completion_tokens']:>10}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trace tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary_parser = commands.add_parser("summary", help="Per-step latency percentiles")
+    summary_parser.add_argument("path", nargs="?", default=DEFAULT_TRACE_PATH)
+    summary_parser.add_argument("--session", default=None, help="Only this session ID")
+    args = parser.parse_args()
+
+    print_summary(summarize(load_spans(args.path), session_id=args.session))